@@ -34,6 +34,6 @@ mv run_${MODEL_NAME}.accelprof.log ${RAW_DATA_DIR}/${MODEL_NAME}.accelprof.log
 # process & plot
 ########################################################
 
-python3 ${PY_DIR}/process.py --log-folder ${RAW_DATA_DIR}/${MODEL_NAME}.accelprof.log &> ${RESULT_DIR}/${MODEL_NAME}.process.log
+python3 ${PY_DIR}/process.py --log-folder ${RAW_DATA_DIR}/${MODEL_NAME}.accelprof.log --jobs 0 &> ${RESULT_DIR}/${MODEL_NAME}.process.log
 
 python3 ${PY_DIR}/plot.py --log-file ${RESULT_DIR}/${MODEL_NAME}.process.log --output-folder ${RESULT_DIR}
@@ -25,4 +25,4 @@ run_model_cmd="python3 run_${MODEL_NAME}.py"
 $profile_prefix $run_model_cmd
 mv run_${MODEL_NAME}.accelprof.log ${RAW_DATA_DIR}/${MODEL_NAME}_app_analysis_rocm.log
 
-python3 ${PY_DIR}/process_nvidia.py --log-file ${RAW_DATA_DIR}/${MODEL_NAME}_app_analysis_rocm.log &> ${RESULT_DIR}/out_nvidia.log
+python3 ${PY_DIR}/process_nvidia.py --log-file ${RAW_DATA_DIR}/${MODEL_NAME}_app_analysis_rocm.log --jobs 0 &> ${RESULT_DIR}/out_nvidia.log
@@ -78,9 +78,9 @@ mkdir -p ${RESULT_DIR}/dp
 mkdir -p ${RESULT_DIR}/tp
 mkdir -p ${RESULT_DIR}/pp
 
-python3 ${PY_DIR}/process.py --log-file ${RAW_DATA_DIR}/dp.accelprof.log --output-folder ${RESULT_DIR}/dp
-python3 ${PY_DIR}/process.py --log-file ${RAW_DATA_DIR}/tp.accelprof.log --output-folder ${RESULT_DIR}/tp
-python3 ${PY_DIR}/process.py --log-file ${RAW_DATA_DIR}/pp.accelprof.log --output-folder ${RESULT_DIR}/pp
+python3 ${PY_DIR}/process.py --log-file ${RAW_DATA_DIR}/dp.accelprof.log --output-folder ${RESULT_DIR}/dp --jobs 0
+python3 ${PY_DIR}/process.py --log-file ${RAW_DATA_DIR}/tp.accelprof.log --output-folder ${RESULT_DIR}/tp --jobs 0
+python3 ${PY_DIR}/process.py --log-file ${RAW_DATA_DIR}/pp.accelprof.log --output-folder ${RESULT_DIR}/pp --jobs 0
 
 
 ########################################################
@@ -45,7 +45,7 @@ done
 RESULT_DIR=${CURRENT_DIR}/results/figure_7
 PY_DIR=${CURRENT_DIR}/python/figure_7
 
-python3 ${PY_DIR}/process.py --log-folder ${RAW_DATA_DIR} --output-folder ${RESULT_DIR}
+python3 ${PY_DIR}/process.py --log-folder ${RAW_DATA_DIR} --output-folder ${RESULT_DIR} --jobs 0
 
 ########################################################
 # plot figure
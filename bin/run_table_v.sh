@@ -14,4 +14,4 @@ PY_DIR=${CURRENT_DIR}/python/table_v
 mkdir -p ${RAW_DATA_DIR}
 mkdir -p ${RESULT_DIR}
 
-python3 ${PY_DIR}/process.py --log-folder ${RAW_DATA_DIR} &> ${RESULT_DIR}/table_v.log
+python3 ${PY_DIR}/process.py --log-folder ${RAW_DATA_DIR} --jobs 0 &> ${RESULT_DIR}/table_v.log
@@ -0,0 +1,118 @@
+import os
+import re
+
+import numpy as np
+
+from common.hotness import HotnessMatrix
+
+
+# Hotness matrices computed offline from raw memory address traces.
+#
+# A trace is a headerless array of native-endian uint64 addresses, one per
+# access in program order: either a single file, or a folder of the chunk
+# files a tracing tool dumps (read in natural name order, e.g. chunk_2.bin
+# before chunk_10.bin). Files are memory-mapped and consumed in bounded
+# chunks of accesses.
+#
+# For every chunk, the accesses are binned by (window, block) with
+# np.bincount, window = access index // window_size and block = address //
+# block_size. The chunk's distinct blocks are numbered with np.unique, and
+# the counts of one chunk are kept sparse. Block and window sizes are
+# free parameters, so re-binning a trace (4KB instead of 2MB blocks, 100K
+# instead of 1M accesses per step) needs no new profiling run; going to a
+# multiple of the current sizes is cheaper still with
+# HotnessMatrix.coarsen().
+
+DEFAULT_BLOCK_SIZE = 2 * 1024 * 1024
+DEFAULT_WINDOW_SIZE = 1000000
+DEFAULT_CHUNK_SIZE = 1 << 24
+
+_SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def parse_size(text):
+    """Byte size from "4096", "4K", "64KB", "2MB", "1G" (binary units)."""
+    m = re.fullmatch(r"\s*(\d+)\s*([KMG]?)(?:I?B)?\s*", str(text), re.IGNORECASE)
+    if not m:
+        raise ValueError(f"Invalid size {text!r}")
+    return int(m.group(1)) * _SIZE_UNITS[m.group(2).upper()]
+
+
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+def trace_files(path):
+    """The chunk files of a trace folder in natural order, or [path] for a file."""
+    if not os.path.isdir(path):
+        return [path]
+    names = sorted((name for name in os.listdir(path)
+                    if os.path.isfile(os.path.join(path, name)) and not name.startswith(".")),
+                   key=_natural_key)
+    return [os.path.join(path, name) for name in names]
+
+
+def iter_trace_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the addresses of a trace as uint64 arrays of at most `chunk_size` accesses."""
+    for file_path in trace_files(path):
+        size = os.path.getsize(file_path)
+        if size % 8:
+            raise ValueError(f"{file_path}: size {size} is not a multiple of 8 bytes")
+        if size == 0:
+            continue
+        addresses = np.memmap(file_path, dtype=np.uint64, mode="r")
+        for start in range(0, len(addresses), chunk_size):
+            yield addresses[start:start + chunk_size]
+
+
+def _bin_chunk(addresses, first_access, block_size, window_size):
+    """(windows, blocks, counts) of the nonzero (window, block) cells of one chunk."""
+    windows = (first_access + np.arange(len(addresses), dtype=np.int64)) // window_size
+    first_window = int(windows[0])
+    windows -= first_window
+    n_windows = int(windows[-1]) + 1
+    blocks, block_id = np.unique(addresses // np.uint64(block_size), return_inverse=True)
+    n_cells = n_windows * len(blocks)
+    if n_cells <= 4 * len(addresses):
+        counts = np.bincount(windows * len(blocks) + block_id, minlength=n_cells)
+        cells = np.flatnonzero(counts)
+        counts = counts[cells]
+    else:
+        # many small windows over many blocks: count the distinct cells only
+        cells, counts = np.unique(windows * len(blocks) + block_id, return_counts=True)
+    return cells // len(blocks) + first_window, blocks[cells % len(blocks)], counts
+
+
+def trace_hotness(path, block_size=DEFAULT_BLOCK_SIZE, window_size=DEFAULT_WINDOW_SIZE,
+                  chunk_size=DEFAULT_CHUNK_SIZE):
+    """HotnessMatrix of an address trace: accesses per (window, block).
+
+    block_indices are the accessed block numbers (address // block_size);
+    blocks that are never accessed are not columns of the matrix.
+    """
+    parts = []
+    n_accesses = 0
+    for addresses in iter_trace_chunks(path, chunk_size):
+        parts.append(_bin_chunk(addresses, n_accesses, block_size, window_size))
+        n_accesses += len(addresses)
+    if not parts:
+        return HotnessMatrix(np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64),
+                             np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64))
+
+    windows = np.concatenate([w for w, _, _ in parts])
+    blocks = np.concatenate([b for _, b, _ in parts])
+    counts = np.concatenate([c for _, _, c in parts])
+    block_indices, column = np.unique(blocks, return_inverse=True)
+    # a window cut by a chunk boundary appears in two chunks; merge its cells
+    key = windows * len(block_indices) + column
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+    starts = np.flatnonzero(np.concatenate(([True], key[1:] != key[:-1])))
+    counts = np.add.reduceat(counts[order], starts)
+    key = key[starts]
+
+    n_windows = -(-n_accesses // window_size)
+    nnz = np.bincount(key // len(block_indices), minlength=n_windows)
+    indptr = np.concatenate(([0], np.cumsum(nnz)))
+    return HotnessMatrix(block_indices.astype(np.int64), indptr,
+                         (key % len(block_indices)).astype(np.int32), counts.astype(np.int64))
@@ -0,0 +1,109 @@
+import numpy as np
+
+
+# Lag alignment of two memory traces by cross-correlation.
+#
+# The lag L maximizes sum_i a[i] * b[i + L] over the mean-removed series,
+# i.e. b starts L events later than a (L < 0: a starts later). The full
+# cross-correlation is computed with an FFT in O(n log n) instead of the
+# O(n^2) np.correlate(). Long traces are first averaged over blocks of
+# consecutive events so that the FFT runs on at most `coarse_size` points;
+# the coarse lag is then refined by comparing the Pearson correlation at
+# full resolution for the lags around it.
+
+# longest series correlated at full resolution
+COARSE_SIZE = 1 << 18
+
+
+def _fft_xcorr(a, b):
+    """(lags, corr) with corr = sum_i a[i] * b[i + lag] for every overlap."""
+    n = len(a) + len(b) - 1
+    size = 1 << (n - 1).bit_length()
+    spectrum = np.conj(np.fft.rfft(a, size)) * np.fft.rfft(b, size)
+    circular = np.fft.irfft(spectrum, size)
+    corr = np.concatenate((circular[size - (len(a) - 1):], circular[:len(b)]))
+    return np.arange(-(len(a) - 1), len(b)), corr
+
+
+def _overlap(a, b, lag):
+    """The parts of a and b paired by `lag`."""
+    start = max(0, -lag)
+    stop = min(len(a), len(b) - lag)
+    return a[start:stop], b[start + lag:stop + lag]
+
+
+def _block_mean(x, factor):
+    n = len(x) // factor * factor
+    return x[:n].reshape(-1, factor).mean(axis=1)
+
+
+def correlation_score(a, b, lag):
+    """Pearson correlation of the overlapping parts of a and b at `lag`."""
+    a_ov, b_ov = _overlap(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64), lag)
+    if len(a_ov) < 2:
+        return 0.0
+    a_ov = a_ov - a_ov.mean()
+    b_ov = b_ov - b_ov.mean()
+    denom = np.sqrt(np.dot(a_ov, a_ov) * np.dot(b_ov, b_ov))
+    return float(np.dot(a_ov, b_ov) / denom) if denom else 0.0
+
+
+def _scores_at_lags(a, b, lags):
+    """correlation_score() for every lag, sharing prefix sums between them."""
+    ca = np.concatenate(([0.0], np.cumsum(a)))
+    ca2 = np.concatenate(([0.0], np.cumsum(a * a)))
+    cb = np.concatenate(([0.0], np.cumsum(b)))
+    cb2 = np.concatenate(([0.0], np.cumsum(b * b)))
+    scores = []
+    for lag in lags:
+        start, stop = max(0, -lag), min(len(a), len(b) - lag)
+        m = stop - start
+        if m < 2:
+            scores.append(0.0)
+            continue
+        sa, saa = ca[stop] - ca[start], ca2[stop] - ca2[start]
+        sb, sbb = cb[stop + lag] - cb[start + lag], cb2[stop + lag] - cb2[start + lag]
+        sab = np.dot(a[start:stop], b[start + lag:stop + lag])
+        var = (saa - sa * sa / m) * (sbb - sb * sb / m)
+        scores.append(float((sab - sa * sb / m) / np.sqrt(var)) if var > 0 else 0.0)
+    return scores
+
+
+def find_lag(a, b, max_lag=None, coarse_size=COARSE_SIZE):
+    """Lag of b relative to a maximizing their cross-correlation.
+
+    `max_lag` bounds |lag| (default: any overlap). Returns (lag, score),
+    score being correlation_score() at that lag.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    a = a - a.mean()
+    b = b - b.mean()
+    lo, hi = -(len(a) - 1), len(b) - 1
+    if max_lag is not None:
+        lo, hi = max(lo, -max_lag), min(hi, max_lag)
+
+    factor = max(1, -(-max(len(a), len(b)) // coarse_size))
+    a_c, b_c = _block_mean(a, factor), _block_mean(b, factor)
+    if len(a_c) == 0 or len(b_c) == 0:
+        # shorter than one block
+        a_c, b_c, factor = a, b, 1
+    lags, corr = _fft_xcorr(a_c, b_c)
+    # a coarse lag just outside [lo, hi] may still refine to a lag inside
+    margin = factor if factor > 1 else 0
+    keep = (lags * factor >= lo - margin) & (lags * factor <= hi + margin)
+    lag = int(lags[keep][np.argmax(corr[keep])]) * factor
+
+    if factor > 1:
+        # refine around the coarse lag at full resolution
+        candidates = range(max(lo, lag - 2 * factor), min(hi, lag + 2 * factor) + 1)
+        # normalized, so that the overlap length does not bias the choice
+        scores = _scores_at_lags(a, b, candidates)
+        best = int(np.argmax(scores))
+        return candidates[best], scores[best]
+    return lag, correlation_score(a, b, lag)
+
+
+def apply_lag(a, b, lag):
+    """Trim a and b so that a[i] and b[i] are paired according to `lag`."""
+    return _overlap(a, b, lag)
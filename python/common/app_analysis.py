@@ -0,0 +1,232 @@
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from common.log_io import open_log
+from common.parse_cache import cached_parse
+from common.quantile import DEFAULT_K, StreamingStats
+
+
+# One record of the app_analysis tool output looks like:
+#
+#   Kernel ID: 12
+#     Kernel Name: void at::native::vectorized_elementwise_kernel<...>
+#     Access Count: 1024
+#     Tensor Working Set Size: 4096
+#     Memory Working Set Size: 8192
+#     Tensor Footprint Size: 16384
+#     Memory Footprint Size: 32768
+#
+# The whole record is matched by a single precompiled pattern over large text
+# blocks instead of running re.findall() on every line.
+_FIELD = r"[^\d\n]*(\d+)[^\n]*\n"
+_RECORD_RE = re.compile(
+    r"^[ \t]*Kernel ID:[^\d\n]*(\d+)[^\n]*\n"
+    r"([^\n]*)\n"
+    + _FIELD * 5,
+    re.MULTILINE,
+)
+_RECORD_MARKER = "Kernel ID:"
+
+_BLOCK_SIZE = 16 * 1024 * 1024
+# rows per batch fed to the streaming statistics
+_STATS_BATCH_ROWS = 65536
+# rough size of one record on disk, only used to size the first allocation
+_RECORD_BYTES_HINT = 256
+
+KernelRecord = namedtuple(
+    "KernelRecord",
+    [
+        "kernel_id",
+        "kernel_name",
+        "access_count",
+        "tensor_working_set",
+        "memory_working_set",
+        "tensor_footprint",
+        "memory_footprint",
+    ],
+)
+
+# numeric columns filled by fill_kernel_columns(), in KernelRecord order
+KERNEL_COLUMNS = (
+    "kernel_id",
+    "access_count",
+    "tensor_working_set",
+    "memory_working_set",
+    "tensor_footprint",
+    "memory_footprint",
+)
+
+
+def _clean_kernel_name(line):
+    return line.replace("  Kernel Name:", "").strip()
+
+
+def _iter_record_matches(file):
+    carry = ""
+    while True:
+        block = file.read(_BLOCK_SIZE)
+        if not block:
+            break
+        buf = carry + block
+        # everything before the last record header is complete
+        cut = buf.rfind(_RECORD_MARKER)
+        if cut == -1:
+            cut = len(buf)
+        cut = buf.rfind("\n", 0, cut) + 1
+        yield from _RECORD_RE.finditer(buf, 0, cut)
+        carry = buf[cut:]
+    if carry:
+        if not carry.endswith("\n"):
+            carry += "\n"
+        yield from _RECORD_RE.finditer(carry)
+
+
+def _record_from_match(m):
+    kid, name, access, tws, mws, tfp, mfp = m.groups()
+    return KernelRecord(
+        int(kid), _clean_kernel_name(name), int(access),
+        int(tws), int(mws), int(tfp), int(mfp),
+    )
+
+
+def iter_kernel_records(file):
+    """Lazily yield a KernelRecord for every kernel in an app_analysis log.
+
+    `file` is a path (plain or compressed log) or an already opened text
+    file object.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open_log(file) as f:
+            yield from iter_kernel_records(f)
+        return
+
+    for m in _iter_record_matches(file):
+        yield _record_from_match(m)
+
+
+def split_complete_records(text):
+    """Parse the complete records of `text`, the tail of a log still being written.
+
+    Returns (records, consumed): a list of KernelRecord and the number of
+    characters of `text` that never have to be looked at again. The rest,
+    a partial last line or a record that is not fully written yet, must be
+    passed again together with the text appended later.
+    """
+    cut = text.rfind("\n") + 1
+    header = text.rfind(_RECORD_MARKER, 0, cut)
+    if header == -1:
+        return [], cut
+    header = text.rfind("\n", 0, header) + 1
+    matches = list(_RECORD_RE.finditer(text, 0, header))
+    last = _RECORD_RE.match(text, header, cut)
+    consumed = header
+    if last is not None:
+        matches.append(last)
+        consumed = cut
+    return [_record_from_match(m) for m in matches], consumed
+
+
+def empty_kernel_columns(capacity):
+    """Allocate one int64 array per entry of KERNEL_COLUMNS."""
+    return {name: np.empty(capacity, dtype=np.int64) for name in KERNEL_COLUMNS}
+
+
+def _grow_columns(columns, capacity):
+    return {name: np.resize(col, capacity) for name, col in columns.items()}
+
+
+def fill_kernel_columns(records, columns, kernel_names=None, start=0):
+    """Write `records` into preallocated `columns`, starting at row `start`.
+
+    Kernel names are interned: the distinct names are appended to the
+    `kernel_names` list and the "name_id" column (if present) stores the index.
+    Stops when the arrays are full and returns the next free row; the
+    remaining records are left in the iterator.
+    """
+    kid_col = columns["kernel_id"]
+    access_col = columns["access_count"]
+    tws_col = columns["tensor_working_set"]
+    mws_col = columns["memory_working_set"]
+    tfp_col = columns["tensor_footprint"]
+    mfp_col = columns["memory_footprint"]
+    name_col = columns.get("name_id")
+    name_index = {}
+    if kernel_names is not None:
+        name_index = {name: i for i, name in enumerate(kernel_names)}
+
+    capacity = len(kid_col)
+    row = start
+    if row >= capacity:
+        return row
+    for rec in records:
+        kid_col[row] = rec.kernel_id
+        access_col[row] = rec.access_count
+        tws_col[row] = rec.tensor_working_set
+        mws_col[row] = rec.memory_working_set
+        tfp_col[row] = rec.tensor_footprint
+        mfp_col[row] = rec.memory_footprint
+        if name_col is not None:
+            name_id = name_index.get(rec.kernel_name)
+            if name_id is None:
+                name_id = len(kernel_names)
+                name_index[rec.kernel_name] = name_id
+                kernel_names.append(rec.kernel_name)
+            name_col[row] = name_id
+        row += 1
+        if row == capacity:
+            break
+    return row
+
+
+def load_kernel_columns(file_path, with_names=True):
+    """Parse an app_analysis log into columnar int64 arrays.
+
+    Returns (columns, kernel_names): `columns` maps every name in
+    KERNEL_COLUMNS (plus "name_id" when `with_names` is set) to an array with
+    one row per kernel, and kernel_names is the interned name table.
+    """
+    capacity = max(1024, os.path.getsize(file_path) // _RECORD_BYTES_HINT)
+    columns = empty_kernel_columns(capacity)
+    kernel_names = None
+    if with_names:
+        columns["name_id"] = np.empty(capacity, dtype=np.int64)
+        kernel_names = []
+
+    records = iter_kernel_records(file_path)
+    count = 0
+    while True:
+        count = fill_kernel_columns(records, columns, kernel_names, start=count)
+        if count < capacity:
+            break
+        capacity *= 2
+        columns = _grow_columns(columns, capacity)
+
+    columns = {name: col[:count].copy() for name, col in columns.items()}
+    return columns, kernel_names
+
+
+def cached_kernel_columns(file_path):
+    """load_kernel_columns() through the parse cache."""
+    return cached_parse(file_path, "app_analysis", load_kernel_columns)
+
+
+def stream_kernel_stats(file_path, k=DEFAULT_K):
+    """Summarize every column of KERNEL_COLUMNS with a StreamingStats.
+
+    Records are parsed in fixed-size batches, so memory does not grow with
+    the number of kernels. Returns {column: StreamingStats}; the results of
+    separate logs can be combined with StreamingStats.merge().
+    """
+    stats = {name: StreamingStats(k) for name in KERNEL_COLUMNS}
+    columns = empty_kernel_columns(_STATS_BATCH_ROWS)
+    records = iter_kernel_records(file_path)
+    while True:
+        rows = fill_kernel_columns(records, columns)
+        for name, col_stats in stats.items():
+            col_stats.update(columns[name][:rows])
+        if rows < _STATS_BATCH_ROWS:
+            break
+    return stats
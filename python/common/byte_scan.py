@@ -0,0 +1,141 @@
+import os
+import mmap
+
+import numpy as np
+
+from common.log_io import open_log
+
+
+# Vectorized scanning of text logs as bytes, shared by the log parsers
+# (common.tensor_events, common.hotness). A log is cut into newline-aligned
+# uint8 windows, of a memory map or of a decompressed stream, and its lines
+# and numbers are located and decoded with NumPy operations over a whole
+# window, without creating a Python string per line.
+
+NEWLINE = ord("\n")
+WINDOW_SIZE = 16 * 1024 * 1024
+# numbers longer than this do not fit in an int64 and are truncated
+MAX_DIGITS = 18
+MAX_HEX_DIGITS = 16
+
+
+def map_file(file_path):
+    """Memory-map `file_path` read-only (an empty bytes object for empty files)."""
+    if os.path.getsize(file_path) == 0:
+        return b""
+    with open(file_path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def iter_windows(mm, start=0, stop=None, window_size=WINDOW_SIZE):
+    """Yield newline-aligned uint8 views of mm[start:stop] of about `window_size` bytes."""
+    stop = len(mm) if stop is None else stop
+    while start < stop:
+        end = min(start + window_size, stop)
+        if end < stop:
+            nl = mm.rfind(b"\n", start, end)
+            if nl == -1:
+                # a single line longer than the window
+                nl = mm.find(b"\n", end, stop)
+            end = stop if nl == -1 else nl + 1
+        yield np.frombuffer(mm, dtype=np.uint8, count=end - start, offset=start)
+        start = end
+
+
+def iter_stream_windows(file_path, window_size=WINDOW_SIZE):
+    """Like iter_windows() for a (compressed) file read as a stream."""
+    with open_log(file_path, "rb") as f:
+        carry = b""
+        while True:
+            block = f.read(window_size)
+            if not block:
+                break
+            buf = carry + block
+            end = buf.rfind(b"\n") + 1
+            if end:
+                yield np.frombuffer(buf, dtype=np.uint8, count=end)
+            carry = buf[end:]
+        if carry:
+            yield np.frombuffer(carry, dtype=np.uint8)
+
+
+def line_bounds(win):
+    nl = np.flatnonzero(win == NEWLINE)
+    starts = np.concatenate(([0], nl + 1))
+    ends = np.concatenate((nl, [len(win)]))
+    keep = starts < ends
+    return starts[keep], ends[keep]
+
+
+def match_at(win, pos, ends, pattern):
+    """Vectorized win[pos:pos + len(pattern)] == pattern for every pos."""
+    ok = pos + len(pattern) <= ends
+    last = len(win) - 1
+    for k, byte in enumerate(pattern):
+        ok &= win[np.minimum(pos + k, last)] == byte
+    return ok
+
+
+def tag_end(win, starts, ends):
+    """Offset after a leading "[...] " tag of each line, or the line start."""
+    content = starts.copy()
+    tagged = win[starts] == ord("[")
+    if not tagged.any():
+        return content
+    close = np.flatnonzero((win[:-1] == ord("]")) & (win[1:] == ord(" ")))
+    if not len(close):
+        return content
+    j = np.searchsorted(close, starts)
+    found = j < len(close)
+    pos = close[np.minimum(j, len(close) - 1)]
+    tagged &= found & (pos + 2 <= ends)
+    content[tagged] = pos[tagged] + 2
+    return content
+
+
+def decode_decimal(win, run_starts, run_lens):
+    values = np.zeros(len(run_starts), dtype=np.int64)
+    last = len(win) - 1
+    for j in range(min(int(run_lens.max(initial=0)), MAX_DIGITS)):
+        digit = win[np.minimum(run_starts + j, last)].astype(np.int64) - ord("0")
+        values = np.where(j < run_lens, values * 10 + digit, values)
+    return values
+
+
+def decode_hex(win, pos, ends):
+    values = np.zeros(len(pos), dtype=np.uint64)
+    active = np.ones(len(pos), dtype=bool)
+    last = len(win) - 1
+    for j in range(MAX_HEX_DIGITS):
+        idx = pos + j
+        c = win[np.minimum(idx, last)]
+        lower = c | 0x20
+        is_num = (c >= ord("0")) & (c <= ord("9"))
+        is_alpha = (lower >= ord("a")) & (lower <= ord("f"))
+        active &= (is_num | is_alpha) & (idx < ends)
+        if not active.any():
+            break
+        h = np.where(is_num, c.astype(np.uint64) - ord("0"), lower.astype(np.uint64) - ord("a") + 10)
+        values = np.where(active, values * np.uint64(16) + h, values)
+    return values
+
+
+def digit_runs(win):
+    """Start and (exclusive) end offsets of all runs of decimal digits."""
+    is_digit = (win - ord("0")) < 10
+    run_starts = np.flatnonzero(is_digit[1:] > is_digit[:-1]) + 1
+    run_ends = np.flatnonzero(is_digit[:-1] > is_digit[1:]) + 1
+    if len(win) and is_digit[0]:
+        run_starts = np.concatenate(([0], run_starts))
+    if len(win) and is_digit[-1]:
+        run_ends = np.concatenate((run_ends, [len(win)]))
+    return run_starts, run_ends
+
+
+def gather_lines(win, starts, ends):
+    """Concatenate win[starts[i]:ends[i]] + b"\\n" for all i into one array."""
+    mark = np.zeros(len(win) + 1, dtype=np.int8)
+    mark[starts] = 1
+    mark[ends] -= 1
+    mask = np.cumsum(mark[:-1], dtype=np.int8).view(bool)
+    return np.insert(win[mask], np.cumsum(ends - starts), NEWLINE)
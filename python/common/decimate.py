@@ -0,0 +1,66 @@
+import numpy as np
+
+
+# Min/max decimation for plotting long series. The points are cut into
+# equal buckets of consecutive events, about one per output pixel, and each
+# bucket is replaced by its minimum and maximum, in the order they occur.
+# Every peak and trough therefore survives, and matplotlib draws a few
+# thousand points whatever the length of the trace.
+#
+# The x positions only depend on the series length and the bucket count
+# (the start and the middle of every bucket), so series of the same length
+# share the same x and can still be used together, e.g. in fill_between().
+
+# pixels per inch assumed when no dpi is given (rasterized artists are
+# saved at dpi=600 by the plot scripts)
+DEFAULT_DPI = 600
+
+
+def axes_pixels(ax, dpi=DEFAULT_DPI):
+    """(width, height) of `ax` in pixels at `dpi` pixels per inch."""
+    fig = ax.get_figure()
+    pos = ax.get_position()
+    return (max(1, int(pos.width * fig.get_figwidth() * dpi)),
+            max(1, int(pos.height * fig.get_figheight() * dpi)))
+
+
+def plot_buckets(ax, dpi=DEFAULT_DPI):
+    """Number of buckets matching the width of `ax` at `dpi` pixels per inch."""
+    return axes_pixels(ax, dpi)[0]
+
+
+def minmax_decimate(y, n_buckets, x_offset=0):
+    """Reduce `y` to at most 2 * n_buckets points keeping the extrema of every bucket.
+
+    Returns (x, y) arrays; x is the event index (plus `x_offset`). Series
+    that are already short enough are returned unchanged.
+    """
+    y = np.asarray(y)
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(x_offset, x_offset + n), y
+
+    size = -(-n // n_buckets)
+    n_full = n // size
+    buckets = y[:n_full * size].reshape(n_full, size)
+    lo_pos = buckets.argmin(axis=1)
+    hi_pos = buckets.argmax(axis=1)
+    rows = np.arange(n_full)
+    lo, hi = buckets[rows, lo_pos], buckets[rows, hi_pos]
+    if n_full * size < n:
+        rest = y[n_full * size:]
+        lo_pos = np.append(lo_pos, rest.argmin())
+        hi_pos = np.append(hi_pos, rest.argmax())
+        lo, hi = np.append(lo, rest.min()), np.append(hi, rest.max())
+
+    lo_first = lo_pos <= hi_pos
+    y_out = np.empty(2 * len(lo), dtype=y.dtype)
+    y_out[0::2] = np.where(lo_first, lo, hi)
+    y_out[1::2] = np.where(lo_first, hi, lo)
+
+    starts = np.arange(len(lo)) * size
+    ends = np.minimum(starts + size, n)
+    x_out = np.empty(2 * len(lo), dtype=np.float64)
+    x_out[0::2] = starts
+    x_out[1::2] = (starts + ends - 1) / 2
+    return x_out + x_offset, y_out
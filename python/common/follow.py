@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import hashlib
+
+import numpy as np
+
+from common.app_analysis import KERNEL_COLUMNS, empty_kernel_columns, fill_kernel_columns, split_complete_records
+from common.log_io import is_compressed, write_json_atomic
+
+
+# Follow mode: an app_analysis log that accelprof is still writing is parsed
+# incrementally. Every poll reads only the bytes appended since the last one,
+# starting at an offset stored in a checkpoint, so a restarted process
+# resumes where the previous one stopped.
+# A line is only parsed once its newline has been written.
+#
+# State of one log, in <state dir>/<sha1 of abs path>/:
+#   checkpoint.json     {path, dev, ino, offset, rows, names, names_bytes}
+#   <column>.bin        raw int64 values of KERNEL_COLUMNS + name_id, append-only
+#   kernel_names.txt    interned kernel names, one per line, append-only
+#
+# The data files are appended before the checkpoint is replaced, so after a
+# crash they are truncated back to the sizes the checkpoint records.
+
+DEFAULT_STATE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "cgo26-ae", "follow")
+
+_CHECKPOINT_FILE = "checkpoint.json"
+_NAMES_FILE = "kernel_names.txt"
+_READ_SIZE = 16 * 1024 * 1024
+_ITEM_SIZE = np.dtype(np.int64).itemsize
+
+FOLLOW_COLUMNS = KERNEL_COLUMNS + ("name_id",)
+
+
+class KernelLogFollower:
+    """Incrementally parse a growing app_analysis log into persisted columns."""
+
+    def __init__(self, log_path, state_dir=None):
+        if is_compressed(log_path):
+            raise ValueError(f"Cannot follow a compressed log: {log_path}")
+        self.log_path = os.path.abspath(log_path)
+        state_dir = state_dir or DEFAULT_STATE_DIR
+        self.state_dir = os.path.join(state_dir, hashlib.sha1(self.log_path.encode()).hexdigest())
+        os.makedirs(self.state_dir, exist_ok=True)
+        # bumped on every reset, so readers of earlier rows can tell
+        self.generation = 0
+        self._load_checkpoint()
+
+    def _path(self, name):
+        return os.path.join(self.state_dir, name)
+
+    def _load_checkpoint(self):
+        try:
+            with open(self._path(_CHECKPOINT_FILE), "r") as f:
+                ckpt = json.load(f)
+        except (OSError, ValueError):
+            ckpt = {}
+        self.dev = ckpt.get("dev")
+        self.ino = ckpt.get("ino")
+        self.offset = ckpt.get("offset", 0)
+        self.rows = ckpt.get("rows", 0)
+        self.names_bytes = ckpt.get("names_bytes", 0)
+
+        # drop data appended after the last checkpoint
+        for name in FOLLOW_COLUMNS:
+            with open(self._path(f"{name}.bin"), "ab") as f:
+                f.truncate(self.rows * _ITEM_SIZE)
+        with open(self._path(_NAMES_FILE), "ab") as f:
+            f.truncate(self.names_bytes)
+        with open(self._path(_NAMES_FILE), "rb") as f:
+            self.kernel_names = f.read().decode().split("\n")[:-1]
+
+    def _save_checkpoint(self):
+        write_json_atomic(self._path(_CHECKPOINT_FILE), {
+            "path": self.log_path,
+            "dev": self.dev,
+            "ino": self.ino,
+            "offset": self.offset,
+            "rows": self.rows,
+            "names": len(self.kernel_names),
+            "names_bytes": self.names_bytes,
+        })
+
+    def reset(self):
+        """Forget all parsed data and start again from byte 0."""
+        self.offset = self.rows = self.names_bytes = 0
+        self.generation += 1
+        self._save_checkpoint()
+        self._load_checkpoint()
+
+    def _append(self, records):
+        n_names = len(self.kernel_names)
+        columns = empty_kernel_columns(len(records))
+        columns["name_id"] = np.empty(len(records), dtype=np.int64)
+        count = fill_kernel_columns(iter(records), columns, self.kernel_names)
+        for name in FOLLOW_COLUMNS:
+            with open(self._path(f"{name}.bin"), "ab") as f:
+                columns[name][:count].tofile(f)
+        new_names = "".join(name + "\n" for name in self.kernel_names[n_names:]).encode()
+        with open(self._path(_NAMES_FILE), "ab") as f:
+            f.write(new_names)
+        self.rows += count
+        self.names_bytes += len(new_names)
+
+    def poll(self):
+        """Parse the records appended since the last poll; returns how many."""
+        st = os.stat(self.log_path)
+        if (self.dev, self.ino) != (st.st_dev, st.st_ino) or st.st_size < self.offset:
+            # a new or truncated log
+            self.reset()
+            self.dev, self.ino = st.st_dev, st.st_ino
+            self._save_checkpoint()
+
+        rows = self.rows
+        read_size = _READ_SIZE
+        with open(self.log_path, "rb") as f:
+            while self.offset < st.st_size:
+                f.seek(self.offset)
+                data = f.read(min(read_size, st.st_size - self.offset))
+                # decode complete lines only, a multi-byte character may be cut
+                text = data[:data.rfind(b"\n") + 1].decode()
+                records, consumed = split_complete_records(text)
+                if consumed == 0:
+                    if len(data) < read_size:
+                        break  # wait for the rest of the record
+                    read_size *= 2
+                    continue
+                if records:
+                    self._append(records)
+                self.offset += len(text[:consumed].encode())
+                self._save_checkpoint()
+        return self.rows - rows
+
+    def columns(self):
+        """The parsed columns (read-only memory maps), one row per kernel so far."""
+        if self.rows == 0:
+            return {name: np.empty(0, dtype=np.int64) for name in FOLLOW_COLUMNS}
+        return {
+            name: np.memmap(self._path(f"{name}.bin"), dtype=np.int64, mode="r", shape=(self.rows,))
+            for name in FOLLOW_COLUMNS
+        }
+
+
+def follow_logs(log_folder, on_update, state_dir=None, interval=10.0):
+    """Poll the app_analysis logs of `log_folder` every `interval` seconds until Ctrl-C.
+
+    Logs created later are picked up too. `on_update` is called with a
+    {file name: KernelLogFollower} dict of the logs that got new records or
+    were reset (a new or truncated log, see KernelLogFollower.generation);
+    the first call for a log also covers the records of earlier runs
+    restored from its checkpoint.
+
+    A log that cannot be followed is dropped with a warning, the others
+    are still followed: a compressed one for good, one that cannot be read
+    (e.g. deleted since the listing) until it is listed again.
+    """
+    followers = {}
+    skipped = set()
+    # last error of every log that failed, warned about once
+    errors = {}
+    try:
+        while True:
+            updated = {}
+            for file in sorted(os.listdir(log_folder)):
+                if not file.endswith(".log") or file in skipped:
+                    continue
+                follower = followers.get(file)
+                is_new = follower is None
+                try:
+                    if is_new:
+                        follower = followers[file] = KernelLogFollower(os.path.join(log_folder, file), state_dir)
+                    generation = follower.generation
+                    if follower.poll() or (is_new and follower.rows) or follower.generation != generation:
+                        updated[file] = follower
+                    errors.pop(file, None)
+                except ValueError as e:
+                    print(f"Warning: not following {file}: {e}")
+                    followers.pop(file, None)
+                    skipped.add(file)
+                except OSError as e:
+                    if errors.get(file) != str(e):
+                        print(f"Warning: cannot read {file}, dropped: {e}")
+                        errors[file] = str(e)
+                    followers.pop(file, None)
+            if updated:
+                on_update(updated)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,203 @@
+import os
+import json
+
+import numpy as np
+
+from common.byte_scan import decode_decimal, digit_runs, iter_stream_windows, line_bounds
+
+
+# Sparse time/block hotness matrices of the accelprof time_hotness_cpu tool.
+#
+# The log has one line of memory block indices (2MB blocks), then one line
+# per time step (every 1M accesses) with the access count of every block:
+#
+#   134217728 134217729 134217730 ...
+#   0 12 0 ...
+#   3 0 0 ...
+#
+# Most counts are zero, so the matrix is kept in CSR form over the time
+# steps: the nonzero counts of step t are counts[indptr[t]:indptr[t + 1]],
+# in the blocks (column positions into block_indices) blocks[...]. The log
+# is decoded window by window with the vectorized number scanner of
+# common.byte_scan, so no dense row list is built.
+#
+# Matrices computed from raw address traces (common.address_trace) use the
+# same class, with block_indices holding the accessed block numbers.
+#
+# A parsed log is saved next to it as a sidecar folder "<log>.hotness" of
+# .npy files that later runs memory-map instead of parsing the text again.
+
+SIDECAR_SUFFIX = ".hotness"
+_SIDECAR_VERSION = 1
+_META_FILE = "hotness.json"
+_ARRAYS = ("block_indices", "indptr", "blocks", "counts")
+
+
+class HotnessMatrix:
+    """Access counts per (time step, memory block), as CSR over the time steps."""
+
+    def __init__(self, block_indices, indptr, blocks, counts):
+        self.block_indices = np.asarray(block_indices)
+        self.indptr = np.asarray(indptr)
+        self.blocks = np.asarray(blocks)
+        self.counts = np.asarray(counts)
+
+    @property
+    def n_steps(self):
+        return len(self.indptr) - 1
+
+    @property
+    def n_blocks(self):
+        return len(self.block_indices)
+
+    @property
+    def nnz(self):
+        return len(self.counts)
+
+    def steps(self):
+        """Time step of every stored count (the COO row indices)."""
+        return np.repeat(np.arange(self.n_steps), np.diff(self.indptr))
+
+    def to_coo(self):
+        """(steps, blocks, counts) of the nonzero entries."""
+        return self.steps(), self.blocks, self.counts
+
+    def block_totals(self):
+        """Total access count of every block."""
+        return np.bincount(self.blocks, weights=self.counts, minlength=self.n_blocks).astype(np.int64)
+
+    def max_count(self):
+        return int(self.counts.max()) if self.nnz else 0
+
+    def select_blocks(self, positions):
+        """Matrix restricted to the blocks at `positions` (in that order)."""
+        positions = np.asarray(positions, dtype=np.int64)
+        remap = np.full(self.n_blocks, -1, dtype=np.int64)
+        remap[positions] = np.arange(len(positions))
+        new_blocks = remap[self.blocks]
+        keep = new_blocks >= 0
+        nnz_per_step = np.bincount(self.steps()[keep], minlength=self.n_steps)
+        indptr = np.concatenate(([0], np.cumsum(nnz_per_step)))
+        return HotnessMatrix(self.block_indices[positions], indptr,
+                             new_blocks[keep].astype(np.int32), self.counts[keep])
+
+    def drop_zero_blocks(self):
+        """Matrix without the blocks that are never accessed."""
+        return self.select_blocks(np.flatnonzero(self.block_totals() > 0))
+
+    def coarsen(self, window_factor=1, block_factor=1):
+        """Matrix of window_factor time steps x block_factor blocks per cell.
+
+        Blocks are merged by their index (block_indices // block_factor),
+        so 2MB blocks with block_factor=2 become 4MB blocks.
+        """
+        block_indices, column = np.unique(self.block_indices // block_factor, return_inverse=True)
+        key = (self.steps() // window_factor) * len(block_indices) + column[self.blocks]
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+        starts = np.flatnonzero(np.concatenate(([True], key[1:] != key[:-1])))
+        counts = np.add.reduceat(self.counts[order], starts) if len(key) else self.counts[:0]
+        key = key[starts]
+        n_steps = -(-self.n_steps // window_factor)
+        nnz = np.bincount(key // max(1, len(block_indices)), minlength=n_steps)
+        return HotnessMatrix(block_indices, np.concatenate(([0], np.cumsum(nnz))),
+                             (key % max(1, len(block_indices))).astype(np.int32), counts)
+
+    def to_dense(self):
+        """Dense (n_steps, n_blocks) array, as in the log."""
+        dense = np.zeros((self.n_steps, self.n_blocks), dtype=self.counts.dtype)
+        dense[self.steps(), self.blocks] = self.counts
+        return dense
+
+    def save(self, path, source=None):
+        """Write the arrays as .npy files into folder `path`.
+
+        `source` is the stat result of the parsed log, recorded so that a
+        sidecar of a changed log is not reused.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        meta = {"version": _SIDECAR_VERSION}
+        if source is not None:
+            meta.update(size=source.st_size, mtime_ns=source.st_mtime_ns)
+        with open(os.path.join(path, _META_FILE), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        mmap_mode = "r" if mmap else None
+        return cls(*[np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+                     for name in _ARRAYS])
+
+
+def parse_hotness(file_path):
+    """Stream a (possibly compressed) time_hotness_cpu log into a HotnessMatrix."""
+    block_indices = None
+    nnz_chunks, block_chunks, count_chunks = [], [], []
+    for win in iter_stream_windows(file_path):
+        starts, ends = line_bounds(win)
+        run_starts, run_ends = digit_runs(win)
+        # numbers of every line; lines without numbers are skipped
+        first_run = np.searchsorted(run_starts, starts)
+        n_runs = np.searchsorted(run_starts, ends) - first_run
+        first_run, n_runs = first_run[n_runs > 0], n_runs[n_runs > 0]
+        if not len(first_run):
+            continue
+        skip = 0
+        if block_indices is None:
+            skip = n_runs[0]
+            block_indices = decode_decimal(win, run_starts[:skip], run_ends[:skip] - run_starts[:skip])
+            first_run, n_runs = first_run[1:], n_runs[1:]
+        if np.any(n_runs > len(block_indices)):
+            raise ValueError(f"{file_path}: a time step has {int(n_runs.max())} counts "
+                             f"for {len(block_indices)} blocks")
+        # only the counts other than a plain "0" are decoded
+        lens = run_ends - run_starts
+        idx = np.flatnonzero((lens > 1) | (win[run_starts] != ord("0")))
+        idx = idx[idx >= skip]
+        values = decode_decimal(win, run_starts[idx], lens[idx])
+        idx, values = idx[values != 0], values[values != 0]
+        row = np.searchsorted(first_run, idx, side="right") - 1
+        nnz_chunks.append(np.bincount(row, minlength=len(first_run)))
+        block_chunks.append((idx - first_run[row]).astype(np.int32))
+        count_chunks.append(values)
+
+    if block_indices is None:
+        raise ValueError(f"{file_path}: no block indices found")
+    nnz = np.concatenate(nnz_chunks) if nnz_chunks else np.empty(0, dtype=np.int64)
+    indptr = np.concatenate(([0], np.cumsum(nnz)))
+    blocks = np.concatenate(block_chunks) if block_chunks else np.empty(0, dtype=np.int32)
+    counts = np.concatenate(count_chunks) if count_chunks else np.empty(0, dtype=np.int64)
+    return HotnessMatrix(block_indices, indptr, blocks, counts)
+
+
+def sidecar_path(file_path):
+    return file_path + SIDECAR_SUFFIX
+
+
+def load_hotness(file_path, sidecar=True):
+    """HotnessMatrix of a log, from its sidecar when it is up to date.
+
+    With `sidecar` the parsed matrix is saved next to the log; a log folder
+    that is not writable only costs the reuse.
+    """
+    path = sidecar_path(file_path)
+    st = os.stat(file_path)
+    if sidecar:
+        try:
+            with open(os.path.join(path, _META_FILE), "r") as f:
+                meta = json.load(f)
+            if (meta.get("version") == _SIDECAR_VERSION and meta.get("size") == st.st_size
+                    and meta.get("mtime_ns") == st.st_mtime_ns):
+                return HotnessMatrix.load(path)
+        except (OSError, ValueError):
+            pass
+
+    matrix = parse_hotness(file_path)
+    if sidecar:
+        try:
+            matrix.save(path, source=st)
+        except OSError as e:
+            print(f"Warning: cannot write hotness sidecar {path}: {e}")
+    return matrix
@@ -0,0 +1,238 @@
+import os
+import json
+import shutil
+import tempfile
+
+import numpy as np
+
+from common.hotness import load_hotness, sidecar_path
+
+
+# Multi-resolution pyramid of a HotnessMatrix, stored as tiles on disk.
+#
+# Level 0 is the matrix itself (time steps x blocks); every level above
+# halves both axes, a cell of level L aggregating 2**L x 2**L cells of
+# level 0 by their sum and by their max. Levels are built from the sparse
+# entries of the level below, up to the first level that fits in a single
+# tile, so the full matrix is never densified.
+#
+# Every level is cut into TILE x TILE tiles and only tiles holding a
+# nonzero cell are stored:
+#
+#   pyramid.json              shape, levels, tile size, source stat
+#   block_indices.npy         memory block of every column (kept blocks)
+#   all_block_indices.npy     every block of the log, accessed or not
+#   level_<L>.tiles.npy       sorted keys (tile row * tile columns + tile col)
+#   level_<L>.sum.npy         (n_tiles, TILE, TILE) int64
+#   level_<L>.max.npy         (n_tiles, TILE, TILE) int64, L > 0 (level 0
+#                             cells are single counts, sum == max)
+#
+# The tile arrays are memory-mapped, so window() reads only the tiles that
+# overlap the requested window at the requested level.
+
+TILE = 256
+AGGREGATES = ("sum", "max")
+_META_FILE = "pyramid.json"
+_PYRAMID_VERSION = 1
+
+
+def _coarsen(t, b, s, m, n_b):
+    """Cells of the next level from the (row-major) cells of a level with n_b columns."""
+    n_b_next = -(-n_b // 2)
+    key = (t >> 1) * n_b_next + (b >> 1)
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+    starts = np.flatnonzero(np.concatenate(([True], key[1:] != key[:-1])))
+    s = np.add.reduceat(s[order], starts) if len(key) else s
+    m = np.maximum.reduceat(m[order], starts) if len(key) else m
+    key = key[starts]
+    return key // n_b_next, key % n_b_next, s, m
+
+
+def _write_level(path, level, t, b, s, m, n_b, tile):
+    n_tile_cols = -(-n_b // tile)
+    tile_key = (t // tile) * n_tile_cols + b // tile
+    keys = np.unique(tile_key)
+    tile_id = np.searchsorted(keys, tile_key)
+    np.save(os.path.join(path, f"level_{level}.tiles.npy"), keys)
+    for name, values in (("sum", s), ("max", m)):
+        if level == 0 and name == "max":
+            continue
+        if not len(keys):
+            # a zero-sized array cannot be memory-mapped
+            np.save(os.path.join(path, f"level_{level}.{name}.npy"), np.zeros((0, tile, tile), dtype=np.int64))
+            continue
+        out = np.lib.format.open_memmap(
+            os.path.join(path, f"level_{level}.{name}.npy"), mode="w+",
+            dtype=np.int64, shape=(len(keys), tile, tile))
+        out[tile_id, t % tile, b % tile] = values
+        out.flush()
+        del out
+
+
+class HotnessPyramid:
+    """Tiled sum/max aggregates of a hotness matrix at 2**L coarsening."""
+
+    def __init__(self, path, meta, mmap=True):
+        self.path = path
+        self.meta = meta
+        self.tile = meta["tile"]
+        self.n_steps = meta["n_steps"]
+        self.n_blocks = meta["n_blocks"]
+        self.n_levels = meta["levels"]
+        mmap_mode = "r" if mmap else None
+        self.block_indices = np.load(os.path.join(path, "block_indices.npy"))
+        self.all_block_indices = np.load(os.path.join(path, "all_block_indices.npy"))
+        self._keys = [np.load(os.path.join(path, f"level_{level}.tiles.npy"))
+                      for level in range(self.n_levels)]
+        self._tiles = {}
+        for name in AGGREGATES:
+            self._tiles[name] = []
+            for level in range(self.n_levels):
+                if level == 0 and name == "max":
+                    self._tiles[name].append(self._tiles["sum"][0])
+                    continue
+                tiles_path = os.path.join(path, f"level_{level}.{name}.npy")
+                # an empty level cannot be memory-mapped
+                mode = mmap_mode if len(self._keys[level]) else None
+                self._tiles[name].append(np.load(tiles_path, mmap_mode=mode))
+        # tiles copied by window() calls, for checking what a query touched
+        self.tiles_read = 0
+
+    @classmethod
+    def build(cls, matrix, path, all_block_indices=None, tile=TILE, source=None):
+        """Write the pyramid of HotnessMatrix `matrix` into folder `path` and open it."""
+        os.makedirs(path, exist_ok=True)
+        t, b, s = matrix.to_coo()
+        t, b = t.astype(np.int64), b.astype(np.int64)
+        s = np.asarray(s, dtype=np.int64)
+        m = s
+        n_t, n_b = matrix.n_steps, matrix.n_blocks
+        level = 0
+        while True:
+            _write_level(path, level, t, b, s, m, n_b, tile)
+            level += 1
+            if n_t <= tile and n_b <= tile:
+                break
+            t, b, s, m = _coarsen(t, b, s, m, n_b)
+            n_t, n_b = -(-n_t // 2), -(-n_b // 2)
+
+        np.save(os.path.join(path, "block_indices.npy"), np.asarray(matrix.block_indices))
+        if all_block_indices is None:
+            all_block_indices = matrix.block_indices
+        np.save(os.path.join(path, "all_block_indices.npy"), np.asarray(all_block_indices))
+        meta = {
+            "version": _PYRAMID_VERSION, "tile": tile, "levels": level,
+            "n_steps": matrix.n_steps, "n_blocks": matrix.n_blocks,
+            "nnz": matrix.nnz, "max_count": matrix.max_count(),
+        }
+        if source is not None:
+            meta.update(size=source.st_size, mtime_ns=source.st_mtime_ns)
+        with open(os.path.join(path, _META_FILE), "w") as f:
+            json.dump(meta, f)
+        return cls(path, meta)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, _META_FILE), "r") as f:
+            meta = json.load(f)
+        return cls(path, meta, mmap)
+
+    def level_shape(self, level):
+        """(steps, blocks) of a level."""
+        f = 1 << level
+        return -(-self.n_steps // f), -(-self.n_blocks // f)
+
+    def level_for(self, t0, t1, b0, b1, max_steps, max_blocks):
+        """Finest level at which the window fits in max_steps x max_blocks cells."""
+        for level in range(self.n_levels):
+            f = 1 << level
+            if (-(-t1 // f) - t0 // f <= max_steps) and (-(-b1 // f) - b0 // f <= max_blocks):
+                return level
+        return self.n_levels - 1
+
+    def window(self, t0=0, t1=None, b0=0, b1=None, level=0, agg="max"):
+        """Dense aggregates of time steps [t0, t1) x blocks [b0, b1) at `level`.
+
+        Returns (array, extent): array[i, j] aggregates the cells of level
+        `level` covering the window, and extent = (t_start, t_stop,
+        b_start, b_stop) is the level-0 range it spans (window rounded out
+        to whole cells).
+        """
+        t1 = self.n_steps if t1 is None else t1
+        b1 = self.n_blocks if b1 is None else b1
+        if not (0 <= t0 < t1 <= self.n_steps and 0 <= b0 < b1 <= self.n_blocks):
+            raise ValueError(f"Window [{t0}, {t1}) x [{b0}, {b1}) outside "
+                             f"{self.n_steps} steps x {self.n_blocks} blocks")
+        if agg not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate {agg!r}, expected one of {AGGREGATES}")
+        f, tile = 1 << level, self.tile
+        lt0, lt1 = t0 // f, -(-t1 // f)
+        lb0, lb1 = b0 // f, -(-b1 // f)
+        out = np.zeros((lt1 - lt0, lb1 - lb0), dtype=np.int64)
+
+        keys, tiles = self._keys[level], self._tiles[agg][level]
+        n_tile_cols = -(-self.level_shape(level)[1] // tile)
+        for tr in range(lt0 // tile, (lt1 - 1) // tile + 1):
+            lo = tr * n_tile_cols + lb0 // tile
+            hi = tr * n_tile_cols + (lb1 - 1) // tile
+            # stored tiles of this tile row overlapping the window
+            for i in range(np.searchsorted(keys, lo), np.searchsorted(keys, hi, side="right")):
+                tc = int(keys[i]) - tr * n_tile_cols
+                r0, r1 = max(lt0, tr * tile), min(lt1, (tr + 1) * tile)
+                c0, c1 = max(lb0, tc * tile), min(lb1, (tc + 1) * tile)
+                out[r0 - lt0:r1 - lt0, c0 - lb0:c1 - lb0] = \
+                    tiles[i, r0 - tr * tile:r1 - tr * tile, c0 - tc * tile:c1 - tc * tile]
+                self.tiles_read += 1
+        extent = (lt0 * f, min(lt1 * f, self.n_steps), lb0 * f, min(lb1 * f, self.n_blocks))
+        return out, extent
+
+
+def pyramid_path(file_path):
+    return os.path.join(sidecar_path(file_path), "pyramid")
+
+
+def _build(file_path, path, tile, sidecar, source=None):
+    hotness = load_hotness(file_path, sidecar)
+    return HotnessPyramid.build(hotness.drop_zero_blocks(), path, hotness.block_indices, tile, source)
+
+
+def temporary_pyramid(matrix, all_block_indices=None, tile=TILE):
+    """HotnessPyramid of `matrix` built into a temporary directory."""
+    tmp = tempfile.TemporaryDirectory(prefix="hotness_pyramid_")
+    pyramid = HotnessPyramid.build(matrix, tmp.name, all_block_indices, tile)
+    # the tiles live as long as the pyramid
+    pyramid._tmp = tmp
+    return pyramid
+
+
+def _build_temporary(file_path, tile, sidecar):
+    hotness = load_hotness(file_path, sidecar)
+    return temporary_pyramid(hotness.drop_zero_blocks(), hotness.block_indices, tile)
+
+
+def load_pyramid(file_path, sidecar=True, tile=TILE):
+    """HotnessPyramid of the accessed blocks of a time_hotness_cpu log.
+
+    With `sidecar` the pyramid is kept in the log's sidecar folder and
+    rebuilt when the log changed; otherwise (or if that folder is not
+    writable) it is built into a temporary directory.
+    """
+    if not sidecar:
+        return _build_temporary(file_path, tile, sidecar)
+    path = pyramid_path(file_path)
+    st = os.stat(file_path)
+    try:
+        pyramid = HotnessPyramid.load(path)
+        meta = pyramid.meta
+        if (meta.get("version") == _PYRAMID_VERSION and meta.get("tile") == tile
+                and meta.get("size") == st.st_size and meta.get("mtime_ns") == st.st_mtime_ns):
+            return pyramid
+    except (OSError, ValueError, KeyError):
+        pass
+    shutil.rmtree(path, ignore_errors=True)
+    try:
+        return _build(file_path, path, tile, sidecar, st)
+    except OSError as e:
+        print(f"Warning: cannot write hotness pyramid {path}: {e}")
+        return _build_temporary(file_path, tile, sidecar)
@@ -0,0 +1,186 @@
+import itertools
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from common.parallel import resolve_jobs
+from common.prefetch_plan import plan_schedule
+from common.tensor_events import cached_tensor_events
+from common.uvm_replay import (DEFAULT_BLOCK_SIZE, LARGE_TENSOR_THRESHOLD, OBJECT_GRANULARITY,
+                               TENSOR_GRANULARITY, allocation_map, replay)
+from common.uvm_schedule import Schedule, load_schedule
+
+
+# Search over the prefetch knobs of the UVM advisor, scored by the offline
+# replay (common.uvm_replay) of a recorded run instead of GPU reruns.
+#
+# A configuration sets:
+#   mode         PREFETCH_MODE, object or tensor granularity
+#   threshold    LARGE_TENSOR_THRESHOLD; tensors up to it are not
+#                prefetched. The profile only has ids for tensors above the
+#                recorded threshold (1MB), so only larger values can be tried
+#   num_streams  num_prefetch_streams
+#   lookahead    lookahead of common.prefetch_plan, or None for the profile
+#                as the advisor issues it today
+#
+# Every configuration gives (migrated bytes, stall time); the result is the
+# Pareto frontier of the two. Strategies:
+#   grid     every combination of the knob values
+#   random   `samples` combinations drawn from the grid
+#   halving  successive halving over random combinations: all are replayed
+#            on the first ops of the run, the best 1/eta (by Pareto rank,
+#            then stall time), and at least the frontier, are replayed on
+#            eta times more ops, and so on until all survivors are on the
+#            frontier or the next round would be the whole run. The
+#            frontiers of all rounds and the survivors are then replayed on
+#            the whole run
+#
+# Configurations are spread over a process pool; every worker loads the
+# inputs once and caches the planned schedules by (lookahead, ops).
+
+MB = 1024 * 1024
+
+DEFAULT_SPACE = {
+    "mode": (OBJECT_GRANULARITY, TENSOR_GRANULARITY),
+    "threshold": (LARGE_TENSOR_THRESHOLD, 4 * MB, 16 * MB),
+    "num_streams": (1, 2, 3, 4, 8),
+    "lookahead": (None, 0, 2, 8, 32),
+}
+STRATEGIES = ("grid", "random", "halving")
+
+_worker = {}
+
+
+def grid_configs(space=DEFAULT_SPACE):
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def random_configs(space=DEFAULT_SPACE, n=32, seed=0):
+    configs = grid_configs(space)
+    return random.Random(seed).sample(configs, min(n, len(configs)))
+
+
+def config_label(config):
+    lookahead = "profile" if config["lookahead"] is None else config["lookahead"]
+    return (f"mode={config['mode']} threshold={config['threshold'] // 1024}KB "
+            f"streams={config['num_streams']} lookahead={lookahead}")
+
+
+def pareto_ranks(points):
+    """Non-dominated sorting rank (0 = frontier) of every (x, y) point, both minimized."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    ranks = np.full(len(points), -1, dtype=np.int64)
+    rank = 0
+    while (ranks < 0).any():
+        left = np.flatnonzero(ranks < 0)
+        p = points[left]
+        dominated = ((p[None, :, 0] <= p[:, None, 0]) & (p[None, :, 1] <= p[:, None, 1])
+                     & ((p[None, :, 0] < p[:, None, 0]) | (p[None, :, 1] < p[:, None, 1]))).any(axis=1)
+        ranks[left[~dominated]] = rank
+        rank += 1
+    return ranks
+
+
+def pareto_front(points):
+    """Indices of the non-dominated points, by increasing x."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    front = np.flatnonzero(pareto_ranks(points) == 0)
+    return front[np.argsort(points[front, 0], kind="stable")]
+
+
+def _filter_tensors(schedule, allocations, threshold):
+    if threshold <= LARGE_TENSOR_THRESHOLD:
+        return schedule
+    ten_size = allocations[1]
+    entries = {}
+    for op, mem, ten in schedule.items():
+        known = ten[ten < len(ten_size)]
+        entries[op] = (mem, known[ten_size[known] > threshold])
+    return Schedule.from_dict(entries)
+
+
+def _init_worker(profile, tensor_log, capacity, block_size, model):
+    _worker.clear()
+    _worker.update(usage=load_schedule(profile), allocations=allocation_map(cached_tensor_events(tensor_log)),
+                   capacity=capacity, block_size=block_size, model=model, schedules={})
+
+
+def _evaluate(task):
+    """(migrated bytes, stall time) of one configuration on the first `n_ops` profiled ops."""
+    config, n_ops = task
+    w = _worker
+    usage = w["usage"].head(n_ops)
+    key = (config["lookahead"], n_ops)
+    if key not in w["schedules"]:
+        w["schedules"][key] = (usage if config["lookahead"] is None else
+                               plan_schedule(usage, w["allocations"], w["capacity"], config["lookahead"],
+                                             w["block_size"]))
+    schedule = _filter_tensors(w["schedules"][key], w["allocations"], config["threshold"])
+    model = dict(w["model"], num_streams=config["num_streams"])
+    result = replay(usage, schedule, w["allocations"], config["mode"], w["capacity"],
+                    block_size=w["block_size"], **model)
+    totals = result.totals()
+    return totals["migrated_bytes"], totals["stall_time"]
+
+
+def search(profile, tensor_log, capacity, strategy="halving", space=DEFAULT_SPACE, samples=32, eta=3,
+           min_ops=None, seed=0, jobs=1, block_size=DEFAULT_BLOCK_SIZE, model=None):
+    """Configurations replayed on the whole run and the number of replays done.
+
+    Returns ([(config, (migrated bytes, stall time))], replays), the
+    replays counting every round of successive halving.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}, expected one of {STRATEGIES}")
+    if strategy == "halving" and eta < 2:
+        raise ValueError(f"Successive halving needs eta >= 2, got {eta}")
+    configs = grid_configs(space) if strategy == "grid" else random_configs(space, samples, seed)
+    n_ops = load_schedule(profile).n_ops
+    # fill the parse cache before the workers read it
+    cached_tensor_events(tensor_log)
+    init = (profile, tensor_log, capacity, block_size, model or {})
+    jobs = min(resolve_jobs(jobs), max(1, len(configs)))
+    replays = 0
+
+    def run(pool, tasks):
+        nonlocal replays
+        replays += len(tasks)
+        if pool is None:
+            return [_evaluate(task) for task in tasks]
+        return list(pool.map(_evaluate, tasks))
+
+    pool = None
+    if jobs > 1:
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=init)
+    else:
+        _init_worker(*init)
+    try:
+        if strategy != "halving":
+            return list(zip(configs, run(pool, [(c, n_ops) for c in configs]))), replays
+        # budgets n_ops / eta^k, ..., n_ops / eta; the frontier of a short
+        # run need not be that of the whole run, so the union of the
+        # frontiers of all rounds goes on to the whole run
+        rounds = max(1, int(np.ceil(np.log(max(len(configs), 1)) / np.log(eta))))
+        budget = max(n_ops // eta ** (rounds - 1), min_ops or 1, 1)
+        alive = list(range(len(configs)))
+        finalists = set()
+        while budget < n_ops:
+            scores = run(pool, [(configs[i], budget) for i in alive])
+            ranks = pareto_ranks(scores)
+            front = [alive[k] for k in np.flatnonzero(ranks == 0)]
+            finalists.update(front)
+            if len(front) == len(alive):
+                break
+            order = sorted(range(len(alive)), key=lambda k: (ranks[k], scores[k][1], scores[k][0]))
+            # never fewer than the frontier of the round
+            keep = max(1, len(alive) // eta, len(front))
+            alive = [alive[k] for k in order[:keep]]
+            budget *= eta
+        finalists.update(alive)
+        configs = [configs[i] for i in sorted(finalists)]
+        return list(zip(configs, run(pool, [(c, n_ops) for c in configs]))), replays
+    finally:
+        if pool is not None:
+            pool.shutdown()
@@ -0,0 +1,127 @@
+import io
+import os
+import json
+import bz2
+import gzip
+import lzma
+import tempfile
+
+
+# Raw logs may be kept gzip/xz/bz2-compressed. Compression is detected from
+# the magic bytes of the file, so a renamed file still works, and compressed
+# files are stream-decompressed through a large read buffer. Compressed files
+# cannot be memory-mapped or seeked cheaply; callers that do so for plain
+# files check is_compressed() and fall back to a single streaming pass.
+
+READ_BUFFER_SIZE = 8 * 1024 * 1024
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+
+# (format name, file extension, magic bytes, codec module)
+_CODECS = (
+    ("gz", ".gz", b"\x1f\x8b", gzip),
+    ("xz", ".xz", b"\xfd7zXZ\x00", lzma),
+    ("bz2", ".bz2", b"BZh", bz2),
+)
+COMPRESSION_FORMATS = tuple(name for name, _, _, _ in _CODECS)
+COMPRESSED_EXTENSIONS = tuple(ext for _, ext, _, _ in _CODECS)
+
+_MAGIC_SIZE = max(len(magic) for _, _, magic, _ in _CODECS)
+
+
+def _codec_of(file_path):
+    with open(file_path, "rb") as f:
+        head = f.read(_MAGIC_SIZE)
+    for _, _, magic, codec in _CODECS:
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def is_compressed(file_path):
+    """Whether `file_path` is a gzip, xz or bz2 file."""
+    return _codec_of(file_path) is not None
+
+
+def strip_compression_ext(file_name):
+    """Drop a trailing .gz/.xz/.bz2 from a file name."""
+    for ext in COMPRESSED_EXTENSIONS:
+        if file_name.endswith(ext):
+            return file_name[:-len(ext)]
+    return file_name
+
+
+def find_log(file_path):
+    """Return `file_path`, or its compressed variant if only that one exists.
+
+    If neither exists `file_path` is returned unchanged, so callers keep
+    their usual "file not found" handling.
+    """
+    if os.path.exists(file_path):
+        return file_path
+    for ext in COMPRESSED_EXTENSIONS:
+        if os.path.exists(file_path + ext):
+            return file_path + ext
+    return file_path
+
+
+def list_logs(folder, suffix=".log"):
+    """Sorted names of the logs in `folder` ending in `suffix`, compressed or not.
+
+    A log kept both plain and compressed is listed once, under the file
+    find_log() picks: the plain one, else the first of COMPRESSED_EXTENSIONS.
+    """
+    variants = {}
+    for name in os.listdir(folder):
+        stem = strip_compression_ext(name)
+        if stem.endswith(suffix):
+            variants.setdefault(stem, []).append(name)
+    order = ("",) + COMPRESSED_EXTENSIONS
+    logs = []
+    for stem, names in sorted(variants.items()):
+        names.sort(key=lambda name: order.index(name[len(stem):]))
+        if len(names) > 1:
+            print(f"Warning: reading {names[0]}, skipping {', '.join(names[1:])}")
+        logs.append(names[0])
+    return sorted(logs)
+
+
+def open_log(file_path, mode="r", buffer_size=READ_BUFFER_SIZE):
+    """Open a plain or compressed log for reading, in text ("r") or binary ("rb") mode."""
+    codec = _codec_of(file_path)
+    if codec is None:
+        return open(file_path, mode, buffering=buffer_size)
+    f = io.BufferedReader(codec.open(file_path, "rb"), buffer_size)
+    if "b" in mode:
+        return f
+    return io.TextIOWrapper(f)
+
+
+def open_output(file_path, compress=None, buffer_size=WRITE_BUFFER_SIZE):
+    """Open `file_path` for writing text, compressed with `compress` if given.
+
+    `compress` is one of COMPRESSION_FORMATS (or None); the matching file
+    extension is appended to the path. Returns (file object, actual path).
+    """
+    if not compress:
+        return open(file_path, "w", buffering=buffer_size), file_path
+    for name, ext, _, codec in _CODECS:
+        if name == compress:
+            break
+    else:
+        raise ValueError(f"Unknown compression format: {compress}")
+
+    file_path += ext
+    if codec is gzip:
+        # level 6 is much faster than the default 9 for a few % in size
+        raw = gzip.open(file_path, "wb", compresslevel=6)
+    else:
+        raw = codec.open(file_path, "wb")
+    return io.TextIOWrapper(io.BufferedWriter(raw, buffer_size)), file_path
+
+
+def write_json_atomic(path, obj):
+    """Write `obj` as JSON to `path` through a temporary file, so readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp_path, path)
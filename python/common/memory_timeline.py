@@ -0,0 +1,201 @@
+import os
+import json
+
+import numpy as np
+
+from common.rank_arrays import load_rank_column
+
+
+# MemoryTimeline: the memory in use after every Malloc/Free tensor event,
+# indexed for range queries.
+#
+# Range max/min use a block sparse table: the values are cut in blocks of
+# BLOCK events, and level j of the table holds the max (min) of 2**j
+# consecutive block maxima (minima). A query scans at most two partial
+# blocks and combines two overlapping table entries, so it costs
+# O(BLOCK) instead of O(n), while the index takes only
+# O(n / BLOCK * log(n / BLOCK)) memory.
+#
+# save() writes one .npy file per array into a folder; load() memory-maps
+# them, so a saved timeline (index included) opens without a parse.
+
+BLOCK = 64
+
+_META_FILE = "timeline.json"
+
+
+def _sparse_table(values, reduce):
+    block_values = reduce.reduceat(values, np.arange(0, len(values), BLOCK))
+    table = [block_values]
+    half = 1
+    while 2 * half <= len(block_values):
+        prev = table[-1]
+        cur = prev.copy()
+        # entries near the end cover the remaining blocks only
+        reduce(prev[:-half], prev[half:], out=cur[:-half])
+        table.append(cur)
+        half *= 2
+    return np.stack(table)
+
+
+class MemoryTimeline:
+    """Memory in use (bytes) after every event, with O(1)-table range max/min queries."""
+
+    def __init__(self, values, kind=None, ptr=None, max_table=None, min_table=None):
+        self.values = np.asarray(values)
+        self.kind = kind
+        self.ptr = ptr
+        if len(self.values) and (max_table is None or min_table is None):
+            max_table = _sparse_table(self.values, np.maximum)
+            min_table = _sparse_table(self.values, np.minimum)
+        self._max_table = max_table
+        self._min_table = min_table
+
+    @classmethod
+    def from_events(cls, events, device=None, field="total_allocated"):
+        """Timeline of a TENSOR_EVENT_DTYPE array, of one device if given."""
+        if device is not None:
+            events = events[events["device"] == device]
+        return cls(events[field], events["kind"], events["ptr"])
+
+    @classmethod
+    def from_rank_arrays(cls, prefix, rank, mmap=True):
+        """Timeline of one rank written by common.rank_arrays.write_rank_arrays()."""
+        return cls(
+            load_rank_column(prefix, rank, "alloc", mmap),
+            load_rank_column(prefix, rank, "kind", mmap),
+            load_rank_column(prefix, rank, "ptr", mmap),
+        )
+
+    def __len__(self):
+        return len(self.values)
+
+    def at(self, k):
+        """Memory in use after event k."""
+        return int(self.values[k])
+
+    def _check_range(self, start, stop):
+        n = len(self.values)
+        start = 0 if start is None else start
+        stop = n if stop is None else stop
+        start, stop, _ = slice(start, stop).indices(n)
+        if start >= stop:
+            raise ValueError(f"Empty event range [{start}, {stop})")
+        return start, stop
+
+    def _range_reduce(self, start, stop, table, reduce):
+        start, stop = self._check_range(start, stop)
+        first_block = -(-start // BLOCK)
+        last_block = stop // BLOCK
+        if first_block >= last_block:
+            return int(reduce(self.values[start:stop]))
+        level = (last_block - first_block).bit_length() - 1
+        parts = [table[level, first_block], table[level, last_block - (1 << level)]]
+        if start < first_block * BLOCK:
+            parts.append(reduce(self.values[start:first_block * BLOCK]))
+        if last_block * BLOCK < stop:
+            parts.append(reduce(self.values[last_block * BLOCK:stop]))
+        return int(reduce(parts))
+
+    def range_max(self, start=None, stop=None):
+        """Peak memory over events [start, stop)."""
+        return self._range_reduce(start, stop, self._max_table, np.max)
+
+    def range_min(self, start=None, stop=None):
+        """Lowest memory over events [start, stop)."""
+        return self._range_reduce(start, stop, self._min_table, np.min)
+
+    def range_argmax(self, start=None, stop=None):
+        """First event of [start, stop) where the range peak is reached."""
+        start, stop = self._check_range(start, stop)
+        peak = self.range_max(start, stop)
+        head_stop = min(stop, -(-start // BLOCK) * BLOCK)
+        head = np.flatnonzero(self.values[start:head_stop] == peak)
+        if len(head):
+            return start + int(head[0])
+        # first full block reaching the peak, then the tail
+        first_block, last_block = head_stop // BLOCK, stop // BLOCK
+        blocks = np.flatnonzero(self._max_table[0, first_block:last_block] == peak)
+        pos = (first_block + int(blocks[0])) * BLOCK if len(blocks) else last_block * BLOCK
+        return pos + int(np.flatnonzero(self.values[pos:stop] == peak)[0])
+
+    def peak(self):
+        """(event, bytes) of the global peak."""
+        k = self.range_argmax()
+        return k, self.at(k)
+
+    def local_peaks(self):
+        """Events where the memory stops growing and starts to shrink.
+
+        A plateau is reported at its first event; the first (last) event is
+        a peak if the timeline starts by shrinking (ends while growing).
+        """
+        changes = np.flatnonzero(np.diff(self.values))
+        if not len(changes):
+            return np.empty(0, dtype=np.int64)
+        rising = self.values[changes + 1] > self.values[changes]
+        peaks = changes[:-1][rising[:-1] & ~rising[1:]] + 1
+        if not rising[0]:
+            peaks = np.concatenate(([0], peaks))
+        if rising[-1]:
+            peaks = np.append(peaks, changes[-1] + 1)
+        return peaks
+
+    def top_peaks(self, n=10, min_distance=1):
+        """The `n` highest local peaks at least `min_distance` events apart.
+
+        Returns a list of (event, bytes), highest first.
+        """
+        peaks = self.local_peaks()
+        order = np.argsort(-self.values[peaks], kind="stable")
+        selected = []
+        for k in peaks[order].tolist():
+            if all(abs(k - s) >= min_distance for s in selected):
+                selected.append(k)
+                if len(selected) == n:
+                    break
+        return [(k, self.at(k)) for k in selected]
+
+    def columns(self):
+        """The backing arrays, by name (for save() or common.parse_cache)."""
+        columns = {"values": self.values}
+        if self.kind is not None:
+            columns["kind"] = self.kind
+        if self.ptr is not None:
+            columns["ptr"] = self.ptr
+        if len(self.values):
+            columns["max_table"] = self._max_table
+            columns["min_table"] = self._min_table
+        return columns
+
+    @classmethod
+    def from_columns(cls, columns):
+        return cls(
+            columns["values"], columns.get("kind"), columns.get("ptr"),
+            columns.get("max_table"), columns.get("min_table"),
+        )
+
+    def save(self, path):
+        """Write the timeline and its index as .npy files into folder `path`."""
+        os.makedirs(path, exist_ok=True)
+        columns = self.columns()
+        for name, col in columns.items():
+            np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(col))
+        with open(os.path.join(path, _META_FILE), "w") as f:
+            json.dump({"columns": list(columns), "block": BLOCK}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Open a timeline written by save(), memory-mapped unless `mmap` is False."""
+        with open(os.path.join(path, _META_FILE), "r") as f:
+            meta = json.load(f)
+        mmap_mode = "r" if mmap else None
+        columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in meta["columns"]
+        }
+        if meta["block"] != BLOCK:
+            # index built with another block size
+            columns.pop("max_table", None)
+            columns.pop("min_table", None)
+        return cls.from_columns(columns)
@@ -0,0 +1,77 @@
+import os
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+
+
+# chunks smaller than this are not worth a worker process
+MIN_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def resolve_jobs(jobs):
+    """Map a --jobs value to a worker count; 0 or less means one per core."""
+    if jobs is None or jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def split_file(file_path, n_chunks, min_chunk_size=MIN_CHUNK_SIZE):
+    """Split a file into at most `n_chunks` newline-aligned byte ranges.
+
+    Returns a list of (start, stop) offsets covering the whole file in order;
+    every range except possibly the last ends right after a newline.
+    """
+    size = os.path.getsize(file_path)
+    n_chunks = max(1, min(n_chunks, size // max(1, min_chunk_size)))
+    if size == 0 or n_chunks == 1:
+        return [(0, size)]
+
+    with open(file_path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        bounds = [0]
+        for i in range(1, n_chunks):
+            nl = mm.find(b"\n", max(bounds[-1], size * i // n_chunks))
+            if nl == -1:
+                break
+            if nl + 1 > bounds[-1]:
+                bounds.append(nl + 1)
+        mm.close()
+    if bounds[-1] != size:
+        bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def map_file_chunks(func, file_path, jobs, min_chunk_size=MIN_CHUNK_SIZE):
+    """Run func(file_path, start, stop) over newline-aligned chunks of a file.
+
+    The chunks are processed by a pool of `jobs` processes and the results
+    are returned as a list in file order, so concatenating them gives the
+    same result as a serial pass. `func` must be a module-level function.
+    """
+    jobs = resolve_jobs(jobs)
+    ranges = split_file(file_path, jobs, min_chunk_size)
+    if jobs == 1 or len(ranges) == 1:
+        return [func(file_path, start, stop) for start, stop in ranges]
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(ranges))) as pool:
+        futures = [pool.submit(func, file_path, start, stop) for start, stop in ranges]
+        return [future.result() for future in futures]
+
+
+def map_files(func, file_paths, jobs):
+    """Return [func(path) for path in file_paths], computed by a pool of `jobs` processes.
+
+    Files are submitted largest first so the wall time is close to the time
+    of the biggest file. `func` must be a module-level function and should
+    return compact results (e.g. NumPy arrays), which are cheap to pickle.
+    """
+    jobs = min(resolve_jobs(jobs), max(1, len(file_paths)))
+    if jobs == 1:
+        return [func(path) for path in file_paths]
+
+    order = sorted(range(len(file_paths)), key=lambda i: os.path.getsize(file_paths[i]), reverse=True)
+    results = [None] * len(file_paths)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {i: pool.submit(func, file_paths[i]) for i in order}
+        for i, future in futures.items():
+            results[i] = future.result()
+    return results
@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+
+from common.log_io import write_json_atomic
+
+
+# Parsed logs are cached as one .npy file per column, so a rerun of a process
+# or plot script can np.load(..., mmap_mode="r") them instead of running the
+# regexes over the raw text again.
+#
+# Layout of the cache directory:
+#   stat/<sha1 of abs path>.json        {size, mtime_ns, digest} of a log file
+#   entries/<digest>-<parser>-v<N>/     one parsed log
+#       meta.json                       column names + interned string table
+#       <column>.npy
+#
+# The stat records only skip re-hashing a file whose size and mtime did not
+# change; entries are addressed by the content digest, so a copied or moved
+# log hits the same entry.
+#
+# Environment:
+#   PARSE_CACHE=0         disable the cache
+#   PARSE_CACHE_DIR       cache location (default ~/.cache/cgo26-ae/parse_cache)
+#   PARSE_CACHE_MAX_MB    size bound, least recently used entries are evicted
+#                         first (default 8192)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "cgo26-ae", "parse_cache")
+DEFAULT_MAX_MB = 8192
+
+_HASH_BLOCK_SIZE = 8 * 1024 * 1024
+_META_FILE = "meta.json"
+
+
+def cache_enabled():
+    return os.environ.get("PARSE_CACHE", "1") != "0"
+
+
+def get_cache_dir():
+    return os.environ.get("PARSE_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+
+def get_max_bytes():
+    return int(float(os.environ.get("PARSE_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+
+
+def hash_file(file_path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        block = f.read(_HASH_BLOCK_SIZE)
+        while block:
+            h.update(block)
+            block = f.read(_HASH_BLOCK_SIZE)
+    return h.hexdigest()
+
+
+def file_digest(file_path, cache_dir=None):
+    """Content digest of `file_path`, re-hashed only when size or mtime change."""
+    cache_dir = cache_dir or get_cache_dir()
+    abs_path = os.path.abspath(file_path)
+    st = os.stat(abs_path)
+    stat_dir = os.path.join(cache_dir, "stat")
+    stat_path = os.path.join(stat_dir, hashlib.sha1(abs_path.encode()).hexdigest() + ".json")
+
+    try:
+        with open(stat_path, "r") as f:
+            record = json.load(f)
+        if record["size"] == st.st_size and record["mtime_ns"] == st.st_mtime_ns:
+            return record["digest"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    digest = hash_file(abs_path)
+    try:
+        os.makedirs(stat_dir, exist_ok=True)
+        write_json_atomic(stat_path, {
+            "path": abs_path,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "digest": digest,
+        })
+    except OSError:
+        pass
+    return digest
+
+
+def _entry_size(entry_dir):
+    total = 0
+    for name in os.listdir(entry_dir):
+        total += os.path.getsize(os.path.join(entry_dir, name))
+    return total
+
+
+def _load_entry(entry_dir, mmap=True):
+    with open(os.path.join(entry_dir, _META_FILE), "r") as f:
+        meta = json.load(f)
+    mmap_mode = "r" if mmap else None
+    columns = {}
+    for name in meta["columns"]:
+        columns[name] = np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+    # bump the mtime of meta.json, it is the LRU clock used by evict()
+    os.utime(os.path.join(entry_dir, _META_FILE))
+    return columns, meta["strings"]
+
+
+def _store_entry(entries_dir, entry_name, file_path, columns, strings):
+    os.makedirs(entries_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=entries_dir, prefix=".tmp-")
+    try:
+        for name, col in columns.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(col))
+        write_json_atomic(os.path.join(tmp_dir, _META_FILE), {
+            "source": os.path.abspath(file_path),
+            "columns": list(columns.keys()),
+            "strings": strings,
+            "created": time.time(),
+        })
+        os.rename(tmp_dir, os.path.join(entries_dir, entry_name))
+    except OSError:
+        # another process stored the same entry first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def evict(cache_dir=None, max_bytes=None, keep=()):
+    """Remove least recently used entries until the cache fits in `max_bytes`."""
+    cache_dir = cache_dir or get_cache_dir()
+    max_bytes = get_max_bytes() if max_bytes is None else max_bytes
+    entries_dir = os.path.join(cache_dir, "entries")
+    if not os.path.isdir(entries_dir):
+        return
+
+    entries = []
+    total = 0
+    for name in os.listdir(entries_dir):
+        entry_dir = os.path.join(entries_dir, name)
+        meta_path = os.path.join(entry_dir, _META_FILE)
+        if name.startswith(".") or not os.path.exists(meta_path):
+            continue
+        size = _entry_size(entry_dir)
+        entries.append((os.path.getmtime(meta_path), name, size))
+        total += size
+
+    entries.sort()
+    for _, name, size in entries:
+        if total <= max_bytes:
+            break
+        if name in keep:
+            continue
+        shutil.rmtree(os.path.join(entries_dir, name), ignore_errors=True)
+        total -= size
+
+
+def cached_parse(file_path, parser_name, parse_fn, version=1, mmap=True):
+    """Return parse_fn(file_path) from the cache, parsing and storing it on a miss.
+
+    `parse_fn` returns (columns, strings): a dict of NumPy arrays and an
+    optional list of strings (e.g. interned kernel names). Bump `version`
+    whenever the output of `parse_fn` changes. Cached columns are returned as
+    read-only memory maps unless `mmap` is False.
+    """
+    if not cache_enabled():
+        return parse_fn(file_path)
+
+    cache_dir = get_cache_dir()
+    entries_dir = os.path.join(cache_dir, "entries")
+    entry_name = f"{file_digest(file_path, cache_dir)}-{parser_name}-v{version}"
+    entry_dir = os.path.join(entries_dir, entry_name)
+
+    if os.path.exists(os.path.join(entry_dir, _META_FILE)):
+        try:
+            return _load_entry(entry_dir, mmap)
+        except (OSError, ValueError, KeyError):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+    columns, strings = parse_fn(file_path)
+    try:
+        _store_entry(entries_dir, entry_name, file_path, columns, strings)
+        evict(cache_dir, keep=(entry_name,))
+    except OSError as e:
+        print(f"Warning: cannot write parse cache {cache_dir}: {e}", file=sys.stderr)
+    return columns, strings
@@ -0,0 +1,180 @@
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from common.uvm_replay import DEFAULT_BLOCK_SIZE
+from common.uvm_schedule import Schedule
+
+
+# Capacity-aware prefetch schedules for the UVM advisor, planned from a
+# profile of the tensors (TenAlloc) and objects (MemAlloc) every op uses.
+# The advisor prefetches exactly the profile: everything an op uses, at the
+# start of that op, whatever the device memory size. The planner instead
+#
+#   1. prunes: the profile is run through an LRU model of the device
+#      memory (one entry per tensor or object, in bytes of the blocks it
+#      spans), an op at a time as the advisor runs it: its prefetches at
+#      its start, then its touches in any order. Only the uses that miss
+#      in it are transferred; the resident ones are still listed, first
+#      in the op, since prefetching a resident range only refreshes it
+#      and keeps the op's own transfers from evicting it;
+#   2. shifts: a use at op j is prefetched at op j - lookahead, so the
+#      transfer overlaps the ops in between;
+#   3. bounds: under LRU a block prefetched at op i survives to its use
+#      at op j only if the distinct bytes the ops [i, j] use, its own
+#      included, fit in the device memory. A prefetch is issued at the
+#      earliest op i >= j - lookahead where they do, at the latest at op j
+#      itself, as the advisor does. A block prefetched inside the reuse
+#      window of a resident use, or of an earlier placed prefetch, for a use
+#      at or after the end of that window, also takes from that window's
+#      slack; it is issued later if the slack is too small. Overlapping
+#      windows (spread over the advisor's streams) are so bounded together.
+#
+# The prefetches of one op are listed by op of use, so the advisor's round
+# robin over its streams starts the most urgent transfers first.
+#
+# Objects are modeled whole, while the device only migrates and refreshes
+# the blocks of an object an op touches, so object schedules can fault or
+# move slightly (well under 1%) more than the profile.
+
+
+def _lru_uses(usage_items, sizes, capacity):
+    """Misses, reuse windows and refreshes of the uses in an LRU of `capacity` bytes.
+
+    Every op is modeled as the advisor runs it: the ids resident at its
+    start are refreshed (their prefetch only moves them up), then the
+    others are transferred. The device evicts blocks, not whole ids, so
+    the least recent id may be left partly resident; its next use is a
+    miss, for the missing part. Misses are (row of usage_items, id);
+    reuse windows are [previous op, op, slack, id] of every use of a
+    fully or partly resident id, slack being the bytes the LRU could
+    still take between the two uses without evicting any of it, whatever
+    the order of the touches inside an op; refreshes are {op: fully
+    resident ids}.
+    """
+    lru = OrderedDict()
+    resident = {}
+    used = 0
+    misses, windows, refreshes = [], [], {}
+    for row, (op, ids) in enumerate(usage_items):
+        ids = list(dict.fromkeys(ids))
+        present = [k for k in ids if k in lru]
+        for k in present:
+            # the order of the touches inside an op is unknown: everything
+            # used since the start of k's last op may be more recent
+            above = 0
+            for y in reversed(lru):
+                if lru[y] < lru[k]:
+                    break
+                if y != k:
+                    above += resident[y]
+            windows.append([lru[k], op, capacity - above - resident[k], k])
+        for k in present:
+            lru[k] = op
+            lru.move_to_end(k)
+        full = [k for k in present if resident[k] == sizes[k]]
+        if full:
+            refreshes[op] = full
+        for k in ids:
+            if k in full:
+                continue
+            misses.append((row, k))
+            used += sizes[k] - resident.get(k, 0)
+            resident[k] = sizes[k]
+            lru[k] = op
+            lru.move_to_end(k)
+            while used > capacity and len(lru) > 1:
+                y = next(iter(lru))
+                evicted = min(resident[y], used - capacity)
+                resident[y] -= evicted
+                used -= evicted
+                if resident[y] == 0:
+                    del lru[y], resident[y]
+    windows.sort(key=lambda w: w[1])
+    return misses, windows, refreshes
+
+
+def plan_prefetches(usage_items, sizes, capacity, lookahead):
+    """{issue op: [ids]} for the uses [(op, ids)] of one granularity.
+
+    `sizes` is indexed by id; ids of unknown size are never prefetched.
+    """
+    sizes = np.asarray(sizes, dtype=np.int64).tolist()
+    usage_items = [(op, [k for k in ids.tolist() if 0 <= k < len(sizes) and sizes[k] > 0])
+                   for op, ids in usage_items if op > 0]
+    misses, reuses, refreshes = _lru_uses(usage_items, sizes, capacity)
+
+    plan = {}
+    # reuse windows [start op, end op, slack bytes, id] of the resident uses
+    # and of the prefetches placed so far, by end op
+    windows = deque()
+    next_reuse = 0
+    for row, k in misses:
+        op = usage_items[row][0]
+        size = sizes[k]
+        first = max(op - lookahead, 1)
+        while next_reuse < len(reuses) and reuses[next_reuse][1] <= op:
+            windows.append(reuses[next_reuse])
+            next_reuse += 1
+        while windows and windows[0][1] < first:
+            windows.popleft()
+
+        # walk back over the ops in [first, op] while their distinct bytes,
+        # k included, still fit
+        seen = {k}
+        total = size
+        issue = first
+        for r in range(row, -1, -1):
+            u, ids = usage_items[r]
+            if u < first:
+                break
+            new = [x for x in ids if x not in seen]
+            seen.update(new)
+            total += sum(sizes[x] for x in new)
+            if total > capacity:
+                issue = min(u + 1, op)
+                break
+
+        # nor may it push out what another window keeps resident: a block
+        # prefetched at `issue` is more recent than everything last used
+        # before it, and than the refreshes of op itself
+        moved = True
+        while moved and issue < op:
+            moved = False
+            for w in windows:
+                if w[0] < issue <= w[1] <= op and w[2] < size and w[3] != k:
+                    issue = min(w[1] + 1, op)
+                    moved = True
+        if issue < op:
+            for w in windows:
+                if w[0] < issue <= w[1] <= op and w[3] != k:
+                    w[2] -= size
+            windows.append([issue, op, capacity - total if total <= capacity else 0, k])
+        plan.setdefault(issue, []).append(k)
+    # the resident uses of an op go first: the op's own transfers would
+    # otherwise evict them before it touches them
+    for op, ids in refreshes.items():
+        plan[op] = list(dict.fromkeys(ids + plan.get(op, [])))
+    return plan
+
+
+def resident_sizes(ptr, size, block_size):
+    """Bytes of the `block_size` blocks each (ptr, size) range spans, 0 for empty ranges."""
+    ptr = np.asarray(ptr, dtype=np.int64)
+    size = np.asarray(size, dtype=np.int64)
+    blocks = (ptr + np.maximum(size, 1) - 1) // block_size - ptr // block_size + 1
+    return np.where(size > 0, blocks * block_size, 0)
+
+
+def plan_schedule(usage, allocations, capacity, lookahead, block_size=DEFAULT_BLOCK_SIZE):
+    """Schedule for the profile `usage` on a device of `capacity` bytes.
+
+    `allocations` are the arrays of common.uvm_replay.allocation_map();
+    sizes are rounded to the `block_size` blocks that migrate.
+    """
+    ten_ptr, ten_size, mem_ptr, mem_size = allocations
+    ten = plan_prefetches([(op, t) for op, _, t in usage.items()],
+                          resident_sizes(ten_ptr, ten_size, block_size), capacity, lookahead)
+    mem = plan_prefetches([(op, m) for op, m, _ in usage.items()],
+                          resident_sizes(mem_ptr, mem_size, block_size), capacity, lookahead)
+    return Schedule.from_dict({op: (mem.get(op, []), ten.get(op, [])) for op in set(ten) | set(mem)})
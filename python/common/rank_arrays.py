@@ -0,0 +1,93 @@
+import os
+import re
+
+import numpy as np
+
+
+# Per-rank Malloc/Free event arrays, written by figure_15/process.py and
+# memory-mapped by the plot scripts. For every device index found in the log:
+#
+#   <prefix>_<rank>.alloc.bin   int64   total allocated bytes after the event
+#   <prefix>_<rank>.kind.bin    int8    MALLOC / FREE (common.tensor_events)
+#   <prefix>_<rank>.ptr.bin     uint64  tensor pointer
+#
+# The files are headerless native-endian arrays, appended to chunk by chunk,
+# so the number of events is the file size divided by the item size.
+
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+# events split per round, bounds the temporary index arrays
+_CHUNK_ROWS = 1 << 20
+
+# (file suffix, TENSOR_EVENT_DTYPE field, dtype)
+RANK_COLUMNS = (
+    ("alloc", "total_allocated", np.int64),
+    ("kind", "kind", np.int8),
+    ("ptr", "ptr", np.uint64),
+)
+
+
+def rank_array_path(prefix, rank, column="alloc"):
+    return f"{prefix}_{rank}.{column}.bin"
+
+
+def write_rank_arrays(events, prefix, buffer_size=WRITE_BUFFER_SIZE):
+    """Split TENSOR_EVENT_DTYPE `events` by device into per-rank arrays.
+
+    The arrays of every rank already under `prefix` are removed first, so
+    ranks of an earlier run that are not in `events` do not linger. Returns
+    the sorted list of ranks written.
+    """
+    folder, base = os.path.split(prefix)
+    pattern = _rank_file_pattern(base, "|".join(column for column, _, _ in RANK_COLUMNS))
+    for name in os.listdir(folder or "."):
+        if pattern.match(name):
+            os.remove(os.path.join(folder, name))
+
+    writers = {}
+    try:
+        for start in range(0, len(events), _CHUNK_ROWS):
+            chunk = events[start:start + _CHUNK_ROWS]
+            device = chunk["device"]
+            # stable sort keeps the event order inside every rank
+            order = np.argsort(device, kind="stable")
+            ranks, first = np.unique(device[order], return_index=True)
+            bounds = np.append(first, len(order))
+            for rank, lo, hi in zip(ranks.tolist(), bounds[:-1], bounds[1:]):
+                rows = chunk[order[lo:hi]]
+                if rank not in writers:
+                    writers[rank] = [
+                        open(rank_array_path(prefix, rank, column), "wb", buffering=buffer_size)
+                        for column, _, _ in RANK_COLUMNS
+                    ]
+                for f, (_, field, dtype) in zip(writers[rank], RANK_COLUMNS):
+                    f.write(np.ascontiguousarray(rows[field], dtype=dtype).data)
+    finally:
+        for files in writers.values():
+            for f in files:
+                f.close()
+    return sorted(writers)
+
+
+def _rank_file_pattern(base, columns):
+    return re.compile(re.escape(base) + r"_(\d+)\.(?:" + columns + r")\.bin$")
+
+
+def list_ranks(prefix):
+    """Sorted ranks that have arrays written under `prefix`."""
+    folder, base = os.path.split(prefix)
+    pattern = _rank_file_pattern(base, "alloc")
+    ranks = []
+    for name in os.listdir(folder or "."):
+        m = pattern.match(name)
+        if m:
+            ranks.append(int(m.group(1)))
+    return sorted(ranks)
+
+
+def load_rank_column(prefix, rank, column="alloc", mmap=True):
+    """One column of a rank, as a read-only memory map unless `mmap` is False."""
+    dtype = dict((name, dtype) for name, _, dtype in RANK_COLUMNS)[column]
+    path = rank_array_path(prefix, rank, column)
+    if not mmap or os.path.getsize(path) == 0:
+        return np.fromfile(path, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
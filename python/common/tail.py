@@ -0,0 +1,72 @@
+import os
+from collections import deque
+from itertools import islice
+
+from common.log_io import is_compressed, open_log
+
+
+_BLOCK_SIZE = 64 * 1024
+
+
+def iter_lines_reversed(file_path, block_size=_BLOCK_SIZE):
+    """Yield the lines of a text file from the last one to the first.
+
+    The file is read backwards in blocks from its end, so looking at the
+    last few lines costs O(tail) instead of O(file). Lines are yielded
+    without their line terminator ("\\n" or "\\r\\n"); an empty last line
+    caused by the final newline is not reported, matching readlines().
+    Compressed logs cannot be read backwards and are decompressed in full;
+    use tail_lines() for them when only the last lines are needed.
+    """
+    if is_compressed(file_path):
+        yield from reversed(_read_lines(file_path))
+        return
+
+    with open(file_path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        rest = b""
+        at_end = True
+        while pos > 0:
+            size = min(block_size, pos)
+            pos -= size
+            f.seek(pos)
+            parts = (f.read(size) + rest).split(b"\n")
+            # parts[0] may continue in the previous block
+            rest = parts[0]
+            if at_end:
+                at_end = False
+                if parts[-1] == b"":
+                    parts.pop()
+                    if len(parts) == 1:
+                        # the block held only the final newline
+                        rest = parts[0]
+                        continue
+            for i in range(len(parts) - 1, 0, -1):
+                yield _decode(parts[i])
+        if not at_end:
+            yield _decode(rest)
+
+
+def _decode(line):
+    if line.endswith(b"\r"):
+        line = line[:-1]
+    return line.decode()
+
+
+def _read_lines(file_path, n=None):
+    with open_log(file_path, "rb") as f:
+        lines = deque(f, maxlen=n)
+    return [_decode(line[:-1] if line.endswith(b"\n") else line) for line in lines]
+
+
+def tail_lines(file_path, n):
+    """Return the last `n` lines of a text file, in file order.
+
+    Compressed logs are decompressed in one streaming pass, keeping only the
+    last `n` lines in memory.
+    """
+    if is_compressed(file_path):
+        return _read_lines(file_path, n)
+    lines = list(islice(iter_lines_reversed(file_path), n))
+    lines.reverse()
+    return lines
@@ -0,0 +1,204 @@
+from functools import partial
+
+import numpy as np
+
+from common.byte_scan import (decode_decimal, decode_hex, digit_runs, gather_lines, iter_stream_windows,
+                              iter_windows, line_bounds, map_file, match_at, tag_end)
+from common.log_io import is_compressed
+from common.parse_cache import cached_parse
+from common.parallel import map_file_chunks
+
+
+# Malloc/Free tensor records emitted by the PyTorch memory callback of the
+# accelprof tools, e.g.
+#
+#   Malloc tensor 0x7f5e2a000000 with size 512, allocated 1024, reserved 2097152, device 0
+#
+# The NVIDIA tools prefix them with a "[SANITIZER INFO] " tag. The trailing
+# numbers of a record are, from the end:
+#   device, total_reserved, total_allocated, alloc_size
+# and the tensor pointer is printed in hex before them.
+#
+# The log is memory-mapped and scanned as bytes with common.byte_scan:
+# record lines are located and their numeric fields decoded with vectorized
+# NumPy operations over newline-aligned windows, without creating a Python
+# string per line.
+# Compressed logs cannot be mapped; they are decompressed in one streaming
+# pass into windows of the same size and scanned the same way.
+MALLOC = 0
+FREE = 1
+
+TENSOR_EVENT_DTYPE = np.dtype([
+    ("kind", np.int8),
+    ("ptr", np.uint64),
+    ("alloc_size", np.int64),
+    ("total_allocated", np.int64),
+    ("total_reserved", np.int64),
+    ("device", np.int32),
+])
+
+_MALLOC_TAG = np.frombuffer(b"Malloc tensor", dtype=np.uint8)
+_FREE_TAG = np.frombuffer(b"Free tensor", dtype=np.uint8)
+
+
+def _select_records(win, starts, ends, content):
+    is_malloc = match_at(win, content, ends, _MALLOC_TAG)
+    is_free = match_at(win, content, ends, _FREE_TAG)
+    sel = is_malloc | is_free
+    kind = np.where(is_malloc[sel], MALLOC, FREE).astype(np.int8)
+    return sel, kind
+
+
+def _scan_window(win):
+    starts, ends = line_bounds(win)
+    if not len(starts):
+        return np.empty(0, dtype=TENSOR_EVENT_DTYPE)
+    content = tag_end(win, starts, ends)
+    sel, kind = _select_records(win, starts, ends, content)
+    content, ends = content[sel], ends[sel]
+    if not len(content):
+        return np.empty(0, dtype=TENSOR_EVENT_DTYPE)
+
+    run_starts, run_ends = digit_runs(win)
+    if not len(run_starts):
+        return np.empty(0, dtype=TENSOR_EVENT_DTYPE)
+    # index of the last digit run of every record line
+    last_run = np.searchsorted(run_ends, ends, side="right") - 1
+    first_needed = last_run - 3
+    valid = first_needed >= 0
+    valid &= run_starts[np.maximum(first_needed, 0)] >= content
+    kind, content, ends, last_run = kind[valid], content[valid], ends[valid], last_run[valid]
+
+    events = np.empty(len(content), dtype=TENSOR_EVENT_DTYPE)
+    events["kind"] = kind
+    fields = ("device", "total_reserved", "total_allocated", "alloc_size")
+    for back, field in enumerate(fields):
+        r = last_run - back
+        events[field] = decode_decimal(win, run_starts[r], run_ends[r] - run_starts[r])
+
+    # the pointer is the first "0x..." token of the line, else the fifth
+    # number from the end
+    hex_pos = np.flatnonzero((win[:-1] == ord("0")) & ((win[1:] | 0x20) == ord("x")))
+    ptr = np.zeros(len(content), dtype=np.uint64)
+    if len(hex_pos):
+        j = np.searchsorted(hex_pos, content)
+        pos = hex_pos[np.minimum(j, len(hex_pos) - 1)]
+        has_hex = (j < len(hex_pos)) & (pos < ends)
+        ptr[has_hex] = decode_hex(win, pos[has_hex] + 2, ends[has_hex])
+    else:
+        has_hex = np.zeros(len(content), dtype=bool)
+    r = last_run - 4
+    fallback = ~has_hex & (r >= 0)
+    fallback[fallback] = run_starts[r[fallback]] >= content[fallback]
+    if fallback.any():
+        rf = r[fallback]
+        ptr[fallback] = decode_decimal(win, run_starts[rf], run_ends[rf] - run_starts[rf]).astype(np.uint64)
+    events["ptr"] = ptr
+    return events
+
+
+def _scan_windows(windows):
+    chunks = [_scan_window(win) for win in windows]
+    if not chunks:
+        return np.empty(0, dtype=TENSOR_EVENT_DTYPE)
+    return np.concatenate(chunks)
+
+
+def _scan_range(file_path, start, stop):
+    return _scan_windows(iter_windows(map_file(file_path), start, stop))
+
+
+def load_tensor_events(file_path, jobs=1):
+    """Scan all Malloc/Free tensor records of a log into a TENSOR_EVENT_DTYPE array.
+
+    Records may carry a leading "[...] " tag; lines with fewer than four
+    numbers after the "Malloc tensor"/"Free tensor" keyword are skipped.
+    With `jobs` > 1 (0 = all cores) a large log is split at newline-aligned
+    offsets and scanned by a process pool; the chunks are merged in file
+    order, so the result (and any running series derived from it, such as
+    the per-device allocated bytes) is identical to a serial scan.
+    Compressed logs are always scanned serially.
+    """
+    if is_compressed(file_path):
+        return _scan_windows(iter_stream_windows(file_path))
+    return np.concatenate(map_file_chunks(_scan_range, file_path, jobs))
+
+
+def _extract_window(win, prefix, strip_prefix):
+    starts, ends = line_bounds(win)
+    has_prefix = match_at(win, starts, ends, prefix)
+    starts, ends = starts[has_prefix], ends[has_prefix]
+    content = starts + len(prefix)
+    sel, _ = _select_records(win, starts, ends, content)
+    starts, ends, content = starts[sel], ends[sel], content[sel]
+    # strip trailing whitespace (e.g. "\r" of CRLF logs)
+    while len(ends):
+        ws = win[ends - 1]
+        trailing = (ends > content) & ((ws == ord(" ")) | ((ws >= 9) & (ws <= 13)))
+        if not trailing.any():
+            break
+        ends = ends - trailing
+    return gather_lines(win, content if strip_prefix else starts, ends)
+
+
+def _extract_windows(windows, prefix=b"", strip_prefix=False):
+    prefix = np.frombuffer(prefix, dtype=np.uint8)
+    out = [np.empty(0, dtype=np.uint8)]
+    for win in windows:
+        out.append(_extract_window(win, prefix, strip_prefix))
+    return np.concatenate(out)
+
+
+def _extract_range(file_path, start, stop, prefix=b"", strip_prefix=False):
+    windows = iter_windows(map_file(file_path), start, stop)
+    return _extract_windows(windows, prefix, strip_prefix)
+
+
+def extract_event_lines(file_path, prefix="", strip_prefix=False, jobs=1):
+    """Return the Malloc/Free tensor lines starting with `prefix`, stripped, as uint8.
+
+    Each line is terminated by a newline; `strip_prefix` also drops the
+    prefix. `jobs` works as in load_tensor_events().
+    """
+    if is_compressed(file_path):
+        return _extract_windows(iter_stream_windows(file_path), prefix.encode(), strip_prefix)
+    func = partial(_extract_range, prefix=prefix.encode(), strip_prefix=strip_prefix)
+    return np.concatenate(map_file_chunks(func, file_path, jobs))
+
+
+# parse functions in the (columns, strings) form used by common.parse_cache
+
+# bump when the output of the scanner changes
+_PARSER_VERSION = 2
+
+
+def parse_tensor_events(file_path, jobs=1):
+    return {"events": load_tensor_events(file_path, jobs)}, None
+
+
+def parse_event_lines(file_path, prefix="", strip_prefix=False, jobs=1):
+    return {"text": extract_event_lines(file_path, prefix, strip_prefix, jobs)}, None
+
+
+def cached_tensor_events(file_path, jobs=1):
+    """load_tensor_events() through the parse cache."""
+    columns, _ = cached_parse(
+        file_path, "tensor_events",
+        lambda path: parse_tensor_events(path, jobs),
+        version=_PARSER_VERSION)
+    return columns["events"]
+
+
+def cached_event_lines(file_path, prefix="", strip_prefix=False, jobs=1):
+    """extract_event_lines() through the parse cache."""
+    parser_name = "event_lines"
+    tag = "".join(c for c in prefix if c.isalnum()).lower()
+    if tag:
+        parser_name += f"_{tag}"
+    if strip_prefix:
+        parser_name += "_stripped"
+    columns, _ = cached_parse(
+        file_path, parser_name,
+        lambda path: parse_event_lines(path, prefix, strip_prefix, jobs),
+        version=_PARSER_VERSION)
+    return columns["text"]
@@ -0,0 +1,447 @@
+from bisect import bisect_left
+
+import numpy as np
+
+from common.tensor_events import FREE, MALLOC
+
+
+# Alignment of two Malloc/Free traces by event semantics.
+#
+# Every event is reduced to a token (kind, alloc_size) and the two token
+# sequences are diffed: events are matched when they allocate (free) the
+# same size in the same order, and an extra or missing allocation in one
+# run only shifts the pairing instead of misaligning everything after it.
+#
+# The diff is Myers' O(ND) algorithm in its linear-space form (E. Myers,
+# "An O(ND) Difference Algorithm and Its Variations", 1986): the middle
+# snake of the optimal edit path splits a box in two, Hirschberg-style, so
+# memory stays O(N + M) whatever the edit distance D. Runs of equal tokens
+# (snakes) are followed with vectorized comparisons. Two additions keep
+# millions of events per side tractable:
+#
+#   - anchoring: k-grams of tokens that occur exactly once in both traces
+#     are matched first (longest increasing chain of them, as in patience
+#     diff) and only the gaps between them are diffed, retrying with
+#     shorter k-grams in large gaps;
+#   - a cost bound: when a box needs more than `max_cost` edits per half,
+#     it is split at the furthest point the forward search reached, as GNU
+#     diff does. The script is then not guaranteed minimal, but the time
+#     stays O((N + M) * max_cost).
+#
+# The result is a list of runs (op, a_start, b_start, length), op being
+# MATCH, DELETE (events only in a) or INSERT (events only in b).
+
+MATCH = 0
+DELETE = 1
+INSERT = 2
+
+RUN_DTYPE = np.dtype([
+    ("op", np.int8),
+    ("a_start", np.int64),
+    ("b_start", np.int64),
+    ("length", np.int64),
+])
+
+# one region per matched run and per change (deletes/inserts between matches)
+REGION_DTYPE = np.dtype([
+    ("matched", np.bool_),
+    ("a_start", np.int64),
+    ("a_stop", np.int64),
+    ("b_start", np.int64),
+    ("b_stop", np.int64),
+    ("deleted_bytes", np.int64),
+    ("inserted_bytes", np.int64),
+    ("min_diff", np.int64),
+    ("max_diff", np.int64),
+])
+
+DEFAULT_MAX_COST = 64
+DEFAULT_ANCHOR = 16
+# gaps shorter than this (on both sides) go straight to Myers
+_ANCHOR_MIN_GAP = 4096
+# first chunk compared when following a snake
+_SNAKE_CHUNK = 32
+_HASH_BASE = np.uint64(0x9E3779B97F4A7C15)
+
+
+def event_tokens(kind, alloc_size):
+    """One int64 token per event: (|alloc_size| << 1) | kind."""
+    size = np.abs(np.asarray(alloc_size, dtype=np.int64))
+    return (size << 1) | np.asarray(kind, dtype=np.int64)
+
+
+def timeline_tokens(timeline):
+    """Tokens of a common.memory_timeline.MemoryTimeline.
+
+    The size of every event is its change of the allocated bytes; the kind
+    is taken from the sign of that change when the timeline has none.
+    """
+    delta = np.diff(np.asarray(timeline.values, dtype=np.int64), prepend=0)
+    kind = timeline.kind if timeline.kind is not None else np.where(delta < 0, FREE, MALLOC)
+    return event_tokens(kind, delta)
+
+
+def _kgram_hashes(t, k):
+    h = np.zeros(len(t) - k + 1, dtype=np.uint64)
+    t = t.astype(np.uint64)
+    for j in range(k):
+        h = h * _HASH_BASE + t[j:len(t) - k + 1 + j]
+    return h
+
+
+def _unique_positions(h):
+    values, first, counts = np.unique(h, return_index=True, return_counts=True)
+    once = counts == 1
+    return values[once], first[once]
+
+
+def _longest_chain(pb):
+    """Indices of a longest strictly increasing subsequence of pb."""
+    if np.all(np.diff(pb) > 0):
+        return np.arange(len(pb))
+    tails, tail_idx = [], []
+    prev = np.full(len(pb), -1, dtype=np.int64)
+    for i, v in enumerate(pb.tolist()):
+        j = bisect_left(tails, v)
+        if j:
+            prev[i] = tail_idx[j - 1]
+        if j == len(tails):
+            tails.append(v)
+            tail_idx.append(i)
+        else:
+            tails[j] = v
+            tail_idx[j] = i
+    chain = []
+    i = tail_idx[-1]
+    while i >= 0:
+        chain.append(i)
+        i = prev[i]
+    return np.array(chain[::-1], dtype=np.int64)
+
+
+class _Differ:
+    def __init__(self, a, b, max_cost):
+        self.a, self.b = a, b
+        # Python lists for the scalar comparisons of the inner loop
+        self.al, self.bl = a.tolist(), b.tolist()
+        self.max_cost = max_cost
+        self.runs = []
+
+    def _emit(self, op, x, y, n):
+        if n <= 0:
+            return
+        runs = self.runs
+        if runs and runs[-1][0] == op:
+            last = runs[-1]
+            runs[-1] = (op, last[1], last[2], last[3] + n)
+        else:
+            runs.append((op, x, y, n))
+
+    def _forward(self, x, y, n):
+        """Length of the common run of a[x:] and b[y:], at most n."""
+        if n <= 0 or self.al[x] != self.bl[y]:
+            return 0
+        i, step = 0, _SNAKE_CHUNK
+        while i < n:
+            c = min(step, n - i)
+            neq = self.a[x + i:x + i + c] != self.b[y + i:y + i + c]
+            if neq.any():
+                return i + int(neq.argmax())
+            i += c
+            step *= 2
+        return n
+
+    def _backward(self, x, y, n):
+        """Length of the common run ending right before a[x] and b[y], at most n."""
+        if n <= 0 or self.al[x - 1] != self.bl[y - 1]:
+            return 0
+        i, step = 0, _SNAKE_CHUNK
+        while i < n:
+            c = min(step, n - i)
+            neq = self.a[x - i - c:x - i] != self.b[y - i - c:y - i]
+            if neq.any():
+                return i + int(neq[::-1].argmax())
+            i += c
+            step *= 2
+        return n
+
+    def _middle_snake(self, left, top, n, m):
+        """Middle snake (x0, y0, x1, y1) of the box, in box coordinates.
+
+        Past max_cost a zero-length snake at the furthest point reached by
+        the forward search is returned instead.
+        """
+        delta = n - m
+        odd = delta & 1
+        max_d = min((n + m + 1) // 2, self.max_cost + 1)
+        # furthest x on every diagonal; negative diagonals wrap around
+        vf = [0] * (2 * max_d + 3)
+        vb = [0] * (2 * max_d + 3)
+        for d in range(max_d + 1):
+            if d > self.max_cost:
+                best = None
+                for k in range(-d + 1, d, 2):
+                    x = vf[k]
+                    y = x - k
+                    if x <= n and 0 <= y <= m and (best is None or x + y > best[0] + best[1]):
+                        best = (x, y)
+                return best + best
+            for k in range(-d, d + 1, 2):
+                if k == -d or (k != d and vf[k - 1] < vf[k + 1]):
+                    x = vf[k + 1]
+                else:
+                    x = vf[k - 1] + 1
+                y = x - k
+                x0, y0 = x, y
+                if 0 <= y <= m and x <= n:
+                    x += self._forward(left + x, top + y, min(n - x, m - y))
+                vf[k] = x
+                c = delta - k
+                if odd and -(d - 1) <= c <= d - 1 and x + vb[c] >= n:
+                    return x0, y0, x, x - k
+            for c in range(-d, d + 1, 2):
+                if c == -d or (c != d and vb[c - 1] < vb[c + 1]):
+                    xr = vb[c + 1]
+                else:
+                    xr = vb[c - 1] + 1
+                yr = xr - c
+                x1, y1 = n - xr, m - yr
+                if 0 <= yr <= m and xr <= n:
+                    xr += self._backward(left + n - xr, top + m - yr, min(n - xr, m - yr))
+                vb[c] = xr
+                k = delta - c
+                if not odd and -d <= k <= d and xr + vf[k] >= n:
+                    return n - xr, m - (xr - c), x1, y1
+        raise AssertionError("no middle snake")
+
+    def myers(self, x0, y0, x1, y1):
+        """Append the runs of the minimal (up to max_cost) script of a[x0:x1] vs b[y0:y1]."""
+        stack = [(False, x0, y0, x1, y1)]
+        while stack:
+            is_match, x0, y0, x1, y1 = stack.pop()
+            if is_match:
+                self._emit(MATCH, x0, y0, x1)
+                continue
+            head = self._forward(x0, y0, min(x1 - x0, y1 - y0))
+            self._emit(MATCH, x0, y0, head)
+            x0, y0 = x0 + head, y0 + head
+            tail = self._backward(x1, y1, min(x1 - x0, y1 - y0))
+            x1, y1 = x1 - tail, y1 - tail
+            if x0 == x1 or y0 == y1:
+                self._emit(DELETE, x0, y0, x1 - x0)
+                self._emit(INSERT, x1, y0, y1 - y0)
+            else:
+                sx, sy, ex, ey = self._middle_snake(x0, y0, x1 - x0, y1 - y0)
+                sx, sy, ex, ey = x0 + sx, y0 + sy, x0 + ex, y0 + ey
+                if ((ex, ey) == (x0, y0) or (sx, sy) == (x1, y1)
+                        or ((sx, sy) == (x0, y0) and (ex, ey) == (x1, y1))):
+                    # a split that makes no progress would push the same
+                    # box again; only a cost-bounded search can return one
+                    self._emit(DELETE, x0, y0, x1 - x0)
+                    self._emit(INSERT, x1, y0, y1 - y0)
+                else:
+                    # pushed in reverse order of emission
+                    stack.append((True, x1, y1, tail, 0))
+                    stack.append((False, ex, ey, x1, y1))
+                    stack.append((True, sx, sy, ex - sx, 0))
+                    stack.append((False, x0, y0, sx, sy))
+                    continue
+            self._emit(MATCH, x1, y1, tail)
+
+    def _anchors(self, x0, y0, x1, y1, k):
+        """Non-overlapping matched runs (a_start, b_start, length) from unique k-grams."""
+        if x1 - x0 < k or y1 - y0 < k:
+            return []
+        a, b = self.a[x0:x1], self.b[y0:y1]
+        ua, ia = _unique_positions(_kgram_hashes(a, k))
+        ub, ib = _unique_positions(_kgram_hashes(b, k))
+        _, ja, jb = np.intersect1d(ua, ub, assume_unique=True, return_indices=True)
+        pa, pb = ia[ja], ib[jb]
+        order = np.argsort(pa, kind="stable")
+        pa, pb = pa[order], pb[order]
+        # drop hash collisions
+        same = np.ones(len(pa), dtype=bool)
+        for j in range(k):
+            same &= a[pa + j] == b[pb + j]
+        pa, pb = pa[same], pb[same]
+        if not len(pa):
+            return []
+        chain = _longest_chain(pb)
+        pa, pb = pa[chain], pb[chain]
+
+        # consecutive anchors on one diagonal form a single run
+        diag = pa - pb
+        brk = np.ones(len(pa), dtype=bool)
+        brk[1:] = (diag[1:] != diag[:-1]) | (pa[1:] > pa[:-1] + k)
+        first = np.flatnonzero(brk)
+        last = np.append(first[1:], len(pa)) - 1
+        runs = []
+        end_a = end_b = 0
+        for sa, sb, stop in zip(pa[first].tolist(), pb[first].tolist(), (pa[last] + k).tolist()):
+            skip = max(0, end_a - sa, end_b - sb)
+            if sa + skip >= stop:
+                continue
+            runs.append((x0 + sa + skip, y0 + sb + skip, stop - sa - skip))
+            end_a, end_b = stop, sb + stop - sa
+        return runs
+
+    def anchored(self, x0, y0, x1, y1, k):
+        """Diff a[x0:x1] vs b[y0:y1], matching unique k-grams first."""
+        if k < 1 or (x1 - x0 < _ANCHOR_MIN_GAP and y1 - y0 < _ANCHOR_MIN_GAP):
+            self.myers(x0, y0, x1, y1)
+            return
+        anchors = self._anchors(x0, y0, x1, y1, k)
+        if not anchors:
+            # nothing unique to hold on to (e.g. a periodic training loop);
+            # shorter k-grams are even less likely to be unique
+            self.myers(x0, y0, x1, y1)
+            return
+        x, y = x0, y0
+        for sa, sb, length in anchors:
+            self.anchored(x, y, sa, sb, k // 2)
+            self._emit(MATCH, sa, sb, length)
+            x, y = sa + length, sb + length
+        self.anchored(x, y, x1, y1, k // 2)
+
+
+class TraceDiff:
+    """Edit script between two token sequences a and b, as runs of RUN_DTYPE."""
+
+    def __init__(self, runs, tokens_a, tokens_b):
+        self.runs = runs
+        self.tokens_a = tokens_a
+        self.tokens_b = tokens_b
+
+    def _count(self, op, tokens, start_field, kind=None):
+        runs = self.runs[self.runs["op"] == op]
+        if kind is None:
+            return int(runs["length"].sum())
+        is_kind = np.concatenate(([0], np.cumsum((tokens & 1) == kind)))
+        start = runs[start_field]
+        return int((is_kind[start + runs["length"]] - is_kind[start]).sum())
+
+    def summary(self):
+        """Matched / deleted (only in a) / inserted (only in b) events and allocations."""
+        return {
+            "matched": self._count(MATCH, self.tokens_a, "a_start"),
+            "deleted": self._count(DELETE, self.tokens_a, "a_start"),
+            "inserted": self._count(INSERT, self.tokens_b, "b_start"),
+            "matched_allocations": self._count(MATCH, self.tokens_a, "a_start", MALLOC),
+            "deleted_allocations": self._count(DELETE, self.tokens_a, "a_start", MALLOC),
+            "inserted_allocations": self._count(INSERT, self.tokens_b, "b_start", MALLOC),
+        }
+
+    def edit_distance(self):
+        return int(self.runs["length"][self.runs["op"] != MATCH].sum())
+
+    def indices(self):
+        """(a_index, b_index) of every aligned position; -1 where a side has no event."""
+        runs = self.runs
+        lengths = runs["length"]
+        total = int(lengths.sum())
+        run_id = np.repeat(np.arange(len(runs)), lengths)
+        offset = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        op = runs["op"][run_id]
+        a_index = np.where(op != INSERT, runs["a_start"][run_id] + offset, -1)
+        b_index = np.where(op != DELETE, runs["b_start"][run_id] + offset, -1)
+        return a_index, b_index
+
+    def aligned(self, values_a, values_b):
+        """values_a and values_b on the aligned positions.
+
+        Where a side has no event its value is carried over from its
+        previous event (0 before the first one).
+        """
+        out = []
+        for index, values in zip(self.indices(), (values_a, values_b)):
+            filled = np.maximum.accumulate(index) if len(index) else index
+            values = np.asarray(values, dtype=np.int64)
+            out.append(np.where(filled >= 0, values[np.maximum(filled, 0)] if len(values) else 0, 0))
+        return out[0], out[1]
+
+    def regions(self, values_a, values_b):
+        """REGION_DTYPE array: matched runs and changes, with the memory difference.
+
+        min_diff/max_diff bound values_b - values_a over the aligned
+        positions of the region; deleted_bytes/inserted_bytes sum the
+        allocations only present in a/b.
+        """
+        runs = self.runs
+        if not len(runs):
+            return np.empty(0, dtype=REGION_DTYPE)
+        matched = runs["op"] == MATCH
+        # a new region starts wherever matched-ness changes
+        start = np.ones(len(runs), dtype=bool)
+        start[1:] = matched[1:] != matched[:-1]
+        first = np.flatnonzero(start)
+        last = np.append(first[1:], len(runs)) - 1
+
+        a_len = np.where(runs["op"] != INSERT, runs["length"], 0)
+        b_len = np.where(runs["op"] != DELETE, runs["length"], 0)
+        regions = np.zeros(len(first), dtype=REGION_DTYPE)
+        regions["matched"] = matched[first]
+        regions["a_start"] = runs["a_start"][first]
+        regions["b_start"] = runs["b_start"][first]
+        regions["a_stop"] = regions["a_start"] + np.add.reduceat(a_len, first)
+        regions["b_stop"] = regions["b_start"] + np.add.reduceat(b_len, first)
+
+        for field, tokens, op, start_field, length in (
+                ("deleted_bytes", self.tokens_a, DELETE, "a_start", a_len),
+                ("inserted_bytes", self.tokens_b, INSERT, "b_start", b_len)):
+            alloc = np.where((tokens & 1) == MALLOC, tokens >> 1, 0)
+            cum = np.concatenate(([0], np.cumsum(alloc)))
+            s = runs[start_field]
+            per_run = np.where(runs["op"] == op, cum[s + length] - cum[s], 0)
+            regions[field] = np.add.reduceat(per_run, first)
+
+        va, vb = self.aligned(values_a, values_b)
+        diff = vb - va
+        pos = np.cumsum(runs["length"]) - runs["length"]
+        regions["min_diff"] = np.minimum.reduceat(diff, pos[first])
+        regions["max_diff"] = np.maximum.reduceat(diff, pos[first])
+        return regions
+
+
+def diff_tokens(tokens_a, tokens_b, max_cost=DEFAULT_MAX_COST, anchor=DEFAULT_ANCHOR):
+    """TraceDiff of two token sequences (see event_tokens()).
+
+    `anchor` is the k-gram length used to anchor large traces (0 disables
+    anchoring); `max_cost` bounds the work per box (see above).
+    """
+    if max_cost < 1:
+        raise ValueError(f"max_cost must be at least 1, got {max_cost}")
+    a = np.ascontiguousarray(tokens_a, dtype=np.int64)
+    b = np.ascontiguousarray(tokens_b, dtype=np.int64)
+    differ = _Differ(a, b, max_cost)
+    # the common prefix and suffix are cheap to strip before anchoring
+    n = min(len(a), len(b))
+    head = differ._forward(0, 0, n)
+    tail = differ._backward(len(a), len(b), n - head)
+    differ._emit(MATCH, 0, 0, head)
+    differ.anchored(head, head, len(a) - tail, len(b) - tail, anchor)
+    differ._emit(MATCH, len(a) - tail, len(b) - tail, tail)
+    runs = np.array(differ.runs, dtype=RUN_DTYPE) if differ.runs else np.empty(0, dtype=RUN_DTYPE)
+    return TraceDiff(runs, a, b)
+
+
+def diff_timelines(timeline_a, timeline_b, max_cost=DEFAULT_MAX_COST, anchor=DEFAULT_ANCHOR):
+    """TraceDiff of two MemoryTimelines matched by (kind, alloc_size)."""
+    return diff_tokens(timeline_tokens(timeline_a), timeline_tokens(timeline_b), max_cost, anchor)
+
+
+def print_diff(trace_diff, values_a, values_b, names=("a", "b"), top=5):
+    """Print the diff summary and the `top` changes with the largest memory difference."""
+    s = trace_diff.summary()
+    print(f"Diff {names[0]} -> {names[1]}: {s['matched']} events matched "
+          f"({s['matched_allocations']} allocations), "
+          f"{s['deleted']} only in {names[0]} ({s['deleted_allocations']} allocations), "
+          f"{s['inserted']} only in {names[1]} ({s['inserted_allocations']} allocations)")
+    regions = trace_diff.regions(values_a, values_b)
+    changes = regions[~regions["matched"]]
+    if not len(changes):
+        return
+    spread = np.maximum(np.abs(changes["min_diff"]), np.abs(changes["max_diff"]))
+    for r in changes[np.argsort(-spread, kind="stable")[:top]]:
+        print(f"  {names[0]}[{r['a_start']}:{r['a_stop']}] vs {names[1]}[{r['b_start']}:{r['b_stop']}]: "
+              f"-{r['deleted_bytes'] / 1024 / 1024:.1f} MB / +{r['inserted_bytes'] / 1024 / 1024:.1f} MB allocated, "
+              f"difference {r['min_diff'] / 1024 / 1024:.1f} .. {r['max_diff'] / 1024 / 1024:.1f} MB")
@@ -0,0 +1,115 @@
+import os
+import subprocess
+import tempfile
+
+import numpy as np
+
+from common.uvm_replay import DEFAULT_BLOCK_SIZE, PREFETCH_MODES
+from common.uvm_schedule import save_binary
+
+
+# Driver of the userspace UVM emulator (uvm-advisor/uvm_emu), which replays
+# a profile and a prefetch schedule on real memory: the UVM segments live
+# in an anonymous mmap arena, at most `capacity` bytes of it resident, and
+# page faults (SIGSEGV on PROT_NONE blocks) and prefetches (madvise
+# population) are counted as they happen. It is the measured counterpart of
+# the modeled replay in common.uvm_replay, on the same inputs.
+#
+# The recorded addresses span the whole GPU address space, so the emulator
+# gets a layout file that packs the segments into one arena, each one at a
+# block-aligned offset plus its own offset in its first block, so ranges
+# share blocks exactly as they did on the device (little-endian):
+#
+#   char   magic[8] = "UVMEMU01"
+#   uint64 arena_size, n_ten, n_mem
+#   int64  ten_offset[n_ten + 1], ten_size[n_ten + 1]
+#   int64  mem_offset[n_mem + 1], mem_size[n_mem + 1]
+#
+# indexed by the advisor's ids (entry 0 unused). Tensors outside every
+# known segment get their own blocks after the segments.
+
+LAYOUT_MAGIC = b"UVMEMU01"
+EMULATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..",
+                        "uvm-advisor", "uvm_emu", "uvm_emu.out")
+
+
+def emulator_layout(allocations, block_size=DEFAULT_BLOCK_SIZE):
+    """(arena size, ten_offset, ten_size, mem_offset, mem_size) of the allocation_map() arrays."""
+    ten_ptr, ten_size, mem_ptr, mem_size = (np.asarray(a, dtype=np.int64) for a in allocations)
+    mem_offset = np.zeros_like(mem_ptr)
+    ten_offset = np.zeros_like(ten_ptr)
+
+    arena = 0
+    for k in range(1, len(mem_ptr)):
+        if mem_size[k] <= 0:
+            continue
+        mem_offset[k] = arena + mem_ptr[k] % block_size
+        arena = -(-(mem_offset[k] + mem_size[k]) // block_size) * block_size
+
+    # segment containing every tensor: the last one starting at or before it
+    segments = np.flatnonzero(mem_size > 0)
+    order = segments[np.argsort(mem_ptr[segments], kind="stable")]
+    for k in range(1, len(ten_ptr)):
+        if ten_size[k] <= 0:
+            continue
+        i = np.searchsorted(mem_ptr[order], ten_ptr[k], side="right") - 1
+        if i >= 0:
+            s = order[i]
+            if ten_ptr[k] + ten_size[k] <= mem_ptr[s] + mem_size[s]:
+                ten_offset[k] = mem_offset[s] + ten_ptr[k] - mem_ptr[s]
+                continue
+        ten_offset[k] = arena + ten_ptr[k] % block_size
+        arena = -(-(ten_offset[k] + ten_size[k]) // block_size) * block_size
+    return arena, ten_offset, ten_size, mem_offset, mem_size
+
+
+def save_layout(file_path, layout):
+    arena, ten_offset, ten_size, mem_offset, mem_size = layout
+    header = np.array([len(ten_offset) - 1, len(mem_offset) - 1], dtype="<u8")
+    with open(file_path, "wb") as f:
+        f.write(LAYOUT_MAGIC)
+        f.write(np.array([arena], dtype="<u8").tobytes())
+        f.write(header.tobytes())
+        for array in (ten_offset, ten_size, mem_offset, mem_size):
+            f.write(np.asarray(array).astype("<i8").tobytes())
+
+
+def _parse_counters(output):
+    counters = {}
+    for line in output.splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            counters[key.strip()] = float(value) if "." in value else int(value)
+    return counters
+
+
+def emulate(usage, schedule, allocations, mode, capacity, block_size=DEFAULT_BLOCK_SIZE, emulator=EMULATOR):
+    """Counters of one emulator run of `schedule` in prefetch `mode`.
+
+    faults, fault_bytes, prefetch_bytes, migrated_bytes, evictions and
+    elapsed (seconds) as the emulator reports them.
+    """
+    if mode not in PREFETCH_MODES:
+        raise ValueError(f"Unknown prefetch mode {mode!r}, expected one of {PREFETCH_MODES}")
+    return emulate_modes(usage, schedule, allocations, capacity, [mode], block_size, emulator)[mode]
+
+
+def emulate_modes(usage, schedule, allocations, capacity, modes=PREFETCH_MODES,
+                  block_size=DEFAULT_BLOCK_SIZE, emulator=EMULATOR):
+    """{mode: counters} of emulator runs of `schedule` in every mode."""
+    if not os.path.exists(emulator):
+        raise FileNotFoundError(f"UVM emulator {emulator} not found, build it with make in uvm-advisor/uvm_emu")
+    with tempfile.TemporaryDirectory() as folder:
+        paths = [os.path.join(folder, name) for name in ("layout.bin", "usage.bin", "schedule.bin")]
+        save_layout(paths[0], emulator_layout(allocations, block_size))
+        save_binary(paths[1], usage)
+        save_binary(paths[2], schedule)
+        results = {}
+        for mode in modes:
+            env = dict(os.environ, PREFETCH_MODE=str(mode))
+            proc = subprocess.run([emulator, *paths, str(int(capacity)), str(block_size)],
+                                  env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise RuntimeError(f"UVM emulator failed in mode {mode}: {proc.stderr.strip()}")
+            results[mode] = _parse_counters(proc.stdout)
+    return results
@@ -0,0 +1,212 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from common.tensor_events import MALLOC
+
+
+# CPU replay of UVM advisor prefetch schedules (uvm-advisor/op_callback_uvm.cpp)
+# against a modeled device memory, to compare schedules and PREFETCH_MODEs
+# without a GPU run.
+#
+# Inputs, all recorded by the existing tools:
+#   usage     the profile the advisor loads (common.uvm_schedule), read as
+#             the ground truth of the tensors every op touches
+#   schedule  the prefetch schedule under test (by default the profile
+#             itself, which is what the advisor issues)
+#   events    the Malloc/Free tensor log (common.tensor_events), giving the
+#             address ranges of the ids the advisor assigns: ten id k is the
+#             k-th malloc larger than LARGE_TENSOR_THRESHOLD, mem id k the
+#             k-th growth of the reserved bytes, i.e. the k-th
+#             cudaMallocManaged segment, whose start is the pointer of the
+#             tensor that triggered it (the caching allocator splits a new
+#             segment from its start)
+#
+# Device memory holds `capacity // block_size` blocks of the address space
+# (2MB, the migration granularity) and evicts the least recently used one.
+# Time is modeled per op:
+#   - at op start, the op's prefetches are issued round robin over
+#     `num_streams` streams, as the advisor does. A call occupies its
+#     stream for `prefetch_latency` and then queues its non-resident blocks
+#     on the host-device link, which moves `bandwidth` bytes/s in FIFO order;
+#   - the op then touches the blocks of its tensors. A block still in
+#     flight is a late prefetch and stalls the op until it lands; a
+#     non-resident block faults, costing `fault_latency` plus its transfer,
+#     queued behind the transfers already on the link;
+#   - the op computes for `op_time` seconds after its last block arrives.
+# Prefetched blocks evicted (or left at the end) before any touch are
+# over-fetched, charged to the op that prefetched them.
+
+LARGE_TENSOR_THRESHOLD = 1048576
+
+NO_PREFETCH = 0
+OBJECT_GRANULARITY = 1
+TENSOR_GRANULARITY = 2
+PREFETCH_MODES = (NO_PREFETCH, OBJECT_GRANULARITY, TENSOR_GRANULARITY)
+MODE_NAMES = {NO_PREFETCH: "none", OBJECT_GRANULARITY: "object", TENSOR_GRANULARITY: "tensor"}
+
+DEFAULT_BLOCK_SIZE = 2 * 1024 * 1024
+DEFAULT_BANDWIDTH = 12e9
+DEFAULT_FAULT_LATENCY = 30e-6
+DEFAULT_PREFETCH_LATENCY = 10e-6
+DEFAULT_OP_TIME = 50e-6
+DEFAULT_NUM_STREAMS = 3
+
+
+def allocation_map(events, threshold=LARGE_TENSOR_THRESHOLD):
+    """(ten_ptr, ten_size, mem_ptr, mem_size) indexed by the advisor's ids (entry 0 unused)."""
+    malloc = events["kind"] == MALLOC
+    large = malloc & (events["alloc_size"] > threshold)
+    reserved = events["total_reserved"]
+    grow = malloc & (reserved > np.concatenate(([0], reserved[:-1])))
+    delta = np.diff(np.concatenate(([0], reserved)))
+    zero = np.zeros(1, dtype=np.int64)
+    return (np.concatenate((zero, events["ptr"][large].astype(np.int64))),
+            np.concatenate((zero, events["alloc_size"][large])),
+            np.concatenate((zero, events["ptr"][grow].astype(np.int64))),
+            np.concatenate((zero, delta[grow])))
+
+
+def _block_ranges(ptr, size, block_size):
+    """(first, stop) block of every range; empty for unknown (size 0) ids."""
+    first = ptr // block_size
+    stop = np.where(size > 0, (ptr + np.maximum(size, 1) - 1) // block_size + 1, first)
+    return first.tolist(), stop.tolist()
+
+
+class ReplayResult:
+    """Per-op outcome of a replay; ops are those of the usage or the schedule."""
+
+    def __init__(self, mode, op_ids, faults, migrated, overfetched, late, stall, total_time, block_size):
+        self.mode = mode
+        self.op_ids = op_ids
+        self.faults = faults
+        self.migrated = migrated
+        self.overfetched = overfetched
+        self.late = late
+        self.stall = stall
+        self.total_time = total_time
+        self.block_size = block_size
+
+    def totals(self):
+        return {
+            "faults": int(self.faults.sum()),
+            "migrated_bytes": int(self.migrated.sum()),
+            "overfetched_bytes": int(self.overfetched.sum()),
+            "late_prefetches": int(self.late.sum()),
+            "stall_time": float(self.stall.sum()),
+            "total_time": self.total_time,
+        }
+
+
+def replay(usage, schedule, allocations, mode, capacity,
+           block_size=DEFAULT_BLOCK_SIZE, bandwidth=DEFAULT_BANDWIDTH,
+           fault_latency=DEFAULT_FAULT_LATENCY, prefetch_latency=DEFAULT_PREFETCH_LATENCY,
+           op_time=DEFAULT_OP_TIME, num_streams=DEFAULT_NUM_STREAMS):
+    """Replay `schedule` in prefetch `mode` on a device of `capacity` bytes.
+
+    `usage` and `schedule` are common.uvm_schedule.Schedule objects,
+    `allocations` the arrays of allocation_map().
+    """
+    ten_ptr, ten_size, mem_ptr, mem_size = allocations
+    ten_first, ten_stop = _block_ranges(ten_ptr, ten_size, block_size)
+    mem_first, mem_stop = _block_ranges(mem_ptr, mem_size, block_size)
+    if mode == TENSOR_GRANULARITY:
+        pf_first, pf_stop, pf_ids = ten_first, ten_stop, schedule.ten
+    elif mode == OBJECT_GRANULARITY:
+        pf_first, pf_stop, pf_ids = mem_first, mem_stop, schedule.mem
+    elif mode == NO_PREFETCH:
+        pf_first = pf_stop = pf_ids = None
+    else:
+        raise ValueError(f"Unknown prefetch mode {mode!r}, expected one of {PREFETCH_MODES}")
+    n_blocks = max(int(capacity) // block_size, 1)
+    transfer = block_size / bandwidth
+
+    op_ids = np.union1d(usage.op_ids, schedule.op_ids if pf_ids is not None else usage.op_ids[:0])
+    op_ids = op_ids[op_ids > 0]
+    n = len(op_ids)
+    faults = np.zeros(n, dtype=np.int64)
+    migrated = np.zeros(n, dtype=np.int64)
+    overfetched = np.zeros(n, dtype=np.int64)
+    late = np.zeros(n, dtype=np.int64)
+    stall = np.zeros(n, dtype=np.float64)
+
+    resident = OrderedDict()
+    ready = {}
+    pending = {}
+    stream_free = [0.0] * num_streams
+    stream = 0
+    link_free = 0.0
+    clock = 0.0
+    prev_op = 0
+
+    def make_room():
+        while len(resident) >= n_blocks:
+            b, _ = resident.popitem(last=False)
+            ready.pop(b, None)
+            j = pending.pop(b, None)
+            if j is not None:
+                overfetched[j] += block_size
+
+    for i, op in enumerate(op_ids.tolist()):
+        # ops without entries only compute
+        clock += op_time * (op - prev_op - 1)
+        prev_op = op
+
+        if pf_ids is not None:
+            for k in pf_ids(op).tolist():
+                if k < len(pf_first):
+                    first, stop = pf_first[k], pf_stop[k]
+                else:
+                    first = stop = 0
+                start = max(clock, stream_free[stream]) + prefetch_latency
+                new = []
+                for b in range(first, stop):
+                    if b in resident:
+                        resident.move_to_end(b)
+                    else:
+                        new.append(b)
+                if new:
+                    link_free = max(start, link_free)
+                    for b in new:
+                        make_room()
+                        link_free += transfer
+                        resident[b] = None
+                        ready[b] = link_free
+                        pending[b] = i
+                    migrated[i] += len(new) * block_size
+                    start = link_free
+                stream_free[stream] = start
+                stream = (stream + 1) % num_streams
+
+        t = clock
+        touched = set()
+        for k in usage.ten(op).tolist():
+            if k < len(ten_first):
+                touched.update(range(ten_first[k], ten_stop[k]))
+        for b in sorted(touched):
+            if b in resident:
+                resident.move_to_end(b)
+                r = ready.pop(b, 0.0)
+                if r > t:
+                    late[i] += 1
+                    t = r
+                pending.pop(b, None)
+            else:
+                faults[i] += 1
+                begin = max(t + fault_latency, link_free)
+                link_free = t = begin + transfer
+                make_room()
+                resident[b] = None
+                migrated[i] += block_size
+        stall[i] = t - clock
+        clock = t + op_time
+
+    for j in pending.values():
+        overfetched[j] += block_size
+    return ReplayResult(mode, op_ids, faults, migrated, overfetched, late, stall, clock, block_size)
+
+
+def replay_modes(usage, schedule, allocations, capacity, modes=PREFETCH_MODES, **model):
+    """{mode: ReplayResult} of the same schedule in every prefetch mode."""
+    return {mode: replay(usage, schedule, allocations, mode, capacity, **model) for mode in modes}
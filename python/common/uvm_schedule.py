@@ -0,0 +1,191 @@
+import re
+
+import numpy as np
+
+from common.log_io import open_log
+
+
+# Prefetch schedules of the UVM advisor (uvm-advisor/op_callback_uvm.cpp),
+# in the text format its parse_profile_output() reads:
+#
+#   Op - op_id: 12
+#   MemAlloc: 3:2097152 7:20971520
+#   TenAlloc: 15:4194304 16:8388608
+#
+# Op ids count the operator callbacks from 1. Mem ids number the UVM
+# allocations (the cudaMallocManaged segments of the caching allocator) and
+# ten ids the tensors larger than LARGE_TENSOR_THRESHOLD, both from 1 in
+# allocation order. Every "<id>:" of a MemAlloc/TenAlloc line is an id;
+# the advisor ignores what follows the colon, write_schedule() puts the
+# size there when it is known.
+#
+# A schedule is kept as two CSR tables over the scheduled ops (sorted by op
+# id): mem_ids[mem_indptr[i]:mem_indptr[i + 1]] are the objects and
+# ten_ids[ten_indptr[i]:ten_indptr[i + 1]] the tensors of op op_ids[i].
+#
+# The same tables are the binary format, which the advisor memory-maps and
+# serves per-op spans from, without parsing or copies (little-endian):
+#
+#   char   magic[8] = "UVMSCHD1"
+#   uint64 n_ops, n_mem, n_ten
+#   int64  op_ids[n_ops]
+#   int64  mem_indptr[n_ops + 1], ten_indptr[n_ops + 1]
+#   int64  mem_ids[n_mem], ten_ids[n_ten]
+#
+# Offsets and ids are never negative, so the advisor reads them as uint64.
+
+SCHEDULE_MAGIC = b"UVMSCHD1"
+_HEADER_DTYPE = np.dtype([("magic", "S8"), ("n_ops", "<u8"), ("n_mem", "<u8"), ("n_ten", "<u8")])
+
+_ENTRY = re.compile(r"(\d+):")
+_OP_ID = re.compile(r"\s*([+-]?\d+)")
+
+
+class Schedule:
+    """Per-op object (MemAlloc) and tensor (TenAlloc) ids of a prefetch schedule."""
+
+    def __init__(self, op_ids, mem_indptr, mem_ids, ten_indptr, ten_ids):
+        self.op_ids = np.asarray(op_ids, dtype=np.int64)
+        self.mem_indptr = np.asarray(mem_indptr, dtype=np.int64)
+        self.mem_ids = np.asarray(mem_ids, dtype=np.int64)
+        self.ten_indptr = np.asarray(ten_indptr, dtype=np.int64)
+        self.ten_ids = np.asarray(ten_ids, dtype=np.int64)
+        self._rows = None
+
+    @classmethod
+    def from_dict(cls, entries):
+        """Schedule of {op_id: (mem ids, ten ids)}."""
+        op_ids = sorted(entries)
+        mem = [np.asarray(entries[op][0], dtype=np.int64) for op in op_ids]
+        ten = [np.asarray(entries[op][1], dtype=np.int64) for op in op_ids]
+
+        def csr(lists):
+            indptr = np.zeros(len(lists) + 1, dtype=np.int64)
+            np.cumsum([len(ids) for ids in lists], out=indptr[1:])
+            ids = np.concatenate(lists) if lists else np.empty(0, dtype=np.int64)
+            return indptr, ids
+
+        return cls(op_ids, *csr(mem), *csr(ten))
+
+    @property
+    def n_ops(self):
+        return len(self.op_ids)
+
+    def _row(self, op_id):
+        if self._rows is None:
+            self._rows = {op: i for i, op in enumerate(self.op_ids.tolist())}
+        return self._rows.get(op_id)
+
+    def mem(self, op_id):
+        """Object ids scheduled at `op_id` (empty if none)."""
+        i = self._row(op_id)
+        if i is None:
+            return self.mem_ids[:0]
+        return self.mem_ids[self.mem_indptr[i]:self.mem_indptr[i + 1]]
+
+    def ten(self, op_id):
+        """Tensor ids scheduled at `op_id` (empty if none)."""
+        i = self._row(op_id)
+        if i is None:
+            return self.ten_ids[:0]
+        return self.ten_ids[self.ten_indptr[i]:self.ten_indptr[i + 1]]
+
+    def items(self):
+        """Yield (op_id, mem ids, ten ids) in op order."""
+        for i, op in enumerate(self.op_ids.tolist()):
+            yield (op, self.mem_ids[self.mem_indptr[i]:self.mem_indptr[i + 1]],
+                   self.ten_ids[self.ten_indptr[i]:self.ten_indptr[i + 1]])
+
+    def head(self, n_ops):
+        """Schedule of the first `n_ops` scheduled ops."""
+        n_ops = min(n_ops, self.n_ops)
+        return Schedule(self.op_ids[:n_ops],
+                        self.mem_indptr[:n_ops + 1], self.mem_ids[:self.mem_indptr[n_ops]],
+                        self.ten_indptr[:n_ops + 1], self.ten_ids[:self.ten_indptr[n_ops]])
+
+    def to_dict(self):
+        return {op: (mem.tolist(), ten.tolist()) for op, mem, ten in self.items()}
+
+
+def parse_schedule(file_path):
+    """Read a schedule the way parse_profile_output() does.
+
+    An "Op -" line starts an op; a later MemAlloc/TenAlloc line replaces the
+    ids of the current op. Entries before the first op go to op -1.
+    """
+    entries = {}
+    current = -1
+    with open_log(file_path) as f:
+        for line in f:
+            if line.startswith("Op -"):
+                pos = line.find("op_id:")
+                if pos >= 0:
+                    m = _OP_ID.match(line, pos + 6)
+                    if m is None:
+                        raise ValueError(f"Invalid op line in {file_path}: {line.rstrip()}")
+                    current = int(m.group(1))
+            elif "MemAlloc" in line:
+                entries.setdefault(current, [[], []])[0] = [int(x) for x in _ENTRY.findall(line)]
+            elif "TenAlloc" in line:
+                entries.setdefault(current, [[], []])[1] = [int(x) for x in _ENTRY.findall(line)]
+    return Schedule.from_dict(entries)
+
+
+def _entries(ids, sizes):
+    if sizes is None:
+        return " ".join(f"{i}:" for i in ids)
+    return " ".join(f"{i}:{sizes[i]}" if 0 <= i < len(sizes) else f"{i}:" for i in ids)
+
+
+def write_schedule(file_path, schedule, mem_sizes=None, ten_sizes=None):
+    """Write `schedule` in the advisor's text format.
+
+    `mem_sizes` / `ten_sizes` (indexed by id) add the sizes after the ids.
+    """
+    mem_sizes = None if mem_sizes is None else np.asarray(mem_sizes).tolist()
+    ten_sizes = None if ten_sizes is None else np.asarray(ten_sizes).tolist()
+    with open(file_path, "w") as f:
+        for op, mem, ten in schedule.items():
+            f.write(f"Op - op_id: {op}\n")
+            f.write(f"MemAlloc: {_entries(mem.tolist(), mem_sizes)}\n")
+            f.write(f"TenAlloc: {_entries(ten.tolist(), ten_sizes)}\n")
+
+
+def save_binary(file_path, schedule):
+    """Write `schedule` in the binary format."""
+    header = np.zeros(1, dtype=_HEADER_DTYPE)
+    header["magic"] = SCHEDULE_MAGIC
+    header["n_ops"] = schedule.n_ops
+    header["n_mem"] = len(schedule.mem_ids)
+    header["n_ten"] = len(schedule.ten_ids)
+    with open(file_path, "wb") as f:
+        f.write(header.tobytes())
+        for array in (schedule.op_ids, schedule.mem_indptr, schedule.ten_indptr,
+                      schedule.mem_ids, schedule.ten_ids):
+            f.write(array.astype("<i8").tobytes())
+
+
+def is_binary(file_path):
+    with open(file_path, "rb") as f:
+        return f.read(len(SCHEDULE_MAGIC)) == SCHEDULE_MAGIC
+
+
+def load_binary(file_path):
+    """Memory-map a schedule in the binary format."""
+    header = np.fromfile(file_path, dtype=_HEADER_DTYPE, count=1)
+    if len(header) != 1 or header["magic"][0] != SCHEDULE_MAGIC:
+        raise ValueError(f"{file_path} is not a binary prefetch schedule")
+    n_ops, n_mem, n_ten = (int(header[name][0]) for name in ("n_ops", "n_mem", "n_ten"))
+    offset = _HEADER_DTYPE.itemsize
+    arrays = []
+    for n in (n_ops, n_ops + 1, n_ops + 1, n_mem, n_ten):
+        arrays.append(np.memmap(file_path, dtype="<i8", mode="r", offset=offset, shape=(n,)) if n
+                      else np.empty(0, dtype=np.int64))
+        offset += 8 * n
+    op_ids, mem_indptr, ten_indptr, mem_ids, ten_ids = arrays
+    return Schedule(op_ids, mem_indptr, mem_ids, ten_indptr, ten_ids)
+
+
+def load_schedule(file_path):
+    """Schedule of a binary or text schedule file."""
+    return load_binary(file_path) if is_binary(file_path) else parse_schedule(file_path)
@@ -0,0 +1,51 @@
+import numpy as np
+
+
+# Working-set size curves from a hotness matrix (common.hotness).
+#
+# WSS(t, W) is the number of distinct blocks touched (nonzero count) in the
+# W time steps [t, t + W). A touch of a block at step s whose previous touch
+# was at step p is the first touch of that block in every window starting
+# at t in (max(p, s - W), s], so it adds 1 to WSS(t, W) over that range of
+# t. With the gap g = s - p (infinite for a first touch) the range is
+# (s - min(g, W), s]: one difference array and one prefix sum per window
+# length give the whole curve in O(nnz + n_steps), for any number of W.
+
+DEFAULT_PERCENTILES = (50, 90, 99, 100)
+
+
+def touch_gaps(matrix):
+    """(steps, gaps) of every touch; gap = steps since the block's previous touch.
+
+    First touches get a gap larger than any window.
+    """
+    steps, blocks, _ = matrix.to_coo()
+    steps = np.asarray(steps, dtype=np.int64)
+    # CSR order is by step, so a stable sort by block keeps steps ascending
+    order = np.argsort(blocks, kind="stable")
+    s, b = steps[order], np.asarray(blocks)[order]
+    gaps = np.full(len(s), matrix.n_steps + 1, dtype=np.int64)
+    same = b[1:] == b[:-1]
+    gaps[1:][same] = s[1:][same] - s[:-1][same]
+    return s, gaps
+
+
+def wss_curves(matrix, windows):
+    """{W: WSS(t, W) for t = 0 .. n_steps - W} in blocks, for every window length W."""
+    steps, gaps = touch_gaps(matrix)
+    n = matrix.n_steps
+    curves = {}
+    for w in windows:
+        w = int(w)
+        if w < 1 or w > n:
+            raise ValueError(f"Window of {w} steps for a matrix of {n} steps")
+        start = steps - np.minimum(gaps, w) + 1
+        diff = (np.bincount(np.maximum(start, 0), minlength=n + 1)
+                - np.bincount(steps + 1, minlength=n + 1))
+        curves[w] = np.cumsum(diff)[:n - w + 1]
+    return curves
+
+
+def wss_percentiles(curves, percentiles=DEFAULT_PERCENTILES):
+    """{W: np.percentile(curve, percentiles)} for the curves of wss_curves()."""
+    return {w: np.percentile(curve, percentiles) for w, curve in curves.items()}
@@ -1,20 +1,25 @@
 import os
 import re
+import sys
 import argparse
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.log_io import find_log
+from common.tail import tail_lines
+
 def parse_elapsed_time_to_seconds(time_str):
     h, m, s = map(int, time_str.strip().split(":"))
     return h * 3600 + m * 60 + s
 
 def extract_elapsed_time_from_file(file_path):
-    with open(file_path, 'r') as f:
-        lines = f.readlines()
-        if not lines:
-            return None
-        last_line = lines[-1]
-        if "[ACCELPROF INFO] ELAPSED TIME" in last_line:
-            time_part = last_line.strip().split(":")[-3:]  # get last 3 parts
-            return parse_elapsed_time_to_seconds(":".join(time_part))
+    # only the last line is needed, read it from the end of the log
+    lines = tail_lines(file_path, 1)
+    if not lines:
+        return None
+    last_line = lines[-1]
+    if "[ACCELPROF INFO] ELAPSED TIME" in last_line:
+        time_part = last_line.strip().split(":")[-3:]  # get last 3 parts
+        return parse_elapsed_time_to_seconds(":".join(time_part))
     return None
 
 # List of files to parse
@@ -78,8 +83,9 @@ def get_orig_time(path):
     result = {}
 
     for file_name in orig_file_list:
-        if os.path.exists(f"{path}/{file_name}"):
-            seconds = extract_elapsed_time_from_file(f"{path}/{file_name}")
+        log_file = find_log(f"{path}/{file_name}")
+        if os.path.exists(log_file):
+            seconds = extract_elapsed_time_from_file(log_file)
             if seconds is not None:
                 file_name = file_name.replace(".accelprof.log", "")
                 file_name = file_name.replace("test_", "")
@@ -104,37 +110,37 @@ def get_time_breakdown(path, file_list, prefix_str, is_sample):
     trace_transfer = {}
     analysis = {}
     for file_name in file_list:
-        if os.path.exists(f"{path}/{file_name}"):
-            with open(f"{path}/{file_name}", 'r') as f:
-                lines = f.readlines()
-                if not lines:
-                    return None
-                for i in range(-1, -21, -1):
-                    line = lines[i]
-                    if "Trace collection time" in line:
-                        file_name = file_name.replace(".accelprof.log", "")
-                        file_name = file_name.replace(prefix_str, "")
-                        nums = re.findall(r"\d+\.?\d*", line)
-                        time = float(nums[0])
-                        if is_sample:
-                            time *= sample_rate[file_name]
-                        trace_collection[file_name] = time
-                    elif "Trace transfer time" in line:
-                        file_name = file_name.replace(".accelprof.log", "")
-                        file_name = file_name.replace(prefix_str, "")
-                        nums = re.findall(r"\d+\.?\d*", line)
-                        time = float(nums[0])
-                        if is_sample:
-                            time *= sample_rate[file_name]
-                        trace_transfer[file_name] = time
-                    elif "Trace analysis time" in line:
-                        file_name = file_name.replace(".accelprof.log", "")
-                        file_name = file_name.replace(prefix_str, "")
-                        nums = re.findall(r"\d+\.?\d*", line)
-                        time = float(nums[0])
-                        if is_sample:
-                            time *= sample_rate[file_name]
-                        analysis[file_name] = time
+        log_file = find_log(f"{path}/{file_name}")
+        if os.path.exists(log_file):
+            # the summary is printed at the end of the log
+            lines = tail_lines(log_file, 20)
+            if not lines:
+                return None
+            for line in reversed(lines):
+                if "Trace collection time" in line:
+                    file_name = file_name.replace(".accelprof.log", "")
+                    file_name = file_name.replace(prefix_str, "")
+                    nums = re.findall(r"\d+\.?\d*", line)
+                    time = float(nums[0])
+                    if is_sample:
+                        time *= sample_rate[file_name]
+                    trace_collection[file_name] = time
+                elif "Trace transfer time" in line:
+                    file_name = file_name.replace(".accelprof.log", "")
+                    file_name = file_name.replace(prefix_str, "")
+                    nums = re.findall(r"\d+\.?\d*", line)
+                    time = float(nums[0])
+                    if is_sample:
+                        time *= sample_rate[file_name]
+                    trace_transfer[file_name] = time
+                elif "Trace analysis time" in line:
+                    file_name = file_name.replace(".accelprof.log", "")
+                    file_name = file_name.replace(prefix_str, "")
+                    nums = re.findall(r"\d+\.?\d*", line)
+                    time = float(nums[0])
+                    if is_sample:
+                        time *= sample_rate[file_name]
+                    analysis[file_name] = time
 
     return trace_collection, trace_transfer, analysis
 
@@ -0,0 +1,34 @@
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.uvm_schedule import is_binary, load_schedule, save_binary, write_schedule
+
+
+def main(input_path, output_path):
+    schedule = load_schedule(input_path)
+    if is_binary(input_path):
+        write_schedule(output_path, schedule)
+    else:
+        save_binary(output_path, schedule)
+    print(f"{schedule.n_ops} ops, {len(schedule.mem_ids)} MemAlloc and {len(schedule.ten_ids)} TenAlloc "
+          f"entries written to {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert UVM advisor prefetch schedules between text and binary")
+    parser.add_argument(
+        "--input",
+        type=str,
+        required=True,
+        help="Text (uvm_advisor_opt.log) or binary schedule"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        required=True,
+        help="Converted schedule (binary for a text input, text for a binary one)"
+    )
+    args = parser.parse_args()
+    main(args.input, args.output)
@@ -0,0 +1,94 @@
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.address_trace import parse_size
+from common.tensor_events import cached_tensor_events
+from common.uvm_emulator import EMULATOR, emulate_modes
+from common.uvm_replay import MODE_NAMES, PREFETCH_MODES, allocation_map
+from common.uvm_schedule import load_schedule
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+
+def main(profile, schedule, tensor_log, memory_size, factor, modes, block_size, emulator):
+    usage = load_schedule(profile)
+    scheduled = load_schedule(schedule) if schedule else usage
+    allocations = allocation_map(cached_tensor_events(tensor_log))
+    capacity = int(memory_size * MB / factor)
+    print(f"{usage.n_ops} profiled ops, {scheduled.n_ops} scheduled ops, "
+          f"{len(allocations[0]) - 1} tensors, {len(allocations[2]) - 1} objects")
+    print(f"emulated device memory {capacity / MB:.0f} MB ({memory_size:.0f} MB / {factor:.2f}), "
+          f"{block_size // 1024}KB blocks")
+
+    results = emulate_modes(usage, scheduled, allocations, capacity, modes, block_size, emulator)
+    print(f"{'mode':>8} {'faults':>10} {'fault GB':>10} {'prefetch GB':>12} {'migrated GB':>12} "
+          f"{'evictions':>10} {'time ms':>10}")
+    for mode, c in results.items():
+        print(f"{MODE_NAMES[mode]:>8} {c['faults']:>10} {c['fault_bytes'] / GB:>10.2f} "
+              f"{c['prefetch_bytes'] / GB:>12.2f} {c['migrated_bytes'] / GB:>12.2f} "
+              f"{c['evictions']:>10} {c['elapsed'] * 1e3:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run UVM advisor prefetch schedules on the userspace UVM emulator")
+    parser.add_argument(
+        "--profile",
+        type=str,
+        required=True,
+        help="Profile of the tensors every op uses (uvm_advisor_opt.log)"
+    )
+    parser.add_argument(
+        "--schedule",
+        type=str,
+        required=False,
+        default=None,
+        help="Prefetch schedule to run (default: the profile, as the advisor does)"
+    )
+    parser.add_argument(
+        "--tensor-log",
+        type=str,
+        required=True,
+        help="Malloc/Free tensor log of the same run"
+    )
+    parser.add_argument(
+        "--memory-size",
+        type=float,
+        required=True,
+        help="Model memory size in MB (as in gddr_size_list of run_figure_12.sh)"
+    )
+    parser.add_argument(
+        "--oversubscription-factor",
+        type=float,
+        required=False,
+        default=1.0,
+        help="Resident budget = memory size / factor"
+    )
+    parser.add_argument(
+        "--modes",
+        type=int,
+        nargs="+",
+        required=False,
+        default=list(PREFETCH_MODES),
+        choices=PREFETCH_MODES,
+        help="PREFETCH_MODEs to run (0: none, 1: object, 2: tensor)"
+    )
+    parser.add_argument(
+        "--block-size",
+        type=parse_size,
+        required=False,
+        default=2 * MB,
+        help="Migration granularity, a multiple of the page size (default: 2MB)"
+    )
+    parser.add_argument(
+        "--emulator",
+        type=str,
+        required=False,
+        default=EMULATOR,
+        help="Emulator binary (make in uvm-advisor/uvm_emu)"
+    )
+    args = parser.parse_args()
+    main(args.profile, args.schedule, args.tensor_log, args.memory_size, args.oversubscription_factor,
+         args.modes, args.block_size, args.emulator)
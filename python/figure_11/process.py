@@ -2,11 +2,15 @@ import re
 import json
 from copy import deepcopy
 import os
+import sys
 import argparse
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.log_io import find_log, open_log
+
 
 def parse_trace_to_dict(trace_text):
-    with open(trace_text, "r") as file:
+    with open_log(trace_text) as file:
         line = file.readline()
         global_dict = dict()
         section_dict = None
@@ -49,7 +53,7 @@ def parse_trace_to_dict(trace_text):
 
 
 def main(log_folder, suffix):
-    path = f"{log_folder}/uvm_advisor.log"
+    path = find_log(f"{log_folder}/uvm_advisor.log")
 
     result = parse_trace_to_dict(path)
 
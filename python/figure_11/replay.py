@@ -0,0 +1,150 @@
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.address_trace import parse_size
+from common.tensor_events import cached_tensor_events
+from common.uvm_replay import (DEFAULT_BANDWIDTH, DEFAULT_FAULT_LATENCY, DEFAULT_NUM_STREAMS,
+                               DEFAULT_OP_TIME, DEFAULT_PREFETCH_LATENCY, MODE_NAMES, PREFETCH_MODES,
+                               allocation_map, replay_modes)
+from common.uvm_schedule import load_schedule
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+
+def write_per_op(file_path, results):
+    with open(file_path, "w") as f:
+        f.write("mode,op_id,faults,migrated_bytes,overfetched_bytes,late_prefetches,stall_us\n")
+        for mode, r in results.items():
+            for row in zip(r.op_ids.tolist(), r.faults.tolist(), r.migrated.tolist(),
+                           r.overfetched.tolist(), r.late.tolist(), (r.stall * 1e6).tolist()):
+                f.write(f"{MODE_NAMES[mode]},{row[0]},{row[1]},{row[2]},{row[3]},{row[4]},{row[5]:.1f}\n")
+
+
+def main(profile, schedule, tensor_log, memory_size, factor, modes, block_size, model, per_op=None):
+    usage = load_schedule(profile)
+    scheduled = load_schedule(schedule) if schedule else usage
+    allocations = allocation_map(cached_tensor_events(tensor_log))
+    capacity = int(memory_size * MB / factor)
+    print(f"{usage.n_ops} profiled ops, {scheduled.n_ops} scheduled ops, "
+          f"{len(allocations[0]) - 1} tensors, {len(allocations[2]) - 1} objects")
+    print(f"device memory {capacity / MB:.0f} MB ({memory_size:.0f} MB / {factor:.2f}), "
+          f"{block_size // 1024}KB blocks")
+
+    results = replay_modes(usage, scheduled, allocations, capacity, modes, block_size=block_size, **model)
+    print(f"{'mode':>8} {'faults':>10} {'migrated GB':>12} {'overfetch GB':>13} {'late':>10} "
+          f"{'stall ms':>10} {'time ms':>10}")
+    for mode, r in results.items():
+        t = r.totals()
+        print(f"{MODE_NAMES[mode]:>8} {t['faults']:>10} {t['migrated_bytes'] / GB:>12.2f} "
+              f"{t['overfetched_bytes'] / GB:>13.2f} {t['late_prefetches']:>10} "
+              f"{t['stall_time'] * 1e3:>10.1f} {t['total_time'] * 1e3:>10.1f}")
+
+    if per_op:
+        write_per_op(per_op, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay UVM advisor prefetch schedules on a modeled device")
+    parser.add_argument(
+        "--profile",
+        type=str,
+        required=True,
+        help="Profile of the tensors every op uses (uvm_advisor_opt.log)"
+    )
+    parser.add_argument(
+        "--schedule",
+        type=str,
+        required=False,
+        default=None,
+        help="Prefetch schedule to replay (default: the profile, as the advisor does)"
+    )
+    parser.add_argument(
+        "--tensor-log",
+        type=str,
+        required=True,
+        help="Malloc/Free tensor log of the same run"
+    )
+    parser.add_argument(
+        "--memory-size",
+        type=float,
+        required=True,
+        help="Model memory size in MB (as in gddr_size_list of run_figure_12.sh)"
+    )
+    parser.add_argument(
+        "--oversubscription-factor",
+        type=float,
+        required=False,
+        default=1.0,
+        help="Device memory = memory size / factor"
+    )
+    parser.add_argument(
+        "--modes",
+        type=int,
+        nargs="+",
+        required=False,
+        default=list(PREFETCH_MODES),
+        choices=PREFETCH_MODES,
+        help="PREFETCH_MODEs to replay (0: none, 1: object, 2: tensor)"
+    )
+    parser.add_argument(
+        "--block-size",
+        type=parse_size,
+        required=False,
+        default=2 * MB,
+        help="Migration granularity (default: 2MB)"
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        required=False,
+        default=DEFAULT_BANDWIDTH / 1e9,
+        help="Host-device bandwidth in GB/s"
+    )
+    parser.add_argument(
+        "--fault-latency",
+        type=float,
+        required=False,
+        default=DEFAULT_FAULT_LATENCY * 1e6,
+        help="Fault handling time per block in us, on top of the transfer"
+    )
+    parser.add_argument(
+        "--prefetch-latency",
+        type=float,
+        required=False,
+        default=DEFAULT_PREFETCH_LATENCY * 1e6,
+        help="Stream time per cudaMemPrefetchAsync call in us"
+    )
+    parser.add_argument(
+        "--op-time",
+        type=float,
+        required=False,
+        default=DEFAULT_OP_TIME * 1e6,
+        help="Compute time per op in us"
+    )
+    parser.add_argument(
+        "--num-streams",
+        type=int,
+        required=False,
+        default=DEFAULT_NUM_STREAMS,
+        help="Prefetch streams (num_prefetch_streams of the advisor)"
+    )
+    parser.add_argument(
+        "--per-op",
+        type=str,
+        required=False,
+        default=None,
+        help="CSV file for the per-op results"
+    )
+    args = parser.parse_args()
+    model = {
+        "bandwidth": args.bandwidth * 1e9,
+        "fault_latency": args.fault_latency * 1e-6,
+        "prefetch_latency": args.prefetch_latency * 1e-6,
+        "op_time": args.op_time * 1e-6,
+        "num_streams": args.num_streams,
+    }
+    main(args.profile, args.schedule, args.tensor_log, args.memory_size, args.oversubscription_factor,
+         args.modes, args.block_size, model, args.per_op)
@@ -0,0 +1,88 @@
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.address_trace import parse_size
+from common.prefetch_plan import plan_schedule
+from common.tensor_events import cached_tensor_events
+from common.uvm_replay import allocation_map
+from common.uvm_schedule import load_schedule, save_binary, write_schedule
+
+MB = 1024 * 1024
+
+
+def main(profile, tensor_log, memory_size, factor, lookahead, output, block_size=2 * MB, binary=False):
+    usage = load_schedule(profile)
+    allocations = allocation_map(cached_tensor_events(tensor_log))
+    capacity = int(memory_size * MB / factor)
+    schedule = plan_schedule(usage, allocations, capacity, lookahead, block_size)
+    if binary:
+        save_binary(output, schedule)
+    else:
+        write_schedule(output, schedule, mem_sizes=allocations[3], ten_sizes=allocations[1])
+
+    _, ten_size, _, mem_size = allocations
+    for name, before, after, sizes in (("TenAlloc", usage.ten_ids, schedule.ten_ids, ten_size),
+                                       ("MemAlloc", usage.mem_ids, schedule.mem_ids, mem_size)):
+        def total(ids):
+            return sizes[ids[ids < len(sizes)]].sum() / MB
+        print(f"{name}: {len(after)} of {len(before)} prefetches kept, {total(after):.0f} of {total(before):.0f} MB")
+    print(f"Schedule for {capacity / MB:.0f} MB with a lookahead of {lookahead} ops written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capacity-aware prefetch schedule for the UVM advisor")
+    parser.add_argument(
+        "--profile",
+        type=str,
+        required=True,
+        help="Profile of the tensors every op uses (uvm_advisor_opt.log)"
+    )
+    parser.add_argument(
+        "--tensor-log",
+        type=str,
+        required=True,
+        help="Malloc/Free tensor log of the same run"
+    )
+    parser.add_argument(
+        "--memory-size",
+        type=float,
+        required=True,
+        help="Model memory size in MB (as in gddr_size_list of run_figure_12.sh)"
+    )
+    parser.add_argument(
+        "--oversubscription-factor",
+        type=float,
+        required=False,
+        default=1.0,
+        help="Device memory = memory size / factor"
+    )
+    parser.add_argument(
+        "--lookahead",
+        type=int,
+        required=False,
+        default=8,
+        help="Prefetch the tensors of op j at op j - lookahead"
+    )
+    parser.add_argument(
+        "--block-size",
+        type=parse_size,
+        required=False,
+        default=2 * MB,
+        help="Migration granularity (default: 2MB)"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        required=True,
+        help="Schedule file to write (the advisor reads uvm_advisor_opt.bin or uvm_advisor_opt.log)"
+    )
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help="Write the binary schedule format instead of text"
+    )
+    args = parser.parse_args()
+    main(args.profile, args.tensor_log, args.memory_size, args.oversubscription_factor, args.lookahead,
+         args.output, args.block_size, args.binary)
@@ -0,0 +1,132 @@
+import os
+import sys
+import argparse
+import matplotlib.pyplot as plt
+import numpy as np
+import matplotlib as mpl
+mpl.rcParams['pdf.fonttype'] = 42
+mpl.rcParams['ps.fonttype'] = 42
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.knob_search import STRATEGIES, config_label, pareto_front, search
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+
+def parse_eta(value):
+    eta = int(value)
+    if eta < 2:
+        raise argparse.ArgumentTypeError(f"eta must be at least 2, got {value}")
+    return eta
+
+
+def main(profile, tensor_log, model_name, memory_size, factor, strategy, samples, eta, seed, jobs,
+         output_folder):
+    capacity = int(memory_size * MB / factor)
+    results, replays = search(profile, tensor_log, capacity, strategy, samples=samples, eta=eta, seed=seed,
+                              jobs=jobs)
+    points = [score for _, score in results]
+    front = pareto_front(points)
+
+    print(f"{model_name}: {replays} replays, {len(results)} configurations replayed on the whole run "
+          f"on {capacity / MB:.0f} MB, Pareto frontier:")
+    print(f"{'migrated GB':>12} {'stall ms':>10}  configuration")
+    for i in front:
+        config, (migrated, stall) = results[i]
+        print(f"{migrated / GB:>12.2f} {stall * 1e3:>10.1f}  {config_label(config)}")
+
+    if output_folder:
+        points = np.asarray(points, dtype=np.float64)
+        fig, ax = plt.subplots(figsize=(6, 3.5))
+        ax.scatter(points[:, 0] / GB, points[:, 1] * 1e3, s=8, color="gray", alpha=0.6)
+        ax.plot(points[front, 0] / GB, points[front, 1] * 1e3, marker="o", ms=4, color="tab:red",
+                lw=1.2, drawstyle="steps-post")
+        ax.set_xlabel("Migrated (GB)")
+        ax.set_ylabel("Predicted Stall (ms)")
+        ax.grid(True, ls="--", alpha=0.25)
+        fig_filename = os.path.join(output_folder, f"pareto_{model_name}.pdf")
+        fig.savefig(fig_filename, format="pdf", dpi=600, bbox_inches="tight")
+        plt.close(fig)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search UVM advisor prefetch knobs with the offline replay")
+    parser.add_argument(
+        "--profile",
+        type=str,
+        required=True,
+        help="Profile of the tensors every op uses (uvm_advisor_opt.log)"
+    )
+    parser.add_argument(
+        "--tensor-log",
+        type=str,
+        required=True,
+        help="Malloc/Free tensor log of the same run"
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        required=False,
+        default="model",
+        help="Model name for the report and the plot file"
+    )
+    parser.add_argument(
+        "--memory-size",
+        type=float,
+        required=True,
+        help="Model memory size in MB (as in gddr_size_list of run_figure_12.sh)"
+    )
+    parser.add_argument(
+        "--oversubscription-factor",
+        type=float,
+        required=False,
+        default=1.0,
+        help="Device memory = memory size / factor"
+    )
+    parser.add_argument(
+        "--strategy",
+        type=str,
+        required=False,
+        default="halving",
+        choices=STRATEGIES,
+        help="Search strategy"
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        required=False,
+        default=32,
+        help="Configurations drawn by the random and halving strategies"
+    )
+    parser.add_argument(
+        "--eta",
+        type=parse_eta,
+        required=False,
+        default=3,
+        help="Successive halving keeps 1/eta of the configurations per round"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        required=False,
+        default=0,
+        help="Seed of the random draws"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        required=False,
+        default=1,
+        help="Number of processes replaying configurations (0: one per core)"
+    )
+    parser.add_argument(
+        "--output-folder",
+        type=str,
+        required=False,
+        default=None,
+        help="Output folder for the Pareto plot"
+    )
+    args = parser.parse_args()
+    main(args.profile, args.tensor_log, args.model, args.memory_size, args.oversubscription_factor,
+         args.strategy, args.samples, args.eta, args.seed, args.jobs, args.output_folder)
@@ -0,0 +1,131 @@
+import os
+import sys
+import argparse
+import matplotlib.pyplot as plt
+import numpy as np
+import matplotlib as mpl
+mpl.rcParams['pdf.fonttype'] = 42
+mpl.rcParams['ps.fonttype'] = 42
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.address_trace import parse_size
+from common.eviction import POLICIES, auto_sample_rate, compare_policies, hotness_accesses, trace_accesses
+from common.hotness import load_hotness
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+
+def main(trace, result_log, block_size, memory_size, factors, policies, output_folder, sidecar=True,
+         sample_rate=None):
+    if trace:
+        blocks, weights = trace_accesses(trace, block_size)
+    else:
+        blocks, weights = hotness_accesses(load_hotness(result_log, sidecar))
+    n_accesses = int(weights.sum())
+    n_blocks = len(np.unique(blocks))
+    print(f"{n_accesses} accesses to {n_blocks} distinct {block_size // 1024}KB blocks")
+
+    # The GDDR limits of run_figure_12.sh: model memory / OVERSUBSCRIPTION_FACTOR;
+    # by default the footprint of the accesses
+    memory_size = memory_size if memory_size else n_blocks * block_size / MB
+    capacities = [max(int(memory_size * MB / factor) // block_size, 1) for factor in factors]
+    # exact runs step a Python loop per run; long traces are simulated in miniature
+    rate = auto_sample_rate(len(blocks), capacities) if sample_rate is None else sample_rate
+    rate = rate if rate is not None and rate < 1 else None
+    print(f"miniature simulation at rate {rate:.4f}" if rate else "exact simulation")
+    results = compare_policies(blocks, capacities, policies, weights, rate)
+
+    print("Migrated GB (miss ratio)")
+    print(f"{'factor':>8} {'device MB':>10} " + " ".join(f"{p:>16}" for p in policies))
+    for i, factor in enumerate(factors):
+        cells = " ".join(f"{results[p][i] * block_size / GB:>8.2f} ({results[p][i] / n_accesses:.4f})"
+                         for p in policies)
+        print(f"{factor:>8.2f} {capacities[i] * block_size / MB:>10.0f} {cells}")
+
+    if output_folder:
+        fig, ax = plt.subplots(figsize=(6, 3.5))
+        device_mb = np.asarray(capacities) * block_size / MB
+        for policy in policies:
+            ax.plot(device_mb, results[policy] * block_size / GB, marker="o", ms=3, lw=1.2,
+                    ls="--" if policy == "opt" else "-", label=policy.upper())
+        ax.set_xlabel("Device Memory (MB)")
+        ax.set_ylabel("Migrated (GB)")
+        ax.grid(True, ls="--", alpha=0.25)
+        ax.legend(loc="upper right", frameon=True, fancybox=True, framealpha=0.85)
+        fig_filename = os.path.join(output_folder, "eviction_policies.pdf")
+        fig.savefig(fig_filename, format="pdf", dpi=600, bbox_inches="tight")
+        plt.close(fig)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Eviction policies versus Belady's OPT on a block access sequence")
+    parser.add_argument(
+        "--trace",
+        type=str,
+        required=False,
+        default=None,
+        help="Raw uint64 address trace (file or folder of chunk files)"
+    )
+    parser.add_argument(
+        "--result-log",
+        type=str,
+        required=False,
+        default=None,
+        help="time_hotness_cpu log (accesses in one time step taken in block order)"
+    )
+    parser.add_argument(
+        "--block-size",
+        type=parse_size,
+        required=False,
+        default=2 * MB,
+        help="Migration granularity, e.g. 64KB or 2MB (default: 2MB)"
+    )
+    parser.add_argument(
+        "--memory-size",
+        type=float,
+        required=False,
+        default=None,
+        help="Model memory size in MB (default: footprint of the accesses)"
+    )
+    parser.add_argument(
+        "--oversubscription-factors",
+        type=float,
+        nargs="+",
+        required=False,
+        default=[1.0, 1.5, 2.0, 3.0, 4.0],
+        help="Device memory = memory size / factor, for every factor"
+    )
+    parser.add_argument(
+        "--policies",
+        type=str,
+        nargs="+",
+        required=False,
+        default=list(POLICIES),
+        choices=POLICIES,
+        help="Policies to simulate"
+    )
+    parser.add_argument(
+        "--sample-rate",
+        type=float,
+        required=False,
+        default=None,
+        help="Miniature simulation sampling rate, e.g. 0.03; 1 for exact (default: exact up to 500k runs)"
+    )
+    parser.add_argument(
+        "--output-folder",
+        type=str,
+        required=False,
+        default=None,
+        help="Output folder for the migrated bytes plot"
+    )
+    parser.add_argument(
+        "--no-sidecar",
+        action="store_true",
+        help="Do not read or write the parsed <result-log>.hotness sidecar"
+    )
+    args = parser.parse_args()
+    if (args.trace is None) == (args.result_log is None):
+        parser.error("exactly one of --trace and --result-log is required")
+    main(args.trace, args.result_log, args.block_size, args.memory_size, args.oversubscription_factors,
+         args.policies, args.output_folder, not args.no_sidecar, args.sample_rate)
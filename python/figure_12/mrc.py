@@ -0,0 +1,93 @@
+import os
+import sys
+import argparse
+import matplotlib.pyplot as plt
+import numpy as np
+import matplotlib as mpl
+mpl.rcParams['pdf.fonttype'] = 42
+mpl.rcParams['ps.fonttype'] = 42
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.address_trace import parse_size
+from common.reuse_distance import ReuseProfile
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+
+def main(trace, block_size, sample_rate, memory_size, factors, output_folder):
+    # One pass over the trace gives the LRU misses at every device memory size
+    profile = ReuseProfile.from_trace(trace, block_size, sample_rate)
+    mode = f"sampled at {sample_rate}" if sample_rate else "exact"
+    print(f"{profile.n_accesses} accesses to {profile.cold:.0f} distinct {block_size // 1024}KB blocks ({mode})")
+
+    # The GDDR limits of run_figure_12.sh: model memory / OVERSUBSCRIPTION_FACTOR
+    if memory_size:
+        print(f"{'factor':>8} {'device MB':>10} {'miss ratio':>10} {'migrated GB':>12}")
+        for factor in factors:
+            capacity = int(memory_size * MB / factor)
+            print(f"{factor:>8.2f} {capacity / MB:>10.0f} {profile.miss_ratio(capacity // block_size):>10.4f} "
+                  f"{profile.migrated_bytes(capacity) / GB:>12.2f}")
+
+    if output_folder:
+        capacities, misses = profile.curve()
+        fig, ax = plt.subplots(figsize=(6, 3.5))
+        ax.plot(capacities * block_size / MB, misses * block_size / GB, color="tab:blue", lw=1.2)
+        if memory_size:
+            for factor in factors:
+                ax.axvline(memory_size / factor, color="gray", lw=0.8, ls="--")
+        ax.set_xlabel("Device Memory (MB)")
+        ax.set_ylabel("Migrated (GB)")
+        ax.grid(True, ls="--", alpha=0.25)
+        fig_filename = os.path.join(output_folder, "miss_ratio_curve.pdf")
+        fig.savefig(fig_filename, format="pdf", dpi=600, bbox_inches="tight")
+        plt.close(fig)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrated bytes versus device memory size from an address trace")
+    parser.add_argument(
+        "--trace",
+        type=str,
+        required=True,
+        help="Raw uint64 address trace (file or folder of chunk files)"
+    )
+    parser.add_argument(
+        "--block-size",
+        type=parse_size,
+        required=False,
+        default=2 * MB,
+        help="Migration granularity, e.g. 64KB or 2MB (default: 2MB)"
+    )
+    parser.add_argument(
+        "--sample-rate",
+        type=float,
+        required=False,
+        default=None,
+        help="SHARDS sampling rate, e.g. 0.01 (default: exact)"
+    )
+    parser.add_argument(
+        "--memory-size",
+        type=float,
+        required=False,
+        default=None,
+        help="Model memory size in MB (as in gddr_size_list of run_figure_12.sh)"
+    )
+    parser.add_argument(
+        "--oversubscription-factors",
+        type=float,
+        nargs="+",
+        required=False,
+        default=[1.0, 1.5, 2.0, 3.0, 4.0],
+        help="Device memory = memory size / factor, for every factor"
+    )
+    parser.add_argument(
+        "--output-folder",
+        type=str,
+        required=False,
+        default=None,
+        help="Output folder for the miss ratio curve plot"
+    )
+    args = parser.parse_args()
+    main(args.trace, args.block_size, args.sample_rate, args.memory_size,
+         args.oversubscription_factors, args.output_folder)
@@ -1,54 +1,80 @@
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 import matplotlib as mpl
 import argparse
 from matplotlib.colors import LogNorm
 import os
+import sys
 mpl.rcParams['pdf.fonttype'] = 42
 mpl.rcParams['ps.fonttype'] = 42
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.address_trace import DEFAULT_BLOCK_SIZE, DEFAULT_WINDOW_SIZE, parse_size, trace_hotness
+from common.decimate import axes_pixels
+from common.hotness_pyramid import load_pyramid, temporary_pyramid
 
-def plot_hotness(filename, fig_name, output_folder):
-    with open(filename, 'r') as f:
-        lines = f.read().strip().split('\n')
 
-    # Parse data
-    block_indices = list(map(int, lines[0].split()))
-    data = [list(map(int, line.split())) for line in lines[1:]]
+def size_label(n_bytes):
+    for unit, size in (("GB", 1 << 30), ("MB", 1 << 20), ("KB", 1 << 10)):
+        if n_bytes >= size and n_bytes % size == 0:
+            return f"{n_bytes // size}{unit}"
+    return f"{n_bytes}B"
+
+
+def plot_hotness(filename, fig_name, output_folder, sidecar=True, steps=None, blocks=None,
+                 trace=None, block_size=DEFAULT_BLOCK_SIZE, window_size=DEFAULT_WINDOW_SIZE):
+    if trace:
+        # Bin the raw address trace with the requested block and window sizes
+        hotness = trace_hotness(trace, block_size, window_size)
+        pyramid = temporary_pyramid(hotness)
+    else:
+        # Tiled multi-resolution aggregates of the accessed blocks (reused
+        # from the sidecar when the log did not change)
+        pyramid = load_pyramid(filename, sidecar)
+    block_indices = pyramid.all_block_indices
 
     # Automatically compute the offset (e.g., 1.338e8)
     offset = np.floor(np.min(block_indices) / 10**np.floor(np.log10(np.ptp(block_indices)))) * 10**np.floor(np.log10(np.ptp(block_indices)))
 
-    # Convert to DataFrame
-    df = pd.DataFrame(data, columns=block_indices)
-
-    # Remove blocks with all-zero access counts
-    non_zero_rows = (df.T.sum(axis=1) > 0)
-    df_filtered = df.T[non_zero_rows].T
-    block_indices_filtered = np.array(block_indices)[non_zero_rows.values]
+    # Blocks with all-zero access counts are not in the pyramid
+    block_indices_filtered = pyramid.block_indices
+    print(f"{pyramid.n_steps} time steps, {pyramid.n_blocks} of {len(block_indices)} blocks accessed, "
+          f"{pyramid.meta['nnz']} nonzero counts")
 
     # Create figure and axes
     global_font_size = 16
     fig, ax = plt.subplots(figsize=(10, 5))
 
+    # Fetch the window at about one cell per pixel; the max of every cell
+    # keeps the hot spots visible at coarse levels
+    t0, t1 = steps if steps else (0, pyramid.n_steps)
+    b0, b1 = blocks if blocks else (0, pyramid.n_blocks)
+    width, height = axes_pixels(ax)
+    level = pyramid.level_for(t0, t1, b0, b1, width, height)
+    cells, (et0, et1, eb0, eb1) = pyramid.window(t0, t1, b0, b1, level, agg="max")
+    print(f"Window [{t0}, {t1}) x [{b0}, {b1}) at {1 << level}x coarsening, {pyramid.tiles_read} tiles read")
+
     # Plot with log scale and tighter range
-    im = ax.imshow(df_filtered.T, aspect='auto', interpolation='nearest',
-            cmap='coolwarm', origin='lower', norm=LogNorm(vmin=1, vmax=df_filtered.values.max()))
+    im = ax.imshow(cells.T, aspect='auto', interpolation='nearest',
+            cmap='coolwarm', origin='lower', norm=LogNorm(vmin=1, vmax=pyramid.meta['max_count']),
+            extent=(et0 - 0.5, et1 - 0.5, eb0 - 0.5, eb1 - 0.5))
+    ax.set_xlim(t0 - 0.5, t1 - 0.5)
+    ax.set_ylim(b0 - 0.5, b1 - 0.5)
 
     # Add colorbar
     cbar = fig.colorbar(im, ax=ax)
     cbar.set_label('Access Count (log scale)', fontsize=global_font_size)
 
     # Set labels
-    ax.set_xlabel('Timestamps (Every 1 Million Memory Accesses)', fontsize=global_font_size)
-    ax.set_ylabel('Memory Block Index (2MB Blocks)', fontsize=global_font_size)
+    window_label = "1 Million" if window_size == 1000000 else f"{window_size:,}"
+    ax.set_xlabel(f'Timestamps (Every {window_label} Memory Accesses)', fontsize=global_font_size)
+    ax.set_ylabel(f'Memory Block Index ({size_label(block_size)} Blocks)', fontsize=global_font_size)
     # ax.get_yaxis().set_label_coords(-0.02, 0.5)
     # ax.set_title(fig_name, fontsize=global_font_size)
 
     # Show only min and max (in scientific notation)
     min_idx = 0
-    max_idx = df_filtered.shape[1] - 1
+    max_idx = pyramid.n_blocks - 1
     min_label = f"{block_indices_filtered[min_idx] - offset:.1e}"
     max_label = f"{block_indices_filtered[max_idx] - offset:.1e}"
 
@@ -63,24 +89,77 @@ def plot_hotness(filename, fig_name, output_folder):
     plt.close(fig)
 
 
-def main(result_log, output_folder):
+def main(result_log, output_folder, sidecar=True, steps=None, blocks=None,
+         trace=None, block_size=DEFAULT_BLOCK_SIZE, window_size=DEFAULT_WINDOW_SIZE):
     # Read from file
     fig_name = f'hotness'
-    plot_hotness(filename=result_log, fig_name=fig_name, output_folder=output_folder)
+    if steps or blocks:
+        # zoomed views do not overwrite the full figure
+        fig_name += f"_t{'-'.join(map(str, steps or ('all',)))}_b{'-'.join(map(str, blocks or ('all',)))}"
+    plot_hotness(filename=result_log, fig_name=fig_name, output_folder=output_folder, sidecar=sidecar,
+                 steps=steps, blocks=blocks, trace=trace, block_size=block_size, window_size=window_size)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Plot hotness from result.log")
     parser.add_argument(
         "--result-log",
         type=str,
-        required=True,
+        required=False,
+        default=None,
         help="Path to result.log file"
     )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        required=False,
+        default=None,
+        help="Raw uint64 address trace (file or folder of chunk files) to bin instead of --result-log"
+    )
+    parser.add_argument(
+        "--block-size",
+        type=parse_size,
+        required=False,
+        default=DEFAULT_BLOCK_SIZE,
+        help="Block size for --trace, e.g. 4KB, 64KB, 2MB (default: 2MB)"
+    )
+    parser.add_argument(
+        "--window-size",
+        type=int,
+        required=False,
+        default=DEFAULT_WINDOW_SIZE,
+        help="Accesses per time step for --trace (default: 1000000)"
+    )
     parser.add_argument(
         "--output-folder",
         type=str,
         required=True,
         help="Output folder"
     )
+    parser.add_argument(
+        "--no-sidecar",
+        action="store_true",
+        help="Do not read or write the parsed <result-log>.hotness sidecar"
+    )
+    parser.add_argument(
+        "--steps",
+        type=int,
+        nargs=2,
+        required=False,
+        default=None,
+        metavar=("START", "STOP"),
+        help="Only draw time steps [START, STOP)"
+    )
+    parser.add_argument(
+        "--blocks",
+        type=int,
+        nargs=2,
+        required=False,
+        default=None,
+        metavar=("START", "STOP"),
+        help="Only draw the accessed blocks [START, STOP) (positions on the y axis)"
+    )
     args = parser.parse_args()
-    main(args.result_log, args.output_folder)
\ No newline at end of file
+    if (args.result_log is None) == (args.trace is None):
+        parser.error("exactly one of --result-log and --trace is required")
+    main(args.result_log, args.output_folder, not args.no_sidecar, args.steps, args.blocks,
+         args.trace, args.block_size, args.window_size)
\ No newline at end of file
@@ -0,0 +1,96 @@
+import os
+import sys
+import argparse
+import matplotlib.pyplot as plt
+import numpy as np
+import matplotlib as mpl
+mpl.rcParams['pdf.fonttype'] = 42
+mpl.rcParams['ps.fonttype'] = 42
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.address_trace import parse_size
+from common.decimate import minmax_decimate, plot_buckets
+from common.hotness import load_hotness
+from common.log_io import strip_compression_ext
+from common.working_set import DEFAULT_PERCENTILES, wss_curves, wss_percentiles
+
+MB = 1024 * 1024
+
+
+def model_name(result_log):
+    name = strip_compression_ext(os.path.basename(result_log))
+    for suffix in (".log", "_time_hotness_cpu", ".time_hotness_cpu"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name
+
+
+def main(result_logs, windows, block_size, output_folder, sidecar=True):
+    header = " ".join(f"{f'p{p}':>9}" for p in DEFAULT_PERCENTILES)
+    for result_log in result_logs:
+        model = model_name(result_log)
+        hotness = load_hotness(result_log, sidecar)
+        valid = [w for w in windows if 1 <= w <= hotness.n_steps]
+        if len(valid) < len(windows):
+            print(f"Warning: {model} has {hotness.n_steps} time steps, skipping longer windows")
+        curves = wss_curves(hotness, valid)
+
+        # Working-set size percentiles over all window positions, in MB
+        print(f"{model}: {hotness.n_steps} time steps")
+        print(f"{'window':>8} {header}")
+        for w, values in wss_percentiles(curves).items():
+            print(f"{w:>8} " + " ".join(f"{v * block_size / MB:>9.0f}" for v in values))
+
+        if output_folder:
+            fig, ax = plt.subplots(figsize=(10, 3.5))
+            n_buckets = plot_buckets(ax)
+            for w, curve in curves.items():
+                t, y = minmax_decimate(curve * block_size / MB, n_buckets)
+                ax.plot(t, y, lw=1.0, label=f"W = {w}", rasterized=True)
+            ax.set_xlabel("Window Start (Time Step)")
+            ax.set_ylabel("Working Set (MB)")
+            ax.grid(True, ls="--", alpha=0.25)
+            ax.legend(loc="upper right", frameon=True, fancybox=True, framealpha=0.85)
+            fig_filename = os.path.join(output_folder, f"wss_{model}.pdf")
+            fig.savefig(fig_filename, format="pdf", dpi=600, bbox_inches="tight")
+            plt.close(fig)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Working-set size over time from time_hotness_cpu logs")
+    parser.add_argument(
+        "--result-log",
+        type=str,
+        nargs="+",
+        required=True,
+        help="time_hotness_cpu log(s), one per model"
+    )
+    parser.add_argument(
+        "--windows",
+        type=int,
+        nargs="+",
+        required=False,
+        default=[1, 10, 100, 1000],
+        help="Window lengths in time steps"
+    )
+    parser.add_argument(
+        "--block-size",
+        type=parse_size,
+        required=False,
+        default=2 * MB,
+        help="Block size of the logs (default: 2MB)"
+    )
+    parser.add_argument(
+        "--output-folder",
+        type=str,
+        required=False,
+        default=None,
+        help="Output folder for the WSS(t, W) plots"
+    )
+    parser.add_argument(
+        "--no-sidecar",
+        action="store_true",
+        help="Do not read or write the parsed <result-log>.hotness sidecar"
+    )
+    args = parser.parse_args()
+    main(args.result_log, args.windows, args.block_size, args.output_folder, not args.no_sidecar)
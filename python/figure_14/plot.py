@@ -1,29 +1,23 @@
 import os
+import sys
 import argparse
 import matplotlib.pyplot as plt
-import re
 from matplotlib.ticker import FuncFormatter
 import numpy as np
 import matplotlib as mpl
 mpl.rcParams['pdf.fonttype'] = 42   # embed TrueType; searchable/selectable text
 mpl.rcParams['ps.fonttype']  = 42
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.decimate import minmax_decimate, plot_buckets
+from common.memory_timeline import MemoryTimeline
+from common.tensor_events import cached_tensor_events
+
 
 def parse_log_file(file_path):
-    """Parse log file and extract memory sizes from Malloc/Free tensor lines."""
-    idx = -3  # Index to extract reserved size (third-to-last number)
-    memory_sizes = []
-    
-    with open(file_path, "r") as f:
-        line = f.readline()
-        while line:
-            if "Malloc tensor" in line or "Free tensor" in line:
-                nums = re.findall(r"\d+\.?\d*", line)
-                if len(nums) > abs(idx):
-                    memory_sizes.append(int(nums[idx]))
-            line = f.readline()
-    
-    return np.array(memory_sizes)
+    """Parse log file into a MemoryTimeline of the Malloc/Free tensor lines."""
+    # allocated bytes: third-to-last number of each record
+    return MemoryTimeline.from_events(cached_tensor_events(file_path))
 
 
 # --- helpers ------------------------------------------------
@@ -34,14 +28,14 @@ def bytes_to_mb(x, _):
 def main(log_file, output_folder, label=None):
     """Plot memory usage over time from a single log file."""
     # Parse the log file
-    memory_sizes = parse_log_file(log_file)
+    timeline = parse_log_file(log_file)
     
-    if len(memory_sizes) == 0:
+    if len(timeline) == 0:
         print(f"Warning: No memory data found in {log_file}")
         return
-    
-    # Create time axis
-    t = np.arange(len(memory_sizes))
+    memory_sizes = timeline.values
+    peak_event, peak_bytes = timeline.peak()
+    print(f"Peak memory: {bytes_to_mb(peak_bytes, None)} MB at event {peak_event}")
     
     # Get label from filename if not provided
     if label is None:
@@ -63,7 +57,8 @@ def main(log_file, output_folder, label=None):
     fig, ax = plt.subplots(figsize=(11.5, 3.5))
     ax.xaxis.set_major_formatter(FuncFormatter(k_formatter))
 
-    # Plot memory usage
+    # Plot memory usage, min/max decimated to about one bucket per pixel
+    t, memory_sizes = minmax_decimate(memory_sizes, plot_buckets(ax))
     ax.plot(t, memory_sizes, label=label, color="tab:blue", lw=1.0, alpha=0.95, rasterized=True)
     ax.fill_between(t, 0, memory_sizes, color="tab:blue", alpha=0.2, rasterized=True)
 
@@ -1,5 +1,6 @@
+import os
+import sys
 import matplotlib.pyplot as plt
-import re
 from matplotlib.ticker import FuncFormatter
 import numpy as np
 import argparse
@@ -7,27 +8,26 @@ import matplotlib as mpl
 mpl.rcParams['pdf.fonttype'] = 42   # embed TrueType; searchable/selectable text
 mpl.rcParams['ps.fonttype']  = 42
 
-def main(log_path, output_folder):
-    idx = -3
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.align import apply_lag, find_lag
+from common.decimate import minmax_decimate, plot_buckets
+from common.log_io import find_log
+from common.memory_timeline import MemoryTimeline
+from common.tensor_events import cached_tensor_events
+from common.trace_diff import diff_timelines, print_diff
+
+def main(log_path, output_folder, align=False, max_lag=None, diff=False):
     # Read GPU 0 memory data
-    with open(f"{log_path}/out_nvidia.log", "r") as f:
-        gpu0 = []
-        line = f.readline()
-        while line:
-            if line.startswith("Malloc tensor") or line.startswith("Free tensor"):
-                nums = re.findall(r"\d+\.?\d*", line)
-                gpu0.append(int(nums[idx]))
-            line = f.readline()
+    timeline0 = MemoryTimeline.from_events(cached_tensor_events(find_log(f"{log_path}/out_nvidia.log")))
+    gpu0 = timeline0.values
 
     # Read GPU 1 memory data
-    with open(f"{log_path}/out_amd.log", "r") as f:
-        gpu1 = []
-        line = f.readline()
-        while line:
-            if line.startswith("Malloc tensor") or line.startswith("Free tensor"):
-                nums = re.findall(r"\d+\.?\d*", line)
-                gpu1.append(int(nums[idx]))
-            line = f.readline()
+    timeline1 = MemoryTimeline.from_events(cached_tensor_events(find_log(f"{log_path}/out_amd.log")))
+    gpu1 = timeline1.values
+    for name, timeline in (("NVIDIA", timeline0), ("AMD", timeline1)):
+        if len(timeline):
+            peak_event, peak_bytes = timeline.peak()
+            print(f"{name}: {len(timeline)} events, peak {peak_bytes / 1024 / 1024:.1f} MB at event {peak_event}")
 
     # --- align by common prefix + tails -------------------------
     n_common = min(len(gpu0), len(gpu1))
@@ -47,27 +47,22 @@ def main(log_path, output_folder):
     to_MB = lambda arr: arr / (1024*1024)
 
 
-    # --- optional: auto-align traces by maximizing cross-correlation (index-based) ---
-    # Set to True to detect & correct a small constant lag between the two sequences.
-    AUTO_ALIGN = False
-    if AUTO_ALIGN and len(gpu0_c) > 3 and len(gpu1_c) > 3:
-        import numpy as _np
-        a = gpu0_c - _np.mean(gpu0_c)
-        b = gpu1_c - _np.mean(gpu1_c)
-        corr = _np.correlate(a, b, mode="full")
-        lag = corr.argmax() - (len(a) - 1)   # positive => gpu1_c should be shifted right (starts later)
-        if lag != 0:
-            # Trim both arrays to realign by 'lag' without padding with NaNs
-            if lag > 0:
-                # gpu1 lags: drop first 'lag' from gpu1 and last 'lag' from gpu0
-                gpu0_c = gpu0_c[:-lag]
-                gpu1_c = gpu1_c[lag:]
-                t_common = _np.arange(len(gpu0_c))
-            else:
-                # gpu0 lags: drop first '-lag' from gpu0 and last '-lag' from gpu1
-                gpu0_c = gpu0_c[-lag:]
-                gpu1_c = gpu1_c[:lag]
-                t_common = _np.arange(len(gpu0_c))
+    # --- optional: match the events by (kind, size) instead of by index ---
+    # an allocation present in one trace only no longer shifts the rest
+    if diff:
+        trace_diff = diff_timelines(timeline0, timeline1)
+        print_diff(trace_diff, gpu0, gpu1, names=("NVIDIA", "AMD"))
+        gpu0_c, gpu1_c = trace_diff.aligned(gpu0, gpu1)
+        gpu0_tail, gpu1_tail = gpu0_c[:0], gpu1_c[:0]
+        t_common = np.arange(len(gpu0_c))
+
+    # --- optional: align the traces by maximizing their cross-correlation ---
+    # lag > 0: the AMD trace starts `lag` events later than the NVIDIA one
+    elif align and len(gpu0_c) > 3 and len(gpu1_c) > 3:
+        lag, score = find_lag(gpu0_c, gpu1_c, max_lag)
+        print(f"Alignment: lag {lag} events, correlation {score:.4f}")
+        gpu0_c, gpu1_c = apply_lag(gpu0_c, gpu1_c, lag)
+        t_common = np.arange(len(gpu0_c))
 
     diff_mb_common = to_MB(gpu1_c - gpu0_c)
 
@@ -92,6 +87,17 @@ def main(log_path, output_folder):
     ax2.xaxis.set_major_formatter(FuncFormatter(k_formatter))
     ax1.tick_params(axis='x', which='both', bottom=False, top=False, labelbottom=False)
 
+    # --- decimate: about one min/max bucket per pixel of the axes ---
+    n_buckets = plot_buckets(ax1)
+    n_total = len(gpu0_c) + max(len(gpu0_tail), len(gpu1_tail))
+    share = lambda length: max(1, n_buckets * length // n_total)
+    n_c = len(gpu0_c)
+    t_common, gpu0_c = minmax_decimate(gpu0_c, share(n_c))
+    _, gpu1_c = minmax_decimate(gpu1_c, share(n_c))
+    _, diff_mb_common = minmax_decimate(diff_mb_common, share(n_c))
+    t0_tail, gpu0_tail = minmax_decimate(gpu0_tail, share(len(gpu0_tail)), n_common)
+    t1_tail, gpu1_tail = minmax_decimate(gpu1_tail, share(len(gpu1_tail)), n_common)
+
     # ---------- Panel 1: Absolute usage (unchanged) ----------
     ax1.plot(t_common, gpu0_c, label="NVIDIA", color="tab:blue", lw=1.0, alpha=0.95, rasterized=True)
     ax1.plot(t_common, gpu1_c, label="AMD", color="tab:orange", lw=1.0, alpha=0.95, ls="--", rasterized=True)
@@ -174,7 +180,24 @@ if __name__ == "__main__":
         required=True,
         help="Output folder for the plot"
     )
+    parser.add_argument(
+        "--align",
+        action="store_true",
+        help="Shift the traces by the lag maximizing their cross-correlation before comparing them"
+    )
+    parser.add_argument(
+        "--max-lag",
+        type=int,
+        required=False,
+        default=None,
+        help="Largest lag (in events) considered by --align (default: any)"
+    )
+    parser.add_argument(
+        "--diff",
+        action="store_true",
+        help="Match the events of the two traces by (kind, size) with a diff instead of by index"
+    )
 
     args = parser.parse_args()
     
-    main(args.log_path, args.output_folder)
+    main(args.log_path, args.output_folder, args.align, args.max_lag, args.diff)
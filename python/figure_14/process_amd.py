@@ -3,14 +3,13 @@ import re
 import sys
 import argparse
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.tensor_events import cached_event_lines
 
-def main(log_file):
-    file = open(log_file, "r")
-    line = file.readline()
-    while line:
-        if line.startswith("Malloc tensor") or line.startswith("Free tensor"):
-            print(line.strip())
-        line = file.readline()
+
+def main(log_file, jobs=1):
+    sys.stdout.buffer.write(cached_event_lines(log_file, jobs=jobs))
+    sys.stdout.flush()
     
 
 if __name__ == "__main__":
@@ -21,6 +20,13 @@ if __name__ == "__main__":
         required=True,
         help="Log file path"
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        required=False,
+        default=1,
+        help="Number of processes used to parse the log (0: one per core)"
+    )
 
     args = parser.parse_args()
-    main(args.log_file)
+    main(args.log_file, args.jobs)
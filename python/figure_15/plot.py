@@ -1,6 +1,7 @@
 import matplotlib.pyplot as plt
 import re
 import os
+import sys
 import argparse
 from matplotlib.ticker import FuncFormatter
 import numpy as np
@@ -8,19 +9,59 @@ import matplotlib as mpl
 mpl.rcParams['pdf.fonttype'] = 42   # embed TrueType; searchable/selectable text
 mpl.rcParams['ps.fonttype']  = 42
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.decimate import minmax_decimate, plot_buckets
+from common.log_io import find_log, open_log, strip_compression_ext
+from common.memory_timeline import MemoryTimeline
+from common.rank_arrays import list_ranks, rank_array_path
+from common.trace_diff import diff_timelines, print_diff
 
-def read_mem_data(fname):
+
+def read_mem_data(path, file_name, rank):
+    """MemoryTimeline of the allocated bytes after every event of one rank.
+
+    Memory-maps the binary arrays written by process.py; text outputs
+    (--format txt, possibly compressed) are still parsed line by line.
+    """
+    prefix = f"{path}/{file_name}"
+    if os.path.exists(rank_array_path(prefix, rank)):
+        return MemoryTimeline.from_rank_arrays(prefix, rank)
+
+    fname = find_log(f"{prefix}_{rank}.txt")
+    if not os.path.exists(fname):
+        print(f"Warning: no data for rank {rank} in {path}")
+        return MemoryTimeline(np.empty(0, dtype=np.int64))
     mem = []
-    with open(fname, "r") as f:
+    with open_log(fname) as f:
         for line in f:
             m = re.search(r"\d+", line)
             if m:
                 mem.append(int(m.group(0)))
-    return mem
-
-def draw_parallelism(path, file_name, output_folder):
-    gpu0 = read_mem_data(f"{path}/{file_name}_0.txt")
-    gpu1 = read_mem_data(f"{path}/{file_name}_1.txt")
+    return MemoryTimeline(np.array(mem, dtype=np.int64))
+
+def list_mem_ranks(path, file_name):
+    """Sorted ranks written by process.py: of the binary arrays, else of the text outputs."""
+    ranks = list_ranks(f"{path}/{file_name}")
+    if ranks or not os.path.isdir(path):
+        return ranks
+    pattern = re.compile(re.escape(file_name) + r"_(\d+)\.txt$")
+    matches = (pattern.match(strip_compression_ext(name)) for name in os.listdir(path))
+    return sorted({int(m.group(1)) for m in matches if m})
+
+
+def draw_parallelism(path, file_name, output_folder, diff=False):
+    ranks = list_mem_ranks(path, file_name)
+    timelines = [read_mem_data(path, file_name, rank) for rank in ranks]
+    for rank, timeline in zip(ranks, timelines):
+        if len(timeline):
+            peak_event, peak_bytes = timeline.peak()
+            print(f"  GPU {rank}: {len(timeline)} events, peak {peak_bytes / 1024 / 1024:.1f} MB at event {peak_event}")
+    # the plot compares the first two ranks
+    if len(ranks) < 2:
+        print(f"Warning: {len(ranks)} rank(s) in {path}, need 2 to compare")
+        return
+    r0, r1 = ranks[:2]
+    gpu0, gpu1 = timelines[0].values, timelines[1].values
 
     # --- align by common prefix + tails -------------------------
     n_common = min(len(gpu0), len(gpu1))
@@ -32,6 +73,14 @@ def draw_parallelism(path, file_name, output_folder):
     t0_tail   = np.arange(n_common, n_common + len(gpu0_tail))
     t1_tail   = np.arange(n_common, n_common + len(gpu1_tail))
 
+    # --- optional: match the events by (kind, size) instead of by index ---
+    if diff:
+        trace_diff = diff_timelines(timelines[0], timelines[1])
+        print_diff(trace_diff, gpu0, gpu1, names=(f"GPU {r0}", f"GPU {r1}"))
+        gpu0_c, gpu1_c = trace_diff.aligned(gpu0, gpu1)
+        gpu0_tail, gpu1_tail = gpu0_c[:0], gpu1_c[:0]
+        t_common = np.arange(len(gpu0_c))
+
     # --- helpers ------------------------------------------------
     def bytes_to_mb(x, _):
         # return f"{x/1024/1024:.1f}"
@@ -62,15 +111,26 @@ def draw_parallelism(path, file_name, output_folder):
     ax2.xaxis.set_major_formatter(FuncFormatter(k_formatter))
     ax1.tick_params(axis='x', which='both', bottom=False, top=False, labelbottom=False)
 
+    # --- decimate: about one min/max bucket per pixel of the axes ---
+    n_buckets = plot_buckets(ax1)
+    n_total = len(gpu0_c) + max(len(gpu0_tail), len(gpu1_tail))
+    share = lambda length: max(1, n_buckets * length // n_total)
+    n_c = len(gpu0_c)
+    t_common, gpu0_c = minmax_decimate(gpu0_c, share(n_c))
+    _, gpu1_c = minmax_decimate(gpu1_c, share(n_c))
+    _, diff_mb_common = minmax_decimate(diff_mb_common, share(n_c))
+    t0_tail, gpu0_tail = minmax_decimate(gpu0_tail, share(len(gpu0_tail)), n_common)
+    t1_tail, gpu1_tail = minmax_decimate(gpu1_tail, share(len(gpu1_tail)), n_common)
+
     # ---------- Panel 1: Absolute usage (unchanged) ----------
-    ax1.plot(t_common, gpu0_c, label="GPU 0", color="tab:blue", lw=1.0, alpha=0.95, rasterized=True)
-    ax1.plot(t_common, gpu1_c, label="GPU 1", color="tab:orange", lw=1.0, alpha=0.95, ls="--", rasterized=True)
+    ax1.plot(t_common, gpu0_c, label=f"GPU {r0}", color="tab:blue", lw=1.0, alpha=0.95, rasterized=True)
+    ax1.plot(t_common, gpu1_c, label=f"GPU {r1}", color="tab:orange", lw=1.0, alpha=0.95, ls="--", rasterized=True)
     ax1.fill_between(t_common, gpu0_c, gpu1_c, color="gray", alpha=0.1, rasterized=True)
 
     if gpu0_tail.size:
-        ax1.plot(t0_tail, gpu0_tail, color="tab:blue", lw=0.9, ls=":", alpha=0.9, label="GPU 0 (tail)", rasterized=True)
+        ax1.plot(t0_tail, gpu0_tail, color="tab:blue", lw=0.9, ls=":", alpha=0.9, label=f"GPU {r0} (tail)", rasterized=True)
     if gpu1_tail.size:
-        ax1.plot(t1_tail, gpu1_tail, color="tab:orange", lw=0.9, ls=":", alpha=0.9, label="GPU 1 (tail)", rasterized=True)
+        ax1.plot(t1_tail, gpu1_tail, color="tab:orange", lw=0.9, ls=":", alpha=0.9, label=f"GPU {r1} (tail)", rasterized=True)
 
     ax1.yaxis.set_major_formatter(FuncFormatter(bytes_to_mb))
     ax1.set_ylabel("Memory Usage\n(MB)")
@@ -87,11 +147,11 @@ def draw_parallelism(path, file_name, output_folder):
     diff_neg = np.where(neg_mask, diff_mb_common, np.nan)
 
     # Positive region (GPU1 > GPU0)
-    ax2.plot(t_common, diff_pos, color="green", lw=0.9, label="GPU1 > GPU0 (Δ)", rasterized=True)
+    ax2.plot(t_common, diff_pos, color="green", lw=0.9, label=f"GPU{r1} > GPU{r0} (Δ)", rasterized=True)
     ax2.fill_between(t_common, 0, diff_mb_common, where=pos_mask, interpolate=True, color="green", alpha=0.15, rasterized=True)
 
     # Negative region (GPU0 > GPU1)
-    ax2.plot(t_common, diff_neg, color="red", lw=0.9, label="GPU0 > GPU1 (Δ)", rasterized=True)
+    ax2.plot(t_common, diff_neg, color="red", lw=0.9, label=f"GPU{r0} > GPU{r1} (Δ)", rasterized=True)
     ax2.fill_between(t_common, 0, diff_mb_common, where=neg_mask, interpolate=True, color="red", alpha=0.15, rasterized=True)
 
     # Tail differences with shade
@@ -112,7 +172,7 @@ def draw_parallelism(path, file_name, output_folder):
     ax2.set_xlabel("(Time Stamp)", loc="right", labelpad=1, fontsize=8)
 
     ax2.grid(True, ls="--", alpha=0.25)
-    ax2.set_ylabel("Δ Memory (MB)\n(GPU1 − GPU0)")
+    ax2.set_ylabel(f"Δ Memory (MB)\n(GPU{r1} − GPU{r0})")
     ax2.legend(loc="upper center", frameon=True, fancybox=True, framealpha=0.85, ncol=3)
 
     # for ax in (ax1, ax2):
@@ -127,13 +187,13 @@ def draw_parallelism(path, file_name, output_folder):
     plt.close()
 
 
-def main(log_path, output_folder):
+def main(log_path, output_folder, diff=False):
     parallelisms = [f"{log_path}/tp", f"{log_path}/dp", f"{log_path}/pp"]
     # parallelisms = ["tp"]
     for path in parallelisms:
         print(f"Drawing {path}...")
         file_name = "tensor_gpu"
-        draw_parallelism(path, file_name, output_folder)
+        draw_parallelism(path, file_name, output_folder, diff)
 
 
 if __name__ == "__main__":
@@ -150,7 +210,12 @@ if __name__ == "__main__":
         required=True,
         help="Output folder for the plot"
     )
+    parser.add_argument(
+        "--diff",
+        action="store_true",
+        help="Match the events of GPU 0 and GPU 1 by (kind, size) with a diff instead of by index"
+    )
     args = parser.parse_args()
 
-    main(args.log_path, args.output_folder)
+    main(args.log_path, args.output_folder, args.diff)
 
@@ -2,29 +2,33 @@ import os
 import re
 import sys
 import argparse
+import numpy as np
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.log_io import COMPRESSION_FORMATS, open_output
+from common.rank_arrays import write_rank_arrays
+from common.tensor_events import cached_tensor_events
 
-def main(log_file, output_folder):
-    # open two files, tensor_gpu_0.txt and tensor_gpu_1.txt
-    file0 = open(f"{output_folder}/tensor_gpu_0.txt", "w")
-    file1 = open(f"{output_folder}/tensor_gpu_1.txt", "w")
-
-    file = open(log_file, "r")
-    line = file.readline()
-    while line:
-        if line.startswith("Malloc tensor") or line.startswith("Free tensor"):
-            nums = re.findall(r"\d+\.?\d*", line)
-            device = int(nums[-1])
-            allocated_size = int(nums[-3])
-            if device == 0:
-                file0.write(f"{allocated_size}\n")
-            elif device == 1:
-                file1.write(f"{allocated_size}\n")
-        line = file.readline()
-
-    file0.close()
-    file1.close()
-    file.close()
+
+def _write_sizes(file_name, sizes, compress=None):
+    f, _ = open_output(file_name, compress)
+    with f:
+        if len(sizes):
+            f.write("\n".join(map(str, sizes.tolist())) + "\n")
+
+
+def main(log_file, output_folder, jobs=1, compress=None, out_format="bin"):
+    events = cached_tensor_events(log_file, jobs)
+
+    # one output per device index: tensor_gpu_<rank>.{alloc,kind,ptr}.bin,
+    # or tensor_gpu_<rank>.txt (+ .gz/.xz/.bz2) with the allocated sizes only
+    if out_format == "bin":
+        write_rank_arrays(events, f"{output_folder}/tensor_gpu")
+        return
+    device = events["device"]
+    allocated_size = events["total_allocated"]
+    for rank in np.unique(device).tolist():
+        _write_sizes(f"{output_folder}/tensor_gpu_{rank}.txt", allocated_size[device == rank], compress)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -40,6 +44,31 @@ if __name__ == "__main__":
         required=True,
         help="Output folder path"
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        required=False,
+        default=1,
+        help="Number of processes used to parse the log (0: one per core)"
+    )
+    parser.add_argument(
+        "--compress",
+        type=str,
+        required=False,
+        default=None,
+        choices=COMPRESSION_FORMATS,
+        help="Write the per-device text outputs compressed (--format txt)"
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        required=False,
+        default="bin",
+        choices=["bin", "txt"],
+        help="bin: int64/int8/uint64 arrays per rank (memory-mapped by plot.py); txt: one size per line"
+    )
 
     args = parser.parse_args()
-    main(args.log_file, args.output_folder)
+    if args.compress and args.format != "txt":
+        parser.error("--compress requires --format txt")
+    main(args.log_file, args.output_folder, args.jobs, args.compress, args.format)
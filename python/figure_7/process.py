@@ -1,75 +1,74 @@
 import os
-import re
 import sys
 import argparse
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.app_analysis import cached_kernel_columns
+from common.follow import follow_logs
+from common.log_io import list_logs, strip_compression_ext
+from common.parallel import map_files
 
 
-# parse the log file output by the app_analysis tool
-def parse_log_file(file_path):
-    # {kernel_id: [kernel_name, access_count, tensor_working_set_size, memory_working_set_size, tensor_footprint_size, memory_footprint_size]}
-    kernel_dict = {}
-
-    file = open(file_path, "r")
-    line = file.readline()
-    while line:
-        line = line.strip()
-        current_kid = None
-        current_data = []
-        if line.startswith("Kernel ID:"):
-            nums = re.findall(r"\d+\.?\d*", line)
-            current_kid = int(nums[0])
-            line = file.readline()  # Kernel Name
-            current_data.append(line.replace("  Kernel Name:", "").strip())
-            line = file.readline()  # Access Count
-            current_data.append(int(re.findall(r"\d+\.?\d*", line)[0]))
-            line = file.readline()  # Tensor Working Set Size
-            current_data.append(int(re.findall(r"\d+\.?\d*", line)[0]))
-            line = file.readline()  # Memory Working Set Size
-            current_data.append(int(re.findall(r"\d+\.?\d*", line)[0]))
-            line = file.readline()  # Tensor Footprint Size
-            current_data.append(int(re.findall(r"\d+\.?\d*", line)[0]))
-            line = file.readline()  # Memory Footprint Size
-            current_data.append(int(re.findall(r"\d+\.?\d*", line)[0]))
-        if current_kid is not None:
-            kernel_dict[current_kid] = current_data
-        line = file.readline()
-    return kernel_dict
-
-
-def _get_kernel_name(kernel_dict, out_filename=""):
+def _get_kernel_name(columns, kernel_names, out_filename=""):
     # write to file or print to console
     if out_filename == "":
         std_out = sys.stdout
     else:
         std_out = open(out_filename, "w")
 
-    for _, kernel_data in kernel_dict.items():
-        std_out.write(kernel_data[0] + "\n")
+    for name_id in columns["name_id"]:
+        std_out.write(kernel_names[name_id] + "\n")
     std_out.close()
 
 
-def get_all_kernel_name(all_kernel_dicts, output_folder):
+def get_all_kernel_name(all_kernel_columns, output_folder):
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
-    for key, value in all_kernel_dicts.items():
+    for key, (columns, kernel_names) in all_kernel_columns.items():
         print(f"Processing {output_folder}/{key}_kernel_name.txt... Done")
-        _get_kernel_name(value, f"{output_folder}/{key}_kernel_name.txt")
+        _get_kernel_name(columns, kernel_names, f"{output_folder}/{key}_kernel_name.txt")
+
+def _follow_kernel_names(log_folder, output_folder, state_dir, interval):
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    # (follower generation, rows) already written to each output file
+    written = {}
+
+    def on_update(updated):
+        for file, follower in updated.items():
+            key = file.rstrip("_app_analysis.log")
+            generation, start = written.get(key, (None, 0))
+            if generation != follower.generation:
+                # first update, or the log was replaced: rewrite the file
+                start = 0
+            mode = "a" if start else "w"
+            with open(f"{output_folder}/{key}_kernel_name.txt", mode) as f:
+                for name_id in follower.columns()["name_id"][start:]:
+                    f.write(follower.kernel_names[name_id] + "\n")
+            written[key] = (follower.generation, follower.rows)
+            print(f"Updating {output_folder}/{key}_kernel_name.txt... {follower.rows} kernels", flush=True)
+
+    follow_logs(log_folder, on_update, state_dir, interval)
+
+
+def main(root_folder, output_folder, jobs=1, follow=False, state_dir=None, interval=10.0):
+    if follow:
+        _follow_kernel_names(root_folder, output_folder, state_dir, interval)
+        return
 
-def main(root_folder, output_folder):
     # log_folder = f"{root_folder}/train_raw"
     log_folder = f"{root_folder}"
-    log_files = [f for f in os.listdir(log_folder) if f.endswith(".log")]
+    log_files = list_logs(log_folder)
     # print(log_files)
 
-    all_kernel_dicts = {}
-    for file in log_files:
-        kernel_dict = parse_log_file(os.path.join(log_folder, file))
-        all_kernel_dicts[file.rstrip("_app_analysis.log")] = kernel_dict
-        # print(file.rstrip("_app_analysis.log"),len(kernel_dict.keys()))
+    all_kernel_columns = {}
+    results = map_files(cached_kernel_columns, [os.path.join(log_folder, file) for file in log_files], jobs)
+    for file, (columns, kernel_names) in zip(log_files, results):
+        all_kernel_columns[strip_compression_ext(file).rstrip("_app_analysis.log")] = (columns, kernel_names)
+        # print(file.rstrip("_app_analysis.log"), len(columns["kernel_id"]))
     
-    get_all_kernel_name(all_kernel_dicts, output_folder)
+    get_all_kernel_name(all_kernel_columns, output_folder)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -86,5 +85,32 @@ if __name__ == "__main__":
         required=True,
         help="Output folder path"
     )
+
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        required=False,
+        default=1,
+        help="Number of log files parsed in parallel (0: one per core)"
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep extracting kernel names from logs that are still being written, until Ctrl-C"
+    )
+    parser.add_argument(
+        "--follow-interval",
+        type=float,
+        required=False,
+        default=10.0,
+        help="Seconds between two polls in --follow mode"
+    )
+    parser.add_argument(
+        "--state-dir",
+        type=str,
+        required=False,
+        default=None,
+        help="Checkpoint folder of --follow mode (default ~/.cache/cgo26-ae/follow)"
+    )
     args = parser.parse_args()
-    main(args.log_folder, args.output_folder)
+    main(args.log_folder, args.output_folder, args.jobs, args.follow, args.state_dir, args.follow_interval)
@@ -1,22 +1,28 @@
 import os
+import sys
 import argparse
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.log_io import find_log
+from common.tail import tail_lines
+
 def parse_elapsed_time_to_seconds(time_str):
     h, m, s = map(int, time_str.strip().split(":"))
     return h * 3600 + m * 60 + s
 
 def extract_elapsed_time_from_file(file_path):
+    file_path = find_log(file_path)
     if not os.path.exists(file_path):
         return 0
     try:
-        with open(file_path, 'r') as f:
-            lines = f.readlines()
-            if not lines:
-                return 0
-            last_line = lines[-1]
-            if "[ACCELPROF INFO] ELAPSED TIME" in last_line:
-                time_part = last_line.strip().split(":")[-3:]  # get last 3 parts
-                return parse_elapsed_time_to_seconds(":".join(time_part))
+        # only the last line is needed, read it from the end of the log
+        lines = tail_lines(file_path, 1)
+        if not lines:
+            return 0
+        last_line = lines[-1]
+        if "[ACCELPROF INFO] ELAPSED TIME" in last_line:
+            time_part = last_line.strip().split(":")[-3:]  # get last 3 parts
+            return parse_elapsed_time_to_seconds(":".join(time_part))
     except (IOError, OSError, ValueError, IndexError):
         return 0
     return 0
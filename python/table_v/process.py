@@ -1,8 +1,15 @@
 import os
-import re
 import numpy as np
 import sys
 import argparse
+from functools import partial
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.app_analysis import cached_kernel_columns, stream_kernel_stats
+from common.follow import follow_logs
+from common.log_io import list_logs, strip_compression_ext
+from common.parallel import map_files
+from common.quantile import DEFAULT_K
 
 def _format_size(size):
     if size < 1024:
@@ -13,71 +20,24 @@ def _format_size(size):
         return f"{size / 1024 / 1024:.2f} MB"
 
 
-# parse the log file output by the app_analysis tool
-def parse_log_file(file_path):
-    # {kernel_id: [kernel_name, access_count, tensor_working_set_size, memory_working_set_size, tensor_footprint_size, memory_footprint_size]}
-    kernel_dict = {}
-
-    file = open(file_path, "r")
-    line = file.readline()
-    while line:
-        line = line.strip()
-        current_kid = None
-        current_data = []
-        if line.startswith("Kernel ID:"):
-            nums = re.findall(r"\d+\.?\d*", line)
-            current_kid = int(nums[0])
-            line = file.readline()  # Kernel Name
-            current_data.append(line.replace("  Kernel Name:", "").strip())
-            line = file.readline()  # Access Count
-            current_data.append(int(re.findall(r"\d+\.?\d*", line)[0]))
-            line = file.readline()  # Tensor Working Set Size
-            current_data.append(int(re.findall(r"\d+\.?\d*", line)[0]))
-            line = file.readline()  # Memory Working Set Size
-            current_data.append(int(re.findall(r"\d+\.?\d*", line)[0]))
-            line = file.readline()  # Tensor Footprint Size
-            current_data.append(int(re.findall(r"\d+\.?\d*", line)[0]))
-            line = file.readline()  # Memory Footprint Size
-            current_data.append(int(re.findall(r"\d+\.?\d*", line)[0]))
-        if current_kid is not None:
-            kernel_dict[current_kid] = current_data
-        line = file.readline()
-    return kernel_dict
-
-
-def print_kernel_data(all_kernel_dicts):
-    for key, value in all_kernel_dicts.items():
-        print(key, len(value.keys()))
-        tensor_working_set = []
-        memory_working_set = []
-        tensor_footprint = []
-        memory_footprint = []
-        for kernel_id, kernel_data in value.items():
-            tensor_working_set.append(kernel_data[2])
-            memory_working_set.append(kernel_data[3])
-            tensor_footprint.append(kernel_data[4])
-            memory_footprint.append(kernel_data[5])
+def print_kernel_data(all_kernel_columns):
+    for key, columns in all_kernel_columns.items():
+        print(key, len(columns["kernel_id"]))
         print(f"{key} ------------------------------------------------------------")
-        print("tensor working set == ", tensor_working_set)
-        print("memory working set == ", memory_working_set)
-        print("tensor footprint == ", tensor_footprint)
-        print("memory footprint == ", memory_footprint)
+        print("tensor working set == ", columns["tensor_working_set"].tolist())
+        print("memory working set == ", columns["memory_working_set"].tolist())
+        print("tensor footprint == ", columns["tensor_footprint"].tolist())
+        print("memory footprint == ", columns["memory_footprint"].tolist())
 
 
-def get_kernel_mean_max_min(all_kernel_dicts, output_folder):
+def get_kernel_mean_max_min(all_kernel_columns, output_folder):
     result_dict = {}
-    for key, value in all_kernel_dicts.items():
-        tensor_working_set = []
-        memory_working_set = []
-        tensor_footprint = []
-        memory_footprint = []
-        kernel_count = 0
-        for kernel_id, kernel_data in value.items():
-            tensor_working_set.append(kernel_data[2])
-            memory_working_set.append(kernel_data[3])
-            tensor_footprint.append(kernel_data[4])
-            memory_footprint.append(kernel_data[5])
-            kernel_count += 1
+    for key, columns in all_kernel_columns.items():
+        tensor_working_set = columns["tensor_working_set"]
+        memory_working_set = columns["memory_working_set"]
+        tensor_footprint = columns["tensor_footprint"]
+        memory_footprint = columns["memory_footprint"]
+        kernel_count = len(columns["kernel_id"])
         # calculate the average, max, min, median, std, and 90th percentile via numpy
         print(f"{key} ------------------------------------------------------------")
         print(f"Kernel count: {kernel_count}")
@@ -108,17 +68,67 @@ def get_kernel_mean_max_min(all_kernel_dicts, output_folder):
         # print(f"  90th percentile: {np.percentile(memory_footprint, 90)} ({_format_size(np.percentile(memory_footprint, 90))})")
         print("")
 
-def main(log_folder, output_folder):
-    log_files = [f for f in os.listdir(log_folder) if f.endswith(".log")]
+def get_kernel_sketch_stats(all_kernel_stats):
+    # same report as get_kernel_mean_max_min() from StreamingStats: exact
+    # max/min/average, quantiles from the KLL sketches
+    for key, stats in all_kernel_stats.items():
+        tensor_working_set = stats["tensor_working_set"]
+        memory_footprint = stats["memory_footprint"]
+        if not tensor_working_set.count:
+            print(f"Warning: no kernels found for {key}")
+            continue
+        median, p90, p99 = tensor_working_set.quantile([0.5, 0.9, 0.99])
+        print(f"{key} ------------------------------------------------------------")
+        print(f"Kernel count: {tensor_working_set.count}")
+        print(f"Tensor work set - size: {tensor_working_set.count}")
+        print(f"  Max: {tensor_working_set.max} ({_format_size(tensor_working_set.max)})")
+        print(f"  Min: {tensor_working_set.min} ({_format_size(tensor_working_set.min)})")
+        print(f"  Average: {tensor_working_set.mean()} ({_format_size(tensor_working_set.mean())})")
+        print(f"  Median: {median} ({_format_size(median)})")
+        print(f"  90th percentile: {p90} ({_format_size(p90)})")
+        print(f"  99th percentile: {p99} ({_format_size(p99)})")
+        print(f"  (quantile rank error <= {tensor_working_set.sketch.rank_error():.2%} with 99% confidence)")
+        print(f"Memory footprint - size: {memory_footprint.count}")
+        print(f"  Average: {memory_footprint.mean()} ({_format_size(memory_footprint.mean())})")
+        print("")
+
+
+def _print_follow_update(updated):
+    all_kernel_columns = {}
+    for file, follower in updated.items():
+        # a log reset to empty has nothing to summarize yet
+        if follower.rows:
+            all_kernel_columns[file.rstrip("_app_analysis.log")] = follower.columns()
+    get_kernel_mean_max_min(all_kernel_columns, "")
+    sys.stdout.flush()
+
+
+def main(log_folder, output_folder, jobs=1, follow=False, state_dir=None, interval=10.0,
+         stats="exact", sketch_k=DEFAULT_K):
+    if follow:
+        follow_logs(log_folder, _print_follow_update, state_dir, interval)
+        return
+
+    log_files = list_logs(log_folder)
     # print(log_files)
 
-    all_kernel_dicts = {}
-    for file in log_files:
-        kernel_dict = parse_log_file(os.path.join(log_folder, file))
-        all_kernel_dicts[file.rstrip("_app_analysis.log")] = kernel_dict
-        # print(file.rstrip("_app_analysis.log"),len(kernel_dict.keys()))
+    if stats == "sketch":
+        # bounded memory: no per-kernel columns are kept
+        all_kernel_stats = {}
+        results = map_files(partial(stream_kernel_stats, k=sketch_k),
+                            [os.path.join(log_folder, file) for file in log_files], jobs)
+        for file, kernel_stats in zip(log_files, results):
+            all_kernel_stats[strip_compression_ext(file).rstrip("_app_analysis.log")] = kernel_stats
+        get_kernel_sketch_stats(all_kernel_stats)
+        return
+
+    all_kernel_columns = {}
+    results = map_files(cached_kernel_columns, [os.path.join(log_folder, file) for file in log_files], jobs)
+    for file, (columns, _) in zip(log_files, results):
+        all_kernel_columns[strip_compression_ext(file).rstrip("_app_analysis.log")] = columns
+        # print(file.rstrip("_app_analysis.log"), len(columns["kernel_id"]))
     
-    get_kernel_mean_max_min(all_kernel_dicts, output_folder)
+    get_kernel_mean_max_min(all_kernel_columns, output_folder)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -135,5 +145,47 @@ if __name__ == "__main__":
     #     required=True,
     #     help="Output folder path"
     # )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        required=False,
+        default=1,
+        help="Number of log files parsed in parallel (0: one per core)"
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep summarizing logs that are still being written, until Ctrl-C"
+    )
+    parser.add_argument(
+        "--follow-interval",
+        type=float,
+        required=False,
+        default=10.0,
+        help="Seconds between two polls in --follow mode"
+    )
+    parser.add_argument(
+        "--state-dir",
+        type=str,
+        required=False,
+        default=None,
+        help="Checkpoint folder of --follow mode (default ~/.cache/cgo26-ae/follow)"
+    )
+    parser.add_argument(
+        "--stats",
+        type=str,
+        required=False,
+        default="exact",
+        choices=["exact", "sketch"],
+        help="exact: keep every kernel in memory; sketch: streaming KLL quantile sketches"
+    )
+    parser.add_argument(
+        "--sketch-k",
+        type=int,
+        required=False,
+        default=DEFAULT_K,
+        help="Size parameter of the --stats sketch quantile sketches (larger: more accurate)"
+    )
     args = parser.parse_args()
-    main(args.log_folder, "")
+    main(args.log_folder, "", args.jobs, args.follow, args.state_dir, args.follow_interval,
+         args.stats, args.sketch_k)
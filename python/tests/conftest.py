@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the tests import the shared modules as the scripts do, from python/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
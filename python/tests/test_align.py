@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from common.align import apply_lag, correlation_score, find_lag
+
+
+def _shifted(n, lag, seed=0):
+    """a and b = a delayed by `lag` events (a leads for lag > 0), with some noise."""
+    rng = np.random.default_rng(seed)
+    # stationary, so that only the true lag lines the two up
+    signal = np.convolve(rng.normal(size=n + abs(lag)), np.ones(5), mode="same")
+    noise = rng.normal(scale=0.05, size=(2, n))
+    if lag >= 0:
+        return signal[lag:lag + n] + noise[0], signal[:n] + noise[1]
+    return signal[:n] + noise[0], signal[-lag:-lag + n] + noise[1]
+
+
+@pytest.mark.parametrize("lag", [0, 7, -13, 250])
+def test_find_lag_recovers_shift(lag):
+    a, b = _shifted(2000, lag)
+    found, score = find_lag(a, b)
+    assert found == lag
+    assert score > 0.99
+
+
+@pytest.mark.parametrize("lag", [37, -1021])
+def test_find_lag_coarse_then_refined(lag):
+    # coarse_size far below the length forces block averaging + refinement
+    a, b = _shifted(20000, lag, seed=1)
+    found, score = find_lag(a, b, coarse_size=512)
+    assert found == lag
+    assert score == pytest.approx(correlation_score(a, b, lag))
+
+
+def test_find_lag_matches_brute_force():
+    rng = np.random.default_rng(2)
+    for _ in range(20):
+        a = rng.normal(size=int(rng.integers(5, 60)))
+        b = rng.normal(size=int(rng.integers(5, 60)))
+        am, bm = a - a.mean(), b - b.mean()
+        lags = range(-(len(a) - 1), len(b))
+        corr = [np.dot(*apply_lag(am, bm, lag)) for lag in lags]
+        found, _ = find_lag(a, b)
+        assert found == lags[int(np.argmax(corr))]
+
+
+def test_find_lag_respects_max_lag():
+    a, b = _shifted(2000, 300)
+    found, _ = find_lag(a, b, max_lag=100)
+    assert abs(found) <= 100
+
+
+def test_apply_lag_pairs_events():
+    a = np.arange(10)
+    b = np.arange(10) - 3
+    a_ov, b_ov = apply_lag(a, b, 3)
+    assert np.array_equal(a_ov, b_ov)
+
+
+def test_find_lag_max_lag_matches_bounded_brute_force():
+    rng = np.random.default_rng(3)
+    for _ in range(50):
+        a = rng.normal(size=int(rng.integers(5, 60)))
+        b = rng.normal(size=int(rng.integers(5, 60)))
+        max_lag = int(rng.integers(0, 10))
+        am, bm = a - a.mean(), b - b.mean()
+        lags = range(max(-(len(a) - 1), -max_lag), min(len(b) - 1, max_lag) + 1)
+        corr = [np.dot(*apply_lag(am, bm, lag)) for lag in lags]
+        found, _ = find_lag(a, b, max_lag=max_lag)
+        assert found == lags[int(np.argmax(corr))]
@@ -0,0 +1,58 @@
+import gzip
+import re
+
+import numpy as np
+
+from common.byte_scan import (decode_decimal, decode_hex, digit_runs, iter_stream_windows, iter_windows,
+                              line_bounds)
+from common.hotness import parse_hotness
+
+
+TEXT = b"a 12 bb 0x1F3a 007\n\n[x] 4 5 99999\nno digits\n123"
+
+
+def test_line_bounds_skip_empty_lines():
+    win = np.frombuffer(TEXT, dtype=np.uint8)
+    starts, ends = line_bounds(win)
+    lines = [TEXT[s:e] for s, e in zip(starts.tolist(), ends.tolist())]
+    assert lines == [line for line in TEXT.split(b"\n") if line]
+
+
+def test_digit_runs_and_decode_match_regex():
+    win = np.frombuffer(TEXT, dtype=np.uint8)
+    run_starts, run_ends = digit_runs(win)
+    expected = [(m.start(), m.end()) for m in re.finditer(rb"\d+", TEXT)]
+    assert list(zip(run_starts.tolist(), run_ends.tolist())) == expected
+    values = decode_decimal(win, run_starts, run_ends - run_starts)
+    assert values.tolist() == [int(m.group()) for m in re.finditer(rb"\d+", TEXT)]
+
+
+def test_decode_hex_stops_at_non_hex():
+    text = b"0x1F3a 0xffffffffffffffff 0x0g"
+    win = np.frombuffer(text, dtype=np.uint8)
+    pos = np.array([2, 9, 28])
+    ends = np.full(3, len(text))
+    assert decode_hex(win, pos, ends).tolist() == [0x1F3A, 0xFFFFFFFFFFFFFFFF, 0]
+
+
+def test_windows_are_newline_aligned(tmp_path):
+    lines = b"".join(b"%d\n" % i for i in range(5000))
+    windows = list(iter_windows(lines, window_size=100))
+    assert b"".join(w.tobytes() for w in windows) == lines
+    assert all(w.tobytes().endswith(b"\n") for w in windows)
+
+    path = tmp_path / "log.gz"
+    path.write_bytes(gzip.compress(lines + b"tail"))
+    windows = list(iter_stream_windows(str(path), window_size=100))
+    assert b"".join(w.tobytes() for w in windows) == lines + b"tail"
+    assert all(w.tobytes().endswith(b"\n") for w in windows[:-1])
+
+
+def test_parse_hotness(tmp_path):
+    path = tmp_path / "hotness.log"
+    path.write_text("blocks: 10 11 12\n0 3 0\n\n5 0 12\n0 0 0\n")
+    hotness = parse_hotness(str(path))
+    assert hotness.block_indices.tolist() == [10, 11, 12]
+    assert hotness.indptr.tolist() == [0, 1, 3, 3]
+    assert hotness.blocks.tolist() == [1, 0, 2]
+    assert hotness.counts.tolist() == [3, 5, 12]
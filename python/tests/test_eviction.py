@@ -0,0 +1,138 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from common.eviction import (AUTO_SAMPLES, MIN_SAMPLED_CAPACITY, POLICIES, access_runs, auto_sample_rate,
+                             compare_policies)
+
+
+def _lru(s, c):
+    cache = OrderedDict()
+    misses = 0
+    for x in s:
+        if x in cache:
+            cache.move_to_end(x)
+            continue
+        misses += 1
+        if len(cache) == c:
+            cache.popitem(last=False)
+        cache[x] = None
+    return misses
+
+
+def _clock(s, c):
+    frames, ref = [], []
+    hand = misses = 0
+    for x in s:
+        if x in frames:
+            ref[frames.index(x)] = 1
+            continue
+        misses += 1
+        if len(frames) < c:
+            frames.append(x)
+            ref.append(1)
+            continue
+        while ref[hand]:
+            ref[hand] = 0
+            hand = (hand + 1) % c
+        frames[hand] = x
+        ref[hand] = 1
+        hand = (hand + 1) % c
+    return misses
+
+
+def _lfu(s, c):
+    # in-cache counts, least recently used among equal counts
+    freq, last = {}, {}
+    misses = 0
+    for t, x in enumerate(s):
+        if x not in freq:
+            misses += 1
+            if len(freq) == c:
+                del freq[min(freq, key=lambda y: (freq[y], last[y]))]
+            freq[x] = 0
+        freq[x] += 1
+        last[x] = t
+    return misses
+
+
+def _belady(s, c):
+    resident = set()
+    misses = 0
+    for t, x in enumerate(s):
+        if x in resident:
+            continue
+        misses += 1
+        if len(resident) == c:
+            def next_use(y):
+                return next((k for k in range(t + 1, len(s)) if s[k] == y), len(s))
+            resident.remove(max(resident, key=next_use))
+        resident.add(x)
+    return misses
+
+
+REFERENCES = {"lru": _lru, "clock": _clock, "lfu": _lfu, "opt": _belady}
+CAPACITIES = (1, 2, 3, 5, 8, 13)
+
+
+def _streams(n_streams, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(n_streams):
+        n = int(rng.integers(1, 200))
+        s = rng.integers(0, int(rng.integers(1, 25)), size=n)
+        # repeated accesses, collapsed into runs by the simulators
+        yield np.repeat(s, rng.integers(1, 4, size=n))
+
+
+def test_access_runs():
+    ids, lengths, n_ids = access_runs([7, 7, 3, 7, 7, 7], weights=[1, 2, 1, 1, 1, 1])
+    assert (ids.tolist(), lengths.tolist(), n_ids) == ([1, 0, 1], [3, 1, 3], 2)
+
+
+@pytest.mark.parametrize("policy", sorted(REFERENCES))
+def test_policies_match_naive(policy):
+    for s in _streams(150):
+        misses = compare_policies(s * 4096 + 7, CAPACITIES, policies=(policy,))[policy]
+        assert misses.tolist() == [REFERENCES[policy](s.tolist(), c) for c in CAPACITIES]
+
+
+def test_opt_is_a_lower_bound():
+    for s in _streams(150, seed=1):
+        results = compare_policies(s, CAPACITIES)
+        n_ids = len(np.unique(s))
+        n_runs = len(access_runs(s)[0])
+        for policy in POLICIES:
+            assert (results["opt"] <= results[policy]).all()
+            assert ((results[policy] >= n_ids) & (results[policy] <= n_runs)).all()
+
+
+def test_everything_fits():
+    s = np.random.default_rng(2).integers(0, 10, size=500)
+    results = compare_policies(s, [10, 50])
+    for policy in POLICIES:
+        assert results[policy].tolist() == [10, 10]
+
+
+def test_rejects_empty_capacity():
+    with pytest.raises(ValueError):
+        compare_policies([1, 2, 3], [0])
+
+
+def test_miniature_simulation_is_close():
+    rng = np.random.default_rng(3)
+    n = 400000
+    s = rng.zipf(1.2, n) % 20000
+    capacities = [1000, 4000, 10000]
+    exact = compare_policies(s, capacities)
+    sampled = compare_policies(s, capacities, rate=0.1)
+    for policy in POLICIES:
+        assert (np.abs(sampled[policy] - exact[policy]) < 0.02 * n).all(), policy
+
+
+def test_auto_sample_rate():
+    assert auto_sample_rate(1000, [10]) is None
+    rate = auto_sample_rate(10 ** 9, [10 ** 6])
+    assert rate * 10 ** 9 == pytest.approx(AUTO_SAMPLES)
+    # never below MIN_SAMPLED_CAPACITY blocks of device memory
+    assert auto_sample_rate(10 ** 9, [1000]) * 1000 == pytest.approx(MIN_SAMPLED_CAPACITY)
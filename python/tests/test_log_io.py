@@ -0,0 +1,17 @@
+import os
+
+from common.log_io import find_log, list_logs
+
+
+def test_list_logs_one_file_per_stem(tmp_path, capsys):
+    for name in ("a_app_analysis.log", "a_app_analysis.log.gz", "b.log.bz2", "b.log.xz", "c.log.bz2",
+                 "notes.txt", "d.log.gz.bak"):
+        (tmp_path / name).write_bytes(b"")
+    logs = list_logs(str(tmp_path))
+    assert logs == ["a_app_analysis.log", "b.log.xz", "c.log.bz2"]
+    # the same file find_log() opens for every stem
+    for name in logs:
+        stem = name[:name.index(".log") + len(".log")]
+        assert os.path.basename(find_log(str(tmp_path / stem))) == name
+    out = capsys.readouterr().out
+    assert "skipping a_app_analysis.log.gz" in out and "skipping b.log.bz2" in out
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from common.prefetch_plan import plan_schedule
+from common.uvm_replay import OBJECT_GRANULARITY, TENSOR_GRANULARITY, replay
+from common.uvm_schedule import Schedule
+
+MB = 1024 * 1024
+BLOCK = 2 * MB
+
+
+def _allocations(ten_blocks, segment_blocks=None):
+    """Tensors of `ten_blocks` blocks laid out back to back, in segments of `segment_blocks` blocks."""
+    sizes = np.asarray(ten_blocks, dtype=np.int64) * BLOCK
+    ptr = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    end = int(ptr[-1] + sizes[-1])
+    seg = (segment_blocks or 1 << 20) * BLOCK
+    mem_ptr = np.arange(0, end, seg, dtype=np.int64)
+    return (np.concatenate(([0], ptr)), np.concatenate(([0], sizes)),
+            np.concatenate(([0], mem_ptr)), np.concatenate(([0], np.full(len(mem_ptr), seg))))
+
+
+def _usage(ten_ids_per_op, allocations):
+    ten_ptr, _, mem_ptr, _ = allocations
+    entries = {}
+    for op, ten in enumerate(ten_ids_per_op, start=1):
+        ten = np.unique(np.asarray(ten, dtype=np.int64))
+        mem = np.unique(np.searchsorted(mem_ptr[1:], ten_ptr[ten], side="right"))
+        entries[op] = (mem, ten)
+    return Schedule.from_dict(entries)
+
+
+def _totals(usage, schedule, allocations, mode, capacity):
+    t = replay(usage, schedule, allocations, mode, capacity).totals()
+    return t["faults"], t["migrated_bytes"]
+
+
+def test_resident_uses_stay_listed():
+    # the op's own transfer must not evict the tensor it reuses
+    allocations = _allocations([1, 1, 1])
+    usage = _usage([[1, 2], [1, 3]], allocations)
+    schedule = plan_schedule(usage, allocations, 2 * BLOCK, lookahead=0)
+    assert schedule.ten(2).tolist() == [1, 3]
+    assert _totals(usage, schedule, allocations, TENSOR_GRANULARITY, 2 * BLOCK) == (0, 3 * BLOCK)
+
+
+@pytest.mark.parametrize("lookahead", [0, 1, 2, 4])
+def test_planned_never_worse_than_profile_small(lookahead):
+    rng = np.random.default_rng(lookahead)
+    for _ in range(500):
+        n_ten = int(rng.integers(2, 8))
+        blocks = rng.integers(1, 4, size=n_ten)
+        allocations = _allocations(blocks)
+        ops = [np.unique(rng.integers(1, n_ten + 1, size=int(rng.integers(1, 4))))
+               for _ in range(int(rng.integers(1, 10)))]
+        capacity = int(rng.integers(3, 8)) * BLOCK
+        if max(blocks[ids - 1].sum() for ids in ops) * BLOCK > capacity:
+            # an op that does not fit thrashes whatever the schedule
+            continue
+        usage = _usage(ops, allocations)
+        schedule = plan_schedule(usage, allocations, capacity, lookahead)
+        planned = _totals(usage, schedule, allocations, TENSOR_GRANULARITY, capacity)
+        profile = _totals(usage, usage, allocations, TENSOR_GRANULARITY, capacity)
+        assert planned[0] <= profile[0] and planned[1] <= profile[1], (usage.to_dict(), capacity)
+
+
+@pytest.mark.parametrize("capacity_mb", [200, 1024])
+def test_planned_against_profile_zipf(capacity_mb):
+    rng = np.random.default_rng(0)
+    n_ten = 1000
+    allocations = _allocations(rng.integers(1, 8, size=n_ten), segment_blocks=32)
+    usage = _usage([(rng.zipf(1.3, size=4) - 1) % n_ten + 1 for _ in range(3000)], allocations)
+    capacity = capacity_mb * MB
+    for mode in (TENSOR_GRANULARITY, OBJECT_GRANULARITY):
+        faults, migrated = _totals(usage, usage, allocations, mode, capacity)
+        for lookahead in (0, 8, 32):
+            schedule = plan_schedule(usage, allocations, capacity, lookahead)
+            planned_faults, planned_migrated = _totals(usage, schedule, allocations, mode, capacity)
+            if mode == TENSOR_GRANULARITY:
+                assert planned_faults <= faults and planned_migrated <= migrated
+            else:
+                # objects are modeled whole, their blocks evicted one by one
+                assert planned_faults <= faults * 1.01 and planned_migrated <= migrated * 1.01
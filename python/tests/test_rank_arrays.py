@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+
+from common.rank_arrays import list_ranks, load_rank_column, write_rank_arrays
+from common.tensor_events import TENSOR_EVENT_DTYPE
+
+
+def _events(devices, seed=0):
+    rng = np.random.default_rng(seed)
+    events = np.zeros(len(devices), dtype=TENSOR_EVENT_DTYPE)
+    events["device"] = devices
+    events["kind"] = rng.integers(0, 2, size=len(devices))
+    events["ptr"] = rng.integers(0, 1 << 40, size=len(devices))
+    events["total_allocated"] = rng.integers(0, 1 << 30, size=len(devices))
+    return events
+
+
+def test_write_rank_arrays_splits_by_device(tmp_path):
+    prefix = str(tmp_path / "tensor_gpu")
+    events = _events(np.random.default_rng(1).integers(0, 3, size=1000))
+    assert write_rank_arrays(events, prefix) == [0, 1, 2]
+    assert list_ranks(prefix) == [0, 1, 2]
+    for rank in range(3):
+        rows = events[events["device"] == rank]
+        for column, field in (("alloc", "total_allocated"), ("kind", "kind"), ("ptr", "ptr")):
+            assert np.array_equal(load_rank_column(prefix, rank, column, mmap=False), rows[field])
+
+
+def test_write_rank_arrays_removes_stale_ranks(tmp_path):
+    prefix = str(tmp_path / "tensor_gpu")
+    write_rank_arrays(_events(np.arange(8) % 4), prefix)
+    (tmp_path / "tensor_gpu_other.alloc.bin").write_bytes(b"")
+    (tmp_path / "tensor_gpu_0.txt").write_text("1\n")
+
+    assert write_rank_arrays(_events(np.arange(8) % 2), prefix) == [0, 1]
+    assert list_ranks(prefix) == [0, 1]
+    names = sorted(os.listdir(tmp_path))
+    assert not [name for name in names if name.startswith(("tensor_gpu_2.", "tensor_gpu_3."))]
+    # files that are not rank arrays are left alone
+    assert "tensor_gpu_other.alloc.bin" in names and "tensor_gpu_0.txt" in names
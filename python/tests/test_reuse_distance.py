@@ -0,0 +1,72 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from common.reuse_distance import ReuseProfile, _count_smaller_before, previous_access, reuse_distances
+
+
+def _naive_distances(blocks):
+    last = {}
+    out = []
+    for t, x in enumerate(blocks):
+        out.append(len(set(blocks[last[x] + 1:t])) if x in last else -1)
+        last[x] = t
+    return out
+
+
+def _naive_lru_misses(blocks, capacity):
+    lru = OrderedDict()
+    misses = 0
+    for x in blocks:
+        if x in lru:
+            lru.move_to_end(x)
+            continue
+        misses += 1
+        if len(lru) == capacity:
+            lru.popitem(last=False)
+        lru[x] = None
+    return misses
+
+
+def _random_streams(n_streams, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(n_streams):
+        n = int(rng.integers(1, 400))
+        yield rng.integers(0, int(rng.integers(1, 50)), size=n) * 4096 + 12345
+
+
+def test_previous_access():
+    assert previous_access([5, 3, 5, 5, 3]).tolist() == [-1, -1, 0, 2, 1]
+
+
+def test_count_smaller_before_matches_naive():
+    rng = np.random.default_rng(3)
+    for _ in range(200):
+        n = int(rng.integers(0, 300))
+        # duplicates included: only strictly smaller values count
+        values = rng.integers(0, int(rng.integers(1, 5000)), size=n)
+        expected = [int(np.sum(values[:i] < values[i])) for i in range(n)]
+        assert _count_smaller_before(values).tolist() == expected
+
+
+def test_reuse_distances_match_naive():
+    for blocks in _random_streams(200):
+        assert reuse_distances(blocks).tolist() == _naive_distances(blocks.tolist())
+
+
+def test_lru_misses_match_naive():
+    for blocks in _random_streams(100, seed=1):
+        profile = ReuseProfile.from_blocks(blocks)
+        capacities = [1, 2, 3, 5, 8, 13, 40]
+        expected = [_naive_lru_misses(blocks.tolist(), c) for c in capacities]
+        assert profile.misses(capacities).tolist() == expected
+        assert profile.misses(0) == len(blocks)
+
+
+def test_sampled_profile_is_close():
+    rng = np.random.default_rng(2)
+    blocks = rng.zipf(1.2, size=200000) % 5000
+    exact = ReuseProfile.from_blocks(blocks)
+    sampled = ReuseProfile.from_blocks(blocks, rate=0.1)
+    for capacity in (50, 500, 2000):
+        assert abs(sampled.miss_ratio(capacity) - exact.miss_ratio(capacity)) < 0.02
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from common.tensor_events import FREE, MALLOC
+from common.trace_diff import DELETE, INSERT, MATCH, diff_tokens, event_tokens
+
+
+def _lcs(a, b):
+    row = [0] * (len(b) + 1)
+    for x in a:
+        prev = 0
+        for j, y in enumerate(b):
+            prev, row[j + 1] = row[j + 1], prev + 1 if x == y else max(row[j + 1], row[j])
+    return row[-1]
+
+
+def _check_script(d, a, b):
+    """The runs cover a and b in order and MATCH runs pair equal tokens."""
+    a_index, b_index = d.indices()
+    assert np.array_equal(a_index[a_index >= 0], np.arange(len(a)))
+    assert np.array_equal(b_index[b_index >= 0], np.arange(len(b)))
+    both = (a_index >= 0) & (b_index >= 0)
+    assert np.array_equal(a[a_index[both]], b[b_index[both]])
+    assert set(d.runs["op"].tolist()) <= {MATCH, DELETE, INSERT}
+
+
+def _trace(n, seed):
+    rng = np.random.default_rng(seed)
+    kind = rng.choice([MALLOC, FREE], size=n)
+    size = rng.choice([512, 4096, 1 << 20, 3 << 20, 8 << 20], size=n)
+    return event_tokens(kind, size)
+
+
+def test_diff_matches_lcs():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        a = rng.integers(0, 4, size=int(rng.integers(0, 40)))
+        b = rng.integers(0, 4, size=int(rng.integers(0, 40)))
+        d = diff_tokens(a, b, max_cost=10 ** 6, anchor=0)
+        _check_script(d, a, b)
+        assert d.edit_distance() == len(a) + len(b) - 2 * _lcs(a.tolist(), b.tolist())
+
+
+@pytest.mark.parametrize("anchor", [0, 16])
+def test_diff_finds_synthetic_shift(anchor):
+    # b = a with a block of extra events inserted and another one removed
+    a = _trace(20000, seed=1)
+    extra = _trace(37, seed=2)
+    b = np.concatenate((a[:5000], extra, a[5000:12000], a[12050:]))
+    d = diff_tokens(a, b, anchor=anchor)
+    _check_script(d, a, b)
+    s = d.summary()
+    assert (s["inserted"], s["deleted"]) == (37, 50)
+    assert s["matched"] == len(a) - 50
+    # events after the shifts still pair with their originals
+    a_index, b_index = d.indices()
+    paired = dict(zip(a_index.tolist(), b_index.tolist()))
+    assert paired[4999] == 4999
+    assert paired[5000] == 5037
+    assert paired[12050] == 12037
+
+
+def test_diff_bounded_cost_is_a_valid_script():
+    rng = np.random.default_rng(3)
+    a = rng.integers(0, 3, size=3000)
+    b = rng.integers(0, 3, size=3000)
+    d = diff_tokens(a, b, max_cost=8)
+    _check_script(d, a, b)
+
+
+def test_diff_rejects_zero_cost():
+    with pytest.raises(ValueError):
+        diff_tokens([1, 2, 3], [3, 2, 1], max_cost=0)
+
+
+@pytest.mark.parametrize("max_cost", [1, 2])
+def test_diff_tiny_cost_terminates(max_cost):
+    rng = np.random.default_rng(4)
+    a = rng.integers(0, 2, size=500)
+    b = rng.integers(0, 2, size=500)
+    _check_script(diff_tokens(a, b, max_cost=max_cost, anchor=0), a, b)
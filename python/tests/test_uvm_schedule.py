@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from common.uvm_schedule import (Schedule, is_binary, load_binary, load_schedule, parse_schedule,
+                                 save_binary, write_schedule)
+
+
+def _random_schedule(seed=0):
+    rng = np.random.default_rng(seed)
+    entries = {}
+    for op in rng.choice(np.arange(1, 500), size=60, replace=False).tolist():
+        entries[op] = (rng.integers(1, 40, size=int(rng.integers(0, 5))).tolist(),
+                       rng.integers(1, 200, size=int(rng.integers(0, 12))).tolist())
+    return Schedule.from_dict(entries)
+
+
+def _assert_same(a, b):
+    assert a.to_dict() == b.to_dict()
+    for name in ("op_ids", "mem_indptr", "mem_ids", "ten_indptr", "ten_ids"):
+        assert np.array_equal(getattr(a, name), getattr(b, name))
+
+
+@pytest.mark.parametrize("with_sizes", [False, True])
+def test_text_round_trip(tmp_path, with_sizes):
+    schedule = _random_schedule()
+    sizes = np.arange(1000) * 4096 if with_sizes else None
+    write_schedule(tmp_path / "opt.log", schedule, sizes, sizes)
+    _assert_same(parse_schedule(tmp_path / "opt.log"), schedule)
+
+
+def test_text_binary_text_round_trip(tmp_path):
+    schedule = _random_schedule(1)
+    write_schedule(tmp_path / "opt.log", schedule)
+    save_binary(tmp_path / "opt.bin", parse_schedule(tmp_path / "opt.log"))
+    assert is_binary(tmp_path / "opt.bin") and not is_binary(tmp_path / "opt.log")
+    loaded = load_schedule(tmp_path / "opt.bin")
+    # views of the mapped file, not copies
+    assert not loaded.ten_ids.flags.owndata and not loaded.ten_ids.flags.writeable
+    _assert_same(loaded, schedule)
+    write_schedule(tmp_path / "back.log", loaded)
+    assert (tmp_path / "back.log").read_text() == (tmp_path / "opt.log").read_text()
+
+
+def test_binary_lookups_and_empty(tmp_path):
+    schedule = _random_schedule(2)
+    save_binary(tmp_path / "opt.bin", schedule)
+    loaded = load_binary(tmp_path / "opt.bin")
+    for op, mem, ten in schedule.items():
+        assert loaded.mem(op).tolist() == mem.tolist()
+        assert loaded.ten(op).tolist() == ten.tolist()
+    assert loaded.ten(10 ** 6).tolist() == []
+
+    save_binary(tmp_path / "empty.bin", Schedule.from_dict({}))
+    assert load_schedule(tmp_path / "empty.bin").n_ops == 0
+
+
+def test_parse_like_the_advisor(tmp_path):
+    # a later line replaces the ids of the op, entries before any op go to op -1
+    (tmp_path / "opt.log").write_text("TenAlloc: 9:\n"
+                                      "Op - op_id: 3\nMemAlloc: 1:10 2:20\nTenAlloc: 5:\n"
+                                      "TenAlloc: 6:4096 7:\n")
+    assert parse_schedule(tmp_path / "opt.log").to_dict() == {-1: ([], [9]), 3: ([1, 2], [6, 7])}
+
+
+def test_load_binary_rejects_text(tmp_path):
+    (tmp_path / "opt.log").write_text("Op - op_id: 1\n")
+    with pytest.raises(ValueError):
+        load_binary(tmp_path / "opt.log")
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from common.hotness import HotnessMatrix
+from common.working_set import wss_curves, wss_percentiles
+
+
+def _matrix(dense):
+    steps, blocks = np.nonzero(dense)
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(steps, minlength=dense.shape[0]))))
+    return HotnessMatrix(np.arange(dense.shape[1]) * 4096, indptr, blocks, dense[steps, blocks])
+
+
+def _dense_wss(dense, w):
+    touched = dense > 0
+    return np.array([touched[t:t + w].any(axis=0).sum() for t in range(len(dense) - w + 1)])
+
+
+def test_wss_curves_match_dense_scan():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        n_steps, n_blocks = int(rng.integers(1, 60)), int(rng.integers(1, 30))
+        dense = rng.integers(0, 5, size=(n_steps, n_blocks)) * (rng.random((n_steps, n_blocks)) < 0.2)
+        windows = sorted({1, n_steps, *rng.integers(1, n_steps + 1, size=3).tolist()})
+        curves = wss_curves(_matrix(dense), windows)
+        for w in windows:
+            assert curves[w].tolist() == _dense_wss(dense, w).tolist()
+
+
+def test_wss_rejects_bad_windows():
+    matrix = _matrix(np.eye(4, dtype=np.int64))
+    with pytest.raises(ValueError):
+        wss_curves(matrix, [0])
+    with pytest.raises(ValueError):
+        wss_curves(matrix, [5])
+
+
+def test_wss_percentiles():
+    curves = wss_curves(_matrix(np.eye(4, dtype=np.int64)), [2])
+    assert curves[2].tolist() == [2, 2, 2]
+    assert wss_percentiles(curves, (50, 100))[2].tolist() == [2.0, 2.0]
@@ -11,9 +11,17 @@
 #include <tuple>
 #include <vector>
 #include <map>
-#include <regex>
 #include <unordered_map>
+#include <algorithm>
 #include <cassert>
+#include <cctype>
+#include <cstdlib>
+#include <cstring>
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
 
 #define CUDA_SAFECALL(call)                                      \
 {                                                                \
@@ -61,14 +69,97 @@ static int num_prefetch_streams = 3;
 static uint64_t stream_index = 0;
 
 
-using MemTenEntry = std::pair<std::vector<uint64_t>, std::vector<uint64_t>>;
-std::unordered_map<int, MemTenEntry> prefetch_schedule;
+// Prefetch schedule: the MemAlloc/TenAlloc ids of every scheduled op as two
+// flat CSR tables, memory-mapped from the binary format written by
+// python/common/uvm_schedule.py, or built once from the text profile.
+//   char   magic[8] = "UVMSCHD1"
+//   uint64 n_ops, n_mem, n_ten
+//   int64  op_ids[n_ops]                      (ascending)
+//   int64  mem_indptr[n_ops + 1], ten_indptr[n_ops + 1]
+//   int64  mem_ids[n_mem], ten_ids[n_ten]     (read as uint64, never negative)
+static const char SCHEDULE_MAGIC[8] = {'U', 'V', 'M', 'S', 'C', 'H', 'D', '1'};
+
+typedef struct {
+    const uint64_t* ids = nullptr;
+    size_t size = 0;
+    const uint64_t* begin() const { return ids; }
+    const uint64_t* end() const { return ids + size; }
+} IdSpan;
+
+typedef struct {
+    uint64_t n_ops = 0;
+    const int64_t* op_ids = nullptr;
+    const uint64_t* mem_indptr = nullptr;
+    const uint64_t* ten_indptr = nullptr;
+    const uint64_t* mem_ids = nullptr;
+    const uint64_t* ten_ids = nullptr;
+    // row of the last lookup; op ids are looked up in increasing order
+    uint64_t cursor = 0;
+} PrefetchSchedule;
+
+static PrefetchSchedule prefetch_schedule;
+// backing storage of a schedule parsed from text
+static std::vector<int64_t> schedule_op_ids;
+static std::vector<uint64_t> schedule_mem_indptr, schedule_ten_indptr, schedule_mem_ids, schedule_ten_ids;
+
+
+// row of op_id in the schedule, or n_ops if it has no entry
+static uint64_t find_schedule_row(int64_t op_id) {
+    auto& s = prefetch_schedule;
+    if (s.cursor < s.n_ops && s.op_ids[s.cursor] == op_id) {
+        return s.cursor;
+    }
+    if (s.cursor + 1 < s.n_ops && s.op_ids[s.cursor + 1] == op_id) {
+        return ++s.cursor;
+    }
+    const int64_t* it = std::lower_bound(s.op_ids, s.op_ids + s.n_ops, op_id);
+    if (it == s.op_ids + s.n_ops || *it != op_id) {
+        return s.n_ops;
+    }
+    s.cursor = it - s.op_ids;
+    return s.cursor;
+}
+
+
+static IdSpan schedule_mem_allocs(uint64_t row) {
+    auto& s = prefetch_schedule;
+    return {s.mem_ids + s.mem_indptr[row], s.mem_indptr[row + 1] - s.mem_indptr[row]};
+}
+
+
+static IdSpan schedule_ten_allocs(uint64_t row) {
+    auto& s = prefetch_schedule;
+    return {s.ten_ids + s.ten_indptr[row], s.ten_indptr[row + 1] - s.ten_indptr[row]};
+}
+
+
+// every "<digits>:" of the line, as the regex (\d+): would match them
+static void parse_id_entries(const std::string& line, std::vector<uint64_t>& ids) {
+    ids.clear();
+    size_t i = 0;
+    while (i < line.size()) {
+        if (!isdigit((unsigned char) line[i])) {
+            i++;
+            continue;
+        }
+        size_t start = i;
+        while (i < line.size() && isdigit((unsigned char) line[i])) {
+            i++;
+        }
+        if (i < line.size() && line[i] == ':') {
+            ids.emplace_back(std::strtoull(line.c_str() + start, nullptr, 10));
+        }
+    }
+}
+
 
 static void parse_profile_output(const std::string& filename) {
     std::ifstream infile(filename);
     std::string line;
 
     int current_op_id = -1;
+    std::map<int64_t, std::pair<std::vector<uint64_t>, std::vector<uint64_t>>> entries;
+    std::vector<uint64_t> ids;
 
     while (std::getline(infile, line)) {
         // Parse op line
@@ -81,31 +172,85 @@ static void parse_profile_output(const std::string& filename) {
 
         // Parse MemAlloc
         else if (line.find("MemAlloc") != std::string::npos) {
-            std::vector<uint64_t> mem_allocs;
-            std::regex entry_regex(R"((\d+):)");
-            auto begin = std::sregex_iterator(line.begin(), line.end(), entry_regex);
-            auto end = std::sregex_iterator();
-            for (auto i = begin; i != end; ++i) {
-                std::smatch match = *i;
-                uint64_t id = (uint64_t) std::stoi(match[1]);
-                mem_allocs.emplace_back(id);
-            }
-            prefetch_schedule[current_op_id].first = mem_allocs;
+            parse_id_entries(line, ids);
+            entries[current_op_id].first = ids;
         }
 
         // Parse TenAlloc
         else if (line.find("TenAlloc") != std::string::npos) {
-            std::vector<uint64_t> ten_allocs;
-            std::regex entry_regex(R"((\d+):)");
-            auto begin = std::sregex_iterator(line.begin(), line.end(), entry_regex);
-            auto end = std::sregex_iterator();
-            for (auto i = begin; i != end; ++i) {
-                std::smatch match = *i;
-                uint64_t id = (uint64_t) std::stoi(match[1]);
-                ten_allocs.emplace_back(id);
-            }
-            prefetch_schedule[current_op_id].second = ten_allocs;
+            parse_id_entries(line, ids);
+            entries[current_op_id].second = ids;
+        }
+    }
+
+    schedule_mem_indptr.push_back(0);
+    schedule_ten_indptr.push_back(0);
+    for (const auto& entry : entries) {
+        schedule_op_ids.push_back(entry.first);
+        const auto& mem_allocs = entry.second.first;
+        const auto& ten_allocs = entry.second.second;
+        schedule_mem_ids.insert(schedule_mem_ids.end(), mem_allocs.begin(), mem_allocs.end());
+        schedule_ten_ids.insert(schedule_ten_ids.end(), ten_allocs.begin(), ten_allocs.end());
+        schedule_mem_indptr.push_back(schedule_mem_ids.size());
+        schedule_ten_indptr.push_back(schedule_ten_ids.size());
+    }
+
+    prefetch_schedule.n_ops = schedule_op_ids.size();
+    prefetch_schedule.op_ids = schedule_op_ids.data();
+    prefetch_schedule.mem_indptr = schedule_mem_indptr.data();
+    prefetch_schedule.ten_indptr = schedule_ten_indptr.data();
+    prefetch_schedule.mem_ids = schedule_mem_ids.data();
+    prefetch_schedule.ten_ids = schedule_ten_ids.data();
+}
+
+
+// memory-map a binary schedule; false if the file is not one
+static bool map_schedule_binary(const std::string& filename) {
+    int fd = open(filename.c_str(), O_RDONLY);
+    if (fd < 0) {
+        return false;
+    }
+    struct stat st;
+    uint64_t header[4];
+    if (fstat(fd, &st) != 0 || st.st_size < (off_t) sizeof(header)
+        || pread(fd, header, sizeof(header), 0) != (ssize_t) sizeof(header)
+        || memcmp(header, SCHEDULE_MAGIC, sizeof(SCHEDULE_MAGIC)) != 0) {
+        close(fd);
+        return false;
+    }
+    uint64_t n_ops = header[1], n_mem = header[2], n_ten = header[3];
+    uint64_t n_words = 4 + n_ops + 2 * (n_ops + 1) + n_mem + n_ten;
+    if ((uint64_t) st.st_size < n_words * sizeof(uint64_t)) {
+        fprintf(stderr, "[UVM ADVISOR] truncated prefetch schedule %s\n", filename.c_str());
+        close(fd);
+        return false;
+    }
+    void* addr = mmap(nullptr, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+    close(fd);
+    if (addr == MAP_FAILED) {
+        return false;
+    }
+    const uint64_t* words = (const uint64_t*) addr + 4;
+    prefetch_schedule.n_ops = n_ops;
+    prefetch_schedule.op_ids = (const int64_t*) words;
+    prefetch_schedule.mem_indptr = words + n_ops;
+    prefetch_schedule.ten_indptr = words + 2 * n_ops + 1;
+    prefetch_schedule.mem_ids = words + 3 * n_ops + 2;
+    prefetch_schedule.ten_ids = words + 3 * n_ops + 2 + n_mem;
+    return true;
+}
+
+
+// ENV: PREFETCH_SCHEDULE, a binary or text schedule; by default
+// uvm_advisor_opt.bin if it exists, else uvm_advisor_opt.log
+static void load_prefetch_schedule() {
+    const char* schedule_path = std::getenv("PREFETCH_SCHEDULE");
+    if (schedule_path) {
+        if (!map_schedule_binary(schedule_path)) {
+            parse_profile_output(schedule_path);
         }
+    } else if (!map_schedule_binary("uvm_advisor_opt.bin")) {
+        parse_profile_output("uvm_advisor_opt.log");
     }
 }
 
@@ -116,13 +261,12 @@ static void no_prefetch(uint64_t op_id) {
 
 
 static void prefetch_at_tensor_granularity(uint64_t op_id) {
-    if (prefetch_schedule.find(op_id) == prefetch_schedule.end()) {
+    uint64_t row = find_schedule_row(op_id);
+    if (row == prefetch_schedule.n_ops) {
         return;
     }
 
-    auto ten_allocs = prefetch_schedule[op_id].second;
-
-    for (auto ten_alloc : ten_allocs) {
+    for (auto ten_alloc : schedule_ten_allocs(row)) {
         auto tensor = id_2_tensor_map[ten_alloc];
         void* ptr = (void*) tensor.first;
         size_t size = tensor.second;
@@ -134,12 +278,12 @@ static void prefetch_at_tensor_granularity(uint64_t op_id) {
 
 
 static void prefetch_at_object_granularity(uint64_t op_id) {
-    if (prefetch_schedule.find(op_id) == prefetch_schedule.end()) {
+    uint64_t row = find_schedule_row(op_id);
+    if (row == prefetch_schedule.n_ops) {
         return;
     }
-    auto mem_allocs = prefetch_schedule[op_id].first;
 
-    for (auto mem_alloc : mem_allocs) {
+    for (auto mem_alloc : schedule_mem_allocs(row)) {
         auto memory = id_2_memory_map[mem_alloc];
         void* ptr = (void*) memory.first;
         size_t size = memory.second;
@@ -304,7 +448,7 @@ static int init_prefetch_streams() {
         prefetch_streams.push_back(prefetch_stream);
     }
 
-    parse_profile_output("uvm_advisor_opt.log");
+    load_prefetch_schedule();
     return 0;
 }
 
@@ -0,0 +1,364 @@
+// CPU stand-in for CUDA managed memory, to test prefetch schedules without a GPU.
+//
+// "Device" memory is one anonymous mmap arena holding every UVM segment
+// (object) of a recorded run, laid out by python/common/uvm_emulator.py.
+// Blocks (2MB by default, the UVM migration granularity) that are not
+// resident are PROT_NONE; touching one raises SIGSEGV, and the handler
+// "migrates" it: the block becomes read/write and counts as a fault. At most
+// `budget` bytes of blocks are resident, the rest is evicted with PROT_NONE
+// and MADV_DONTNEED, so the RSS stays within the budget, in the order of
+// their last fault or prefetch (as for the UVM driver, touches of resident
+// blocks are not seen). The advisor's cudaMemPrefetchAsync becomes
+// prefetch(): non-resident blocks of the range are made resident and
+// populated up front.
+//
+// The op loop replays a profile (the tensors every op touches) and, per
+// PREFETCH_MODE, a prefetch schedule, both in the binary schedule format of
+// python/common/uvm_schedule.py:
+//
+//   uvm_emu.out <layout> <usage schedule> <prefetch schedule> <budget bytes> [block bytes]
+//
+// and prints the counters as key=value lines.
+
+#include <cerrno>
+#include <chrono>
+#include <cstdint>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <string>
+#include <vector>
+
+#include <fcntl.h>
+#include <signal.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+
+typedef enum {
+    NO_PREFETCH = 0,
+    OBJECT_GRANULARITY = 1,
+    TENSOR_GRANULARITY = 2,
+} PrefetchMode_t;
+
+
+static const char LAYOUT_MAGIC[8] = {'U', 'V', 'M', 'E', 'M', 'U', '0', '1'};
+static const char SCHEDULE_MAGIC[8] = {'U', 'V', 'M', 'S', 'C', 'H', 'D', '1'};
+
+
+typedef struct {
+    uint64_t n_ops = 0;
+    const int64_t* op_ids = nullptr;
+    const int64_t* mem_indptr = nullptr;
+    const int64_t* ten_indptr = nullptr;
+    const int64_t* mem_ids = nullptr;
+    const int64_t* ten_ids = nullptr;
+} Schedule;
+
+// layout: offset and size in the arena of every tensor and object id
+// (entry 0 unused)
+typedef struct {
+    uint64_t arena_size = 0;
+    uint64_t n_ten = 0;
+    uint64_t n_mem = 0;
+    const int64_t* ten_offset = nullptr;
+    const int64_t* ten_size = nullptr;
+    const int64_t* mem_offset = nullptr;
+    const int64_t* mem_size = nullptr;
+} Layout;
+
+
+static const uint64_t* map_file(const char* path, size_t* size) {
+    int fd = open(path, O_RDONLY);
+    if (fd < 0) {
+        fprintf(stderr, "[UVM EMU] cannot open %s: %s\n", path, strerror(errno));
+        exit(1);
+    }
+    struct stat st;
+    fstat(fd, &st);
+    *size = st.st_size;
+    void* addr = st.st_size ? mmap(nullptr, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0) : MAP_FAILED;
+    close(fd);
+    if (addr == MAP_FAILED) {
+        fprintf(stderr, "[UVM EMU] cannot map %s\n", path);
+        exit(1);
+    }
+    return (const uint64_t*) addr;
+}
+
+
+static void check_words(const char* path, size_t size, uint64_t n_words) {
+    if (size < n_words * sizeof(uint64_t)) {
+        fprintf(stderr, "[UVM EMU] %s is truncated\n", path);
+        exit(1);
+    }
+}
+
+
+static Schedule load_schedule(const char* path) {
+    size_t size;
+    const uint64_t* words = map_file(path, &size);
+    if (size < 32 || memcmp(words, SCHEDULE_MAGIC, 8) != 0) {
+        fprintf(stderr, "[UVM EMU] %s is not a binary prefetch schedule\n", path);
+        exit(1);
+    }
+    Schedule s;
+    s.n_ops = words[1];
+    uint64_t n_mem = words[2], n_ten = words[3];
+    check_words(path, size, 4 + s.n_ops + 2 * (s.n_ops + 1) + n_mem + n_ten);
+    const int64_t* w = (const int64_t*) words + 4;
+    s.op_ids = w;
+    s.mem_indptr = w + s.n_ops;
+    s.ten_indptr = w + 2 * s.n_ops + 1;
+    s.mem_ids = w + 3 * s.n_ops + 2;
+    s.ten_ids = w + 3 * s.n_ops + 2 + n_mem;
+    return s;
+}
+
+
+static Layout load_layout(const char* path) {
+    size_t size;
+    const uint64_t* words = map_file(path, &size);
+    if (size < 32 || memcmp(words, LAYOUT_MAGIC, 8) != 0) {
+        fprintf(stderr, "[UVM EMU] %s is not an emulator layout\n", path);
+        exit(1);
+    }
+    Layout l;
+    l.arena_size = words[1];
+    l.n_ten = words[2];
+    l.n_mem = words[3];
+    check_words(path, size, 4 + 2 * (l.n_ten + 1) + 2 * (l.n_mem + 1));
+    const int64_t* w = (const int64_t*) words + 4;
+    l.ten_offset = w;
+    l.ten_size = w + l.n_ten + 1;
+    l.mem_offset = w + 2 * (l.n_ten + 1);
+    l.mem_size = w + 2 * (l.n_ten + 1) + l.n_mem + 1;
+    return l;
+}
+
+
+////////////////////////////////////////////////////////////////////////////////
+// Emulated device memory
+////////////////////////////////////////////////////////////////////////////////
+
+static char* arena = nullptr;
+static uint64_t arena_size = 0;
+static uint64_t block_size = 2 * 1024 * 1024;
+static uint64_t n_blocks = 0;
+static uint64_t budget_blocks = 0;
+
+// resident blocks as a doubly linked list, least recent first; preallocated
+// so the fault handler does not allocate
+static std::vector<int64_t> lru_prev, lru_next;
+static std::vector<uint8_t> resident;
+static int64_t lru_head = -1, lru_tail = -1;
+static uint64_t n_resident = 0;
+
+static volatile uint64_t faults = 0;
+static uint64_t fault_bytes = 0;
+static uint64_t prefetch_bytes = 0;
+static uint64_t evictions = 0;
+
+
+static void lru_unlink(int64_t b) {
+    if (lru_prev[b] >= 0) lru_next[lru_prev[b]] = lru_next[b]; else lru_head = lru_next[b];
+    if (lru_next[b] >= 0) lru_prev[lru_next[b]] = lru_prev[b]; else lru_tail = lru_prev[b];
+}
+
+
+static void lru_push(int64_t b) {
+    lru_prev[b] = lru_tail;
+    lru_next[b] = -1;
+    if (lru_tail >= 0) lru_next[lru_tail] = b; else lru_head = b;
+    lru_tail = b;
+}
+
+
+static uint64_t block_bytes(int64_t b) {
+    uint64_t start = b * block_size;
+    return start + block_size <= arena_size ? block_size : arena_size - start;
+}
+
+
+static void evict_one() {
+    int64_t b = lru_head;
+    lru_unlink(b);
+    resident[b] = 0;
+    n_resident--;
+    evictions++;
+    char* addr = arena + b * block_size;
+    mprotect(addr, block_bytes(b), PROT_NONE);
+    madvise(addr, block_bytes(b), MADV_DONTNEED);
+}
+
+
+// make block b resident (most recent); true if it had to migrate
+static bool migrate(int64_t b) {
+    if (resident[b]) {
+        lru_unlink(b);
+        lru_push(b);
+        return false;
+    }
+    while (n_resident >= budget_blocks) {
+        evict_one();
+    }
+    mprotect(arena + b * block_size, block_bytes(b), PROT_READ | PROT_WRITE);
+    resident[b] = 1;
+    n_resident++;
+    lru_push(b);
+    return true;
+}
+
+
+static void fault_handler(int sig, siginfo_t* info, void* ucontext) {
+    char* addr = (char*) info->si_addr;
+    if (addr < arena || addr >= arena + arena_size) {
+        // not ours: restore the default action and let it crash
+        signal(sig, SIG_DFL);
+        return;
+    }
+    int64_t b = (addr - arena) / block_size;
+    if (migrate(b)) {
+        faults = faults + 1;
+        fault_bytes += block_bytes(b);
+    }
+}
+
+
+// cudaMemPrefetchAsync(arena + offset, size) of the advisor
+static void prefetch(uint64_t offset, uint64_t size) {
+    if (size == 0 || offset >= arena_size) {
+        return;
+    }
+    uint64_t stop = offset + size < arena_size ? offset + size : arena_size;
+    for (int64_t b = offset / block_size; b <= (int64_t) ((stop - 1) / block_size); b++) {
+        if (!migrate(b)) {
+            continue;
+        }
+        prefetch_bytes += block_bytes(b);
+        char* addr = arena + b * block_size;
+#ifdef MADV_POPULATE_WRITE
+        if (madvise(addr, block_bytes(b), MADV_POPULATE_WRITE) == 0) {
+            continue;
+        }
+#endif
+        madvise(addr, block_bytes(b), MADV_WILLNEED);
+    }
+}
+
+
+// the accesses of an op: one write per OS page of the range
+static void touch(uint64_t offset, uint64_t size, uint64_t page_size) {
+    if (size == 0 || offset >= arena_size) {
+        return;
+    }
+    uint64_t stop = offset + size < arena_size ? offset + size : arena_size;
+    for (uint64_t p = offset; p < stop; p += page_size - p % page_size) {
+        ((volatile char*) arena)[p] = 1;
+    }
+}
+
+
+static uint64_t find_row(const Schedule& s, int64_t op_id, uint64_t& cursor) {
+    while (cursor < s.n_ops && s.op_ids[cursor] < op_id) {
+        cursor++;
+    }
+    return cursor < s.n_ops && s.op_ids[cursor] == op_id ? cursor : s.n_ops;
+}
+
+
+int main(int argc, char** argv) {
+    if (argc < 5) {
+        fprintf(stderr, "Usage: %s <layout> <usage schedule> <prefetch schedule> <budget bytes> [block bytes]\n",
+                argv[0]);
+        return 1;
+    }
+    Layout layout = load_layout(argv[1]);
+    Schedule usage = load_schedule(argv[2]);
+    Schedule schedule = load_schedule(argv[3]);
+    uint64_t budget = std::strtoull(argv[4], nullptr, 10);
+    if (argc > 5) {
+        block_size = std::strtoull(argv[5], nullptr, 10);
+    }
+    uint64_t page_size = sysconf(_SC_PAGESIZE);
+    if (block_size < page_size || block_size % page_size != 0) {
+        fprintf(stderr, "[UVM EMU] block size must be a multiple of the page size (%lu)\n", page_size);
+        return 1;
+    }
+
+    PrefetchMode_t prefetch_mode = TENSOR_GRANULARITY;
+    const char* prefetch_mode_str = std::getenv("PREFETCH_MODE");
+    if (prefetch_mode_str) {
+        prefetch_mode = static_cast<PrefetchMode_t>(std::stoi(prefetch_mode_str));
+    }
+
+    arena_size = layout.arena_size;
+    n_blocks = (arena_size + block_size - 1) / block_size;
+    budget_blocks = budget / block_size > 0 ? budget / block_size : 1;
+    lru_prev.assign(n_blocks, -1);
+    lru_next.assign(n_blocks, -1);
+    resident.assign(n_blocks, 0);
+    void* addr = mmap(nullptr, n_blocks * block_size, PROT_NONE, MAP_PRIVATE | MAP_ANONYMOUS | MAP_NORESERVE, -1, 0);
+    if (addr == MAP_FAILED) {
+        fprintf(stderr, "[UVM EMU] cannot map a %lu byte arena: %s\n", arena_size, strerror(errno));
+        return 1;
+    }
+    arena = (char*) addr;
+
+    struct sigaction sa;
+    memset(&sa, 0, sizeof(sa));
+    sa.sa_sigaction = fault_handler;
+    sa.sa_flags = SA_SIGINFO;
+    sigemptyset(&sa.sa_mask);
+    sigaction(SIGSEGV, &sa, nullptr);
+
+    auto t0 = std::chrono::steady_clock::now();
+    uint64_t usage_row = 0, schedule_row = 0;
+    uint64_t n_ops = 0;
+    uint64_t i = 0, j = 0;
+    // ops in the usage or the schedule, in order
+    while (i < usage.n_ops || j < schedule.n_ops) {
+        int64_t op_id;
+        if (j >= schedule.n_ops || (i < usage.n_ops && usage.op_ids[i] <= schedule.op_ids[j])) {
+            op_id = usage.op_ids[i];
+        } else {
+            op_id = schedule.op_ids[j];
+        }
+        while (i < usage.n_ops && usage.op_ids[i] == op_id) i++;
+        while (j < schedule.n_ops && schedule.op_ids[j] == op_id) j++;
+        n_ops++;
+
+        uint64_t row = find_row(schedule, op_id, schedule_row);
+        if (row < schedule.n_ops && prefetch_mode == TENSOR_GRANULARITY) {
+            for (int64_t k = schedule.ten_indptr[row]; k < schedule.ten_indptr[row + 1]; k++) {
+                uint64_t id = schedule.ten_ids[k];
+                if (id <= layout.n_ten) prefetch(layout.ten_offset[id], layout.ten_size[id]);
+            }
+        } else if (row < schedule.n_ops && prefetch_mode == OBJECT_GRANULARITY) {
+            for (int64_t k = schedule.mem_indptr[row]; k < schedule.mem_indptr[row + 1]; k++) {
+                uint64_t id = schedule.mem_ids[k];
+                if (id <= layout.n_mem) prefetch(layout.mem_offset[id], layout.mem_size[id]);
+            }
+        }
+
+        row = find_row(usage, op_id, usage_row);
+        if (row < usage.n_ops) {
+            for (int64_t k = usage.ten_indptr[row]; k < usage.ten_indptr[row + 1]; k++) {
+                uint64_t id = usage.ten_ids[k];
+                if (id <= layout.n_ten) touch(layout.ten_offset[id], layout.ten_size[id], page_size);
+            }
+        }
+    }
+    double elapsed = std::chrono::duration<double>(std::chrono::steady_clock::now() - t0).count();
+
+    printf("mode=%d\n", (int) prefetch_mode);
+    printf("ops=%lu\n", n_ops);
+    printf("faults=%lu\n", (uint64_t) faults);
+    printf("fault_bytes=%lu\n", fault_bytes);
+    printf("prefetch_bytes=%lu\n", prefetch_bytes);
+    printf("migrated_bytes=%lu\n", fault_bytes + prefetch_bytes);
+    printf("evictions=%lu\n", evictions);
+    printf("elapsed=%.6f\n", elapsed);
+    return 0;
+}